@@ -1,73 +1,153 @@
+import hashlib
+import io
+
 import numpy as np
-from scipy import stats
+import pandas as pd
 
-# Defaults:
+from changePoint import lineFit
+from ingestCache import fileBytes
 
-totalBTU = np.array([32200,31800,31400,30700,30000,29200,28300,27600,26800])
-totalWATT = np.array([2300,2450,2600,2750,2900,3050,3200,3450,3700])
+# Heat pump performance curves. Each curve is fit once from its data and then
+# evaluated over whole arrays of outdoor temperatures.
 
-EER = []
+class HeatPumpCurve:
+    kinds = ('linear', 'poly', 'piecewise')
 
-for i, j in zip(totalBTU, totalWATT):
-    sol = i/j
-    EER.append(sol)
+    # Lookup table range (°F) for the curves that are not a single line
+    tableMin = -60
+    tableMax = 140
+    tableStep = 0.05
 
-temp = np.arange(75,120, 5)
-EER_line = stats.linregress(temp, EER)
+    def __init__(self, temp, value, kind='linear', degree=2):
+        if kind not in self.kinds:
+            raise ValueError(f"Unknown curve kind {kind!r}, use one of {', '.join(self.kinds)}")
 
-def EER(T):
-    return (EER_line.slope*T + EER_line.intercept)
+        temp = np.asarray(temp, dtype=float)
+        value = np.asarray(value, dtype=float)
+        order = np.argsort(temp)
+        self.temp = temp[order]
+        self.value = value[order]
+        self.kind = kind
 
-# Had the COP values already from another python script
-def COP(T):
-    return 0.0236*T + 2.2127
+        # Fit once
+        self.slope, self.intercept = lineFit(self.temp, self.value)
+        self.coefficients = np.polyfit(self.temp, self.value, degree) if kind == 'poly' else None
 
-# Customs:
+        self.table = None
+        if kind != 'linear':
+            grid = np.arange(self.tableMin, self.tableMax + self.tableStep, self.tableStep)
+            self.table = self.evaluate(grid)
 
-def customEERslope(customEERfile):
-    totalBTU = customEERfile['totalBTU']
-    totalWATT = customEERfile['totalWATT']
-    temp =  customEERfile['temp']
-    
-    EER = []
+    @classmethod
+    def fromLine(cls, slope, intercept):
+        curve = cls([0, 1], [intercept, slope + intercept])
+        curve.slope = slope
+        curve.intercept = intercept
+        return curve
 
-    for i, j in zip(totalBTU, totalWATT):
-        sol = i/j
-        EER.append(sol)
+    def evaluate(self, T):
+        # Direct evaluation of the fitted curve
+        if self.kind == 'poly':
+            return np.polyval(self.coefficients, T)
 
-    EER_line = stats.linregress(temp, EER)
+        if self.kind == 'piecewise':
+            # Straight lines between the data points, extended with the end slopes
+            T = np.asarray(T, dtype=float)
+            values = np.interp(T, self.temp, self.value)
+            lowSlope = (self.value[1] - self.value[0]) / (self.temp[1] - self.temp[0])
+            highSlope = (self.value[-1] - self.value[-2]) / (self.temp[-1] - self.temp[-2])
+            values = np.where(T < self.temp[0], self.value[0] + lowSlope*(T - self.temp[0]), values)
+            return np.where(T > self.temp[-1], self.value[-1] + highSlope*(T - self.temp[-1]), values)
 
-    return EER_line.slope
+        return self.slope*T + self.intercept
 
-def customEERintercept(customEERfile):
-    totalBTU = customEERfile['totalBTU']
-    totalWATT = customEERfile['totalWATT']
-    temp =  customEERfile['temp']
-    
-    EER = []
+    def __call__(self, T):
+        if self.table is None:
+            return self.slope*T + self.intercept
 
-    for i, j in zip(totalBTU, totalWATT):
-        sol = i/j
-        EER.append(sol)
+        # Linear interpolation in the precomputed table, direct evaluation outside it
+        T = np.asarray(T, dtype=float)
+        position = (T - self.tableMin) / self.tableStep
+        inside = (position >= 0) & (position < len(self.table) - 1)
+        index = np.where(inside, position, 0).astype(int)
+        fraction = np.where(inside, position, 0) - index
+        values = self.table[index] + fraction*(self.table[index + 1] - self.table[index])
 
-    EER_line = stats.linregress(temp, EER)
+        if inside.all():
+            return values
+        return np.where(inside, values, self.evaluate(T))
 
-    return EER_line.intercept
 
-def customCOPslope(customCOPfile):
-    temp = customCOPfile['Temp']
-    COP = customCOPfile['COP']
-    
-    COP_line = stats.linregress(temp,COP)
+# Curves fit from uploaded files, keyed by content hash so each file is parsed and fit once
+curveCache = {}
 
-    return COP_line.slope
 
-def customCOPintercept(customCOPfile):
-    temp = customCOPfile['Temp']
-    COP = customCOPfile['COP']
-    
-    COP_line = stats.linregress(temp,COP)
+def curveBytes(file):
+    if isinstance(file, pd.DataFrame):
+        return pd.util.hash_pandas_object(file, index=False).values.tobytes() + str(list(file.columns)).encode()
+    return fileBytes(file)
+
+
+def readFrame(file, data):
+    return file if isinstance(file, pd.DataFrame) else pd.read_csv(io.BytesIO(data))
+
+
+def cachedCurve(name, file, kind, degree, build):
+    data = curveBytes(file)
+    key = (name, hashlib.sha256(data).hexdigest(), kind, degree)
+    if key not in curveCache:
+        curveCache[key] = build(readFrame(file, data))
+    return curveCache[key]
+
 
-    return COP_line.intercept
+def copCurve(customCOPfile, kind='linear', degree=2):
+    # CSV or DataFrame with 'Temp' and 'COP' columns
+    return cachedCurve('COP', customCOPfile, kind, degree,
+                       lambda frame: HeatPumpCurve(frame['Temp'], frame['COP'], kind, degree))
 
 
+def eerCurve(customEERfile, kind='linear', degree=2):
+    # CSV or DataFrame with 'totalBTU', 'totalWATT' and 'temp' columns
+    return cachedCurve('EER', customEERfile, kind, degree,
+                       lambda frame: HeatPumpCurve(frame['temp'], frame['totalBTU'] / frame['totalWATT'], kind, degree))
+
+
+def capacityCurve(customEERfile, kind='linear', degree=2):
+    # Capacity (Btu/h) against outdoor °F, from the same file's 'totalBTU' and 'temp' columns
+    return cachedCurve('capacity', customEERfile, kind, degree,
+                       lambda frame: HeatPumpCurve(frame['temp'], frame['totalBTU'], kind, degree))
+
+# Defaults:
+
+totalBTU = np.array([32200,31800,31400,30700,30000,29200,28300,27600,26800])
+totalWATT = np.array([2300,2450,2600,2750,2900,3050,3200,3450,3700])
+
+temp = np.arange(75,120, 5)
+
+defaultEER = HeatPumpCurve(temp, totalBTU / totalWATT)
+
+def EER(T):
+    return defaultEER(T)
+
+# Capacity falls off as it gets hotter outside
+defaultCapacity = HeatPumpCurve(temp, totalBTU)
+
+# Had the COP values already from another python script
+defaultCOP = HeatPumpCurve.fromLine(0.0236, 2.2127)
+
+def COP(T):
+    return defaultCOP(T)
+
+# Customs:
+
+def customEERslope(customEERfile):
+    return eerCurve(customEERfile).slope
+
+def customEERintercept(customEERfile):
+    return eerCurve(customEERfile).intercept
+
+def customCOPslope(customCOPfile):
+    return copCurve(customCOPfile).slope
+
+def customCOPintercept(customCOPfile):
+    return copCurve(customCOPfile).intercept
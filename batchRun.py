@@ -0,0 +1,277 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from instrumentation import stage
+from modelEngine import meterDateRange, hourlyRange, readHourlyEnergy, readTemperature, runModel, gasUnits
+from isdWeather import observedTemperature
+
+# Portfolio batch runner. Reads a manifest CSV with one building per row and runs
+# the electric model for each one across a process pool:
+#
+#   python batchRun.py manifest.csv --output results --workers 8
+#
+# With --profile every building's pipeline stages (wall time, rows, peak memory)
+# are written as JSON lines to <output>/stages.jsonl.
+#
+# Manifest columns (paths are relative to the manifest):
+#   building, energy_file, temp_file                        required
+#   year, freq, column_name, splitTemp, heatingTemp,        optional, same defaults as the app,
+#                                                           splitTemp is found automatically if missing
+#   coolingTemp, retro, cost, cop_file, eer_file,
+#   curve_kind (linear, poly or piecewise), tariff_file (JSON rate definition, see tariff.py)
+#   gas_unit, gas_cost, furnace_efficiency                  gas bills: unit of the meter column (CCF, Btu,
+#                                                           Therms, MJ or kWh), $ per unit and AFUE %
+#   weather_file, utc_offset                                NOAA ISD/ISD-Lite hourly station file and the
+#                                                           meter's standard time offset from UTC
+
+defaults = {
+    'year': 2023,
+    'freq': 'Hourly',
+    'column_name': 'Power',
+    'splitTemp': None,
+    'heatingTemp': None,
+    'coolingTemp': None,
+    'retro': 30,
+    'cost': 0.1241,
+    'cop_file': None,
+    'eer_file': None,
+    'curve_kind': 'linear',
+    'tariff_file': None,
+    'gas_unit': None,
+    'gas_cost': None,
+    'furnace_efficiency': 80,
+    'weather_file': None,
+    'utc_offset': 0,
+}
+
+def readManifest(path):
+    manifest = pd.read_csv(path)
+    missing = {'building', 'energy_file', 'temp_file'} - set(manifest.columns)
+    if missing:
+        raise ValueError(f"Manifest is missing columns: {', '.join(sorted(missing))}")
+
+    root = os.path.dirname(os.path.abspath(path))
+    return [buildingFrom(row, root) for _, row in manifest.iterrows()]
+
+
+def buildingFrom(row, root):
+    # Defaults plus the given columns, with file paths resolved against root
+    building = dict(defaults)
+    building.update({k: v for k, v in row.items() if v is not None and not pd.isna(v)})
+    for key in ('energy_file', 'temp_file', 'cop_file', 'eer_file', 'tariff_file', 'weather_file'):
+        if building[key] is not None:
+            building[key] = os.path.join(root, building[key])
+    return building
+
+
+def curves(building):
+    # Default heat pump unless custom COP/EER files are given
+    import CustomHP
+
+    COP, EER = CustomHP.COP, CustomHP.EER
+
+    if building['cop_file'] is not None:
+        COP = CustomHP.copCurve(building['cop_file'], building['curve_kind'])
+
+    if building['eer_file'] is not None:
+        EER = CustomHP.eerCurve(building['eer_file'], building['curve_kind'])
+
+    return COP, EER
+
+
+def modelBuilding(building):
+    # Model one manifest row, returns the ModelResult and its summary numbers
+    date_range = meterDateRange(building['year'], building['freq'])
+    COP, EER = curves(building)
+
+    # Gas meters are converted to kWh-equivalent and priced per unit of gas
+    gasUnit = building['gas_unit']
+    gas = gasUnit is not None
+    if gas and building['gas_cost'] is None:
+        raise ValueError("gas_unit needs a gas_cost ($ per unit)")
+    energy = readHourlyEnergy(building['energy_file'], building['column_name'], date_range, unit=gasUnit)
+
+    # Observed hourly temperatures replace the sinusoid when a station file is given
+    observed = None
+    if building['weather_file'] is not None:
+        observed = observedTemperature(building['weather_file'], date_range, int(building['utc_offset'])).temp
+
+    result = runModel(energy, readTemperature(building['temp_file']), hourlyRange(date_range),
+                      splitTemp=None if building['splitTemp'] is None else float(building['splitTemp']),
+                      heatingTemp=building['heatingTemp'], coolingTemp=building['coolingTemp'],
+                      COP=COP, EER=EER, retro=float(building['retro'])/100, cost=float(building['cost']),
+                      tariff=building['tariff_file'],
+                      efficiency=float(building['furnace_efficiency'])/100 if gas else 1.0,
+                      fuelCost=float(building['gas_cost'])/gasUnits[gasUnit] if gas else None,
+                      observedTemp=observed)
+
+    original = result.monthlyOriginal.sum()
+    summary = {
+        'tariff': result.tariff.name if result.tariff is not None else f"Flat ${result.cost}/kWh"
+                  + (f", gas ${building['gas_cost']}/{gasUnit}" if gas else ''),
+        'splitTemp': result.fit.splitTemp,
+        'heatingTemp': result.heatingTemp,
+        'coolingTemp': result.coolingTemp,
+        'originalKWh': original,
+        'noComfortKWh': result.monthlyNoComfort.sum(),
+        'comfortKWh': result.totalModelThree.sum(),
+        'retrofitKWh': original * (1 - result.retro),
+        'noComfortSavings': result.savings("No Comfort Mode").sum(),
+        'comfortSavings': result.savings("Comfort Mode").sum(),
+        'retrofitSavings': result.savings(None, True).sum(),
+    }
+    return result, summary
+
+
+def hourlyFrame(result):
+    return pd.DataFrame({
+        'hour': result.inputs.hoursInYear,
+        'outsideTemp': result.sinT,
+        'original': result.hourlyOriginal,
+        'noComfort': result.noComfortTotal,
+        'comfort': result.hourlyModelThree,
+    })
+
+
+def runBuilding(building, outputDir, profile=False):
+    start = time.perf_counter()
+    summary = {'building': building['building'], 'status': 'ok', 'error': ''}
+    # Workers don't share the parent's profiling setting, it comes with every task
+    instrumentation.enable(profile)
+    instrumentation.reset()
+
+    try:
+        result, numbers = modelBuilding(building)
+        summary.update(numbers)
+
+        hourly = hourlyFrame(result)
+        with stage('write hourly CSV', len(hourly)):
+            hourly.to_csv(os.path.join(outputDir, 'hourly', f"{building['building']}.csv"), index=False)
+
+    except Exception as e:
+        # One bad building must not stop the rest of the portfolio
+        summary.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+        summary['traceback'] = traceback.format_exc()
+
+    summary['seconds'] = time.perf_counter() - start
+    if profile:
+        summary['stages'] = instrumentation.report()
+    return summary
+
+
+def runChunk(buildings, outputDir, profile=False):
+    return [runBuilding(building, outputDir, profile) for building in buildings]
+
+
+def runPortfolio(buildings, outputDir, workers=None, chunkSize=8, progress=None, profile=False, window=None):
+    # Results and hourly/<building>.csv are keyed by name, a repeated one would overwrite the first
+    names = pd.Series([b['building'] for b in buildings])
+    if names.duplicated().any():
+        raise ValueError(f"Duplicate building names: {', '.join(map(str, names[names.duplicated()].unique()))}")
+
+    os.makedirs(os.path.join(outputDir, 'hourly'), exist_ok=True)
+    chunks = [buildings[i:i + chunkSize] for i in range(0, len(buildings), chunkSize)]
+    workers = workers or os.cpu_count()
+    window = window or 2*workers     # Chunks submitted at a time, the rest wait here
+
+    results = []
+    pending = deque(range(len(chunks)))
+    suspects = set()                 # Chunks rerun alone after a pool broke under them
+
+    def retry(i):
+        # A worker dying breaks the pool and fails every chunk in it, not just its own. Their
+        # buildings run again one at a time, and one that breaks a pool a second time is the cause
+        if i in suspects:
+            results.extend(failed(chunks[i], "BrokenProcessPool: the worker process died"))
+            return
+        for building in chunks[i]:
+            chunks.append([building])
+            suspects.add(len(chunks) - 1)
+            pending.appendleft(len(chunks) - 1)
+
+    def runsAlone(i, futures):
+        # A suspect waits for an empty pool and nothing joins it
+        return bool(futures) and (i in suspects or not suspects.isdisjoint(futures.values()))
+
+    while pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            while pending or futures:
+                while pending and len(futures) < window and not runsAlone(pending[0], futures):
+                    i = pending.popleft()
+                    futures[pool.submit(runChunk, chunks[i], outputDir, profile)] = i
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                broken = any(isinstance(f.exception(), BrokenProcessPool) for f in done)
+                # After a break every other future fails too, finished chunks keep their results
+                for future in list(futures) if broken else done:
+                    i = futures.pop(future)
+                    try:
+                        results.extend(future.result())
+                    except BrokenProcessPool:
+                        retry(i)
+                    except Exception as e:
+                        results.extend(failed(chunks[i], f"{type(e).__name__}: {e}"))
+
+                if progress is not None:
+                    progress(len(results), len(buildings))
+                if broken:
+                    break
+
+    order = {b['building']: i for i, b in enumerate(buildings)}
+    summary = pd.DataFrame(results)
+    summary = summary.iloc[np.argsort([order[b] for b in summary['building']])].reset_index(drop=True)
+    return summary
+
+
+def failed(chunk, error):
+    return [{'building': b['building'], 'status': 'error', 'error': error} for b in chunk]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the heat pump model for every building in a manifest CSV.")
+    parser.add_argument('manifest', help="CSV with building, energy_file, temp_file and optional parameter columns")
+    parser.add_argument('--output', default='batch_output', help="Directory for summary.csv and hourly/<building>.csv")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument('--chunk-size', type=int, default=8, help="Buildings per submitted task")
+    parser.add_argument('--profile', action='store_true', help="Write per-stage timings to <output>/stages.jsonl")
+    args = parser.parse_args(argv)
+
+    buildings = readManifest(args.manifest)
+    start = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\r{done}/{total} buildings", end='', file=sys.stderr)
+
+    summary = runPortfolio(buildings, args.output, args.workers, args.chunk_size, progress, args.profile)
+    print(file=sys.stderr)
+
+    if 'stages' in summary:
+        with open(os.path.join(args.output, 'stages.jsonl'), 'w') as log:
+            for _, row in summary.iterrows():
+                if isinstance(row['stages'], list):
+                    instrumentation.logRecords(log, row['stages'], building=row['building'])
+
+    summary.drop(columns=['traceback', 'stages'], errors='ignore').to_csv(os.path.join(args.output, 'summary.csv'), index=False)
+
+    failed = summary[summary['status'] == 'error']
+    for _, row in failed.iterrows():
+        print(f"{row['building']}: {row['error']}", file=sys.stderr)
+
+    print(f"{len(summary) - len(failed)} ok, {len(failed)} failed in {time.perf_counter() - start:.1f}s "
+          f"-> {os.path.join(args.output, 'summary.csv')}")
+    return 1 if len(failed) == len(summary) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
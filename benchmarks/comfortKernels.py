@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelEngine import LoadFit, comfortKernels
+
+# Compares the vectorized comfort kernels against the per-hour loops they replaced.
+# Run from the repo root: python benchmarks/comfortKernels.py
+
+
+def loopKernels(sinT, fit, heatingTemp, coolingTemp):
+    # The original per-hour implementation, kept here as the reference
+    baseLoad = int(fit.baseIntercept)
+
+    coolingEnergy = []
+    for temp in sinT:
+        if temp <= coolingTemp:
+            coolingEnergy.append(0)
+        else:
+            coolingEnergy.append(fit.cooling(temp))
+
+    heatingEnergy = []
+    for temp in sinT:
+        if temp > heatingTemp:
+            heatingEnergy.append(baseLoad)
+        else:
+            heatingEnergy.append(fit.heating(temp))
+
+    heatingModel = []
+    for heating in heatingEnergy:
+        if heating - baseLoad < 0:
+            heatingModel.append(0)
+        else:
+            heatingModel.append(heating - baseLoad)
+
+    return np.array(coolingEnergy, dtype=float), np.array(heatingEnergy, dtype=float), np.array(heatingModel, dtype=float)
+
+
+def bestOf(func, repeat, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    fit = LoadFit(splitTemp=55, heatSlope=-0.18, heatIntercept=12.1, baseSlope=0.01, baseIntercept=5.4)
+    heatingTemp, coolingTemp = 60, 75
+
+    print(f"{'points':>8} {'loop (ms)':>12} {'vectorized (ms)':>16} {'speedup':>9}")
+
+    for points in (8760, 35040):
+        hours = np.arange(points)
+        sinT = 55 + 20*np.sin(2*np.pi*hours/points) - 8*np.cos(2*np.pi*hours/24) + rng.normal(0, 3, points)
+
+        for old, new in zip(loopKernels(sinT, fit, heatingTemp, coolingTemp),
+                            comfortKernels(sinT, fit, heatingTemp, coolingTemp)):
+            assert np.array_equal(old, new), "vectorized kernels differ from the loops"
+
+        loopTime = bestOf(loopKernels, 3, sinT, fit, heatingTemp, coolingTemp)
+        vectorTime = bestOf(comfortKernels, 20, sinT, fit, heatingTemp, coolingTemp)
+
+        print(f"{points:>8} {loopTime*1000:>12.2f} {vectorTime*1000:>16.3f} {loopTime/vectorTime:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Cold-start report: imports each entry module in a fresh interpreter with
+# python -X importtime, keeps the fastest of several runs, and lists where the time
+# goes and which heavy packages got pulled in.
+#
+#   python benchmarks/importTime.py
+#   python benchmarks/importTime.py --modules modelEngine pipeline --repeat 10 --json imports.json
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What the app, the batch runner and the service load before any data arrives
+defaultModules = ('modelEngine', 'pipeline', 'projectStore', 'batchRun', 'modelService', 'electricDataProcessing')
+
+# Packages the default path should only load when a feature needs them
+heavyPackages = ('matplotlib', 'scipy.stats', 'scipy.optimize', 'scipy.signal', 'plotly', 'streamlit')
+
+
+def parseImportTime(stderr):
+    # "import time: self [us] | cumulative | package", nesting shown by indentation
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_, cumulative, name = line[len('import time:'):].split('|')
+        rows.append({
+            'package': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self': int(self_) / 1e6,
+            'cumulative': int(cumulative) / 1e6,
+        })
+    return rows
+
+
+def measure(module, repeat):
+    # Fastest of repeat cold imports: wall time of the whole interpreter and the import tree
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             cwd=root, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if run.returncode != 0:
+            return {'module': module, 'error': run.stderr.strip().splitlines()[-1]}
+
+        rows = parseImportTime(run.stderr)
+        total = next((r['cumulative'] for r in reversed(rows) if r['package'] == module), 0.0)
+        if best is None or total < best['seconds']:
+            best = {'module': module, 'seconds': total, 'wall': wall, 'rows': rows}
+
+    loaded = {r['package'] for r in best['rows']}
+    best['heavy'] = [p for p in heavyPackages if p in loaded]
+    best['slowest'] = sorted(({'package': r['package'], 'seconds': r['cumulative']}
+                              for r in best.pop('rows') if r['depth'] == 1), key=lambda r: -r['seconds'])[:5]
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import time of the model's entry modules.")
+    parser.add_argument('--modules', nargs='+', default=list(defaultModules))
+    parser.add_argument('--repeat', type=int, default=5, help="Cold imports per module, the fastest is kept")
+    parser.add_argument('--json', default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = [measure(module, args.repeat) for module in args.modules]
+
+    print(f"{'module':<24} {'import s':>9} {'process s':>10}  heavy packages loaded")
+    for entry in report:
+        if 'error' in entry:
+            print(f"{entry['module']:<24} {'-':>9} {'-':>10}  not importable here: {entry['error']}")
+            continue
+        print(f"{entry['module']:<24} {entry['seconds']:>9.3f} {entry['wall']:>10.3f}  {', '.join(entry['heavy']) or '-'}")
+        for dependency in entry['slowest']:
+            print(f"{'':<4}{dependency['package']:<32} {dependency['seconds']:>9.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': report}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
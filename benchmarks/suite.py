@@ -0,0 +1,232 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import instrumentation
+from instrumentation import stage
+from changePoint import fitBest
+from ingestCache import cache
+from modelEngine import meterDateRange, hourlyRange, readHourlyEnergy, readTemperature, prepareInputs, fitLoads, simulate
+from synthetic import dailyWeather, writeBuilding, writePortfolio
+from weatherEnsemble import runEnsemble
+
+# Reproducible benchmark suite on synthetic buildings. Every case times the pipeline
+# stages through instrumentation, keeps the median of several repeats and compares
+# them with a stored baseline. The timed repeats run without tracemalloc, which slows
+# allocation heavy stages severalfold; peak memory comes from one more run with it on:
+#
+#   python benchmarks/suite.py                        compare with benchmarks/baseline.json
+#   python benchmarks/suite.py --save                 store this run as the new baseline
+#   python benchmarks/suite.py --buildings 2000 --cases portfolio
+#
+# A stage is a regression when its median is slower than its baseline by more than
+# --tolerance and by more than its own noise: noiseWidth times the larger relative
+# spread (median absolute deviation / median) of the two runs, so stages that jitter
+# by a large fraction of their time, typically the very short ones, need a larger
+# slowdown to be flagged. Baselines only compare on the same machine, so the file
+# records the platform it was measured on.
+
+baselinePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+minRepeat = 3       # A median and a spread need at least this many runs
+noiseWidth = 3      # Spreads of slowdown a stage may show before it counts
+
+cases = {
+    # name: (meter year, freq, years of daily weather history for the ensemble)
+    'building-hourly': (2023, 'Hourly', 0),
+    'building-15min': (2023, '15-Minute', 0),
+    'ensemble-30yr': (2023, '15-Minute', 30),
+    'leapyear-15min': (2024, '15-Minute', 0),
+}
+
+
+def hasStreamlit():
+    try:
+        import streamlit  # noqa: F401
+        import plotly  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def runPipeline(meterFile, weatherFile, year, freq, render, historyFile=None):
+    date_range = meterDateRange(year, freq)
+
+    with stage('ingestion'):
+        energy = readHourlyEnergy(meterFile, 'Power', date_range)
+        tempData = readTemperature(weatherFile)
+
+    with stage('aggregation'):
+        inputs = prepareInputs(energy, tempData, hourlyRange(date_range))
+
+    with stage('fitting'):
+        fitBest(inputs.monthlyTemp, inputs.monthlyEnergy)
+        fit = fitLoads(inputs.monthlyTemp, inputs.monthlyEnergy)
+
+    with stage('simulation'):
+        import CustomHP
+        result = simulate(inputs, fit, fit.heatingZero(), fit.heatingZero(), CustomHP.COP, CustomHP.EER, 0.3, 0.1241)
+        for mode in ("Comfort Mode", "No Comfort Mode"):
+            result.scenario(mode, hourly=True)
+            result.savings(mode, True)
+
+    if historyFile is not None:
+        # The building under every year of the station history, one model year each
+        with stage('ensemble'):
+            runEnsemble(result, readTemperature(historyFile))
+
+    if render:
+        # Streamlit runs in bare mode outside `streamlit run`, every call still builds its payload
+        from electricDataProcessing import electricModel
+        cache.clear()
+        with stage('electricModel'):
+            electricModel(meterFile, weatherFile, date_range, 'Power', 0.3, 0.1241, year, 1, 1)
+
+
+def stageTotals(run):
+    # Seconds and the largest peak memory of every stage name in one run
+    instrumentation.reset()
+    run()
+    totals = {}
+    for record in instrumentation.report():
+        total = totals.setdefault(record['stage'], {'seconds': 0.0, 'peakMB': 0.0, 'rows': record['rows']})
+        total['seconds'] += record['seconds']
+        total['peakMB'] = max(total['peakMB'], record['peakMB'] or 0.0)
+    return totals
+
+
+def timeCase(run, repeat):
+    # Median seconds per stage name over the repeats and its relative spread, then the peak memory
+    instrumentation.enable(memory=False)
+    samples = {}
+    for _ in range(repeat):
+        for name, total in stageTotals(run).items():
+            samples.setdefault(name, []).append(total)
+
+    instrumentation.enable(memory=True)
+    memory = stageTotals(run)
+    instrumentation.enable(False)
+
+    stages = {}
+    for name, runs in samples.items():
+        seconds = np.array([r['seconds'] for r in runs])
+        median = float(np.median(seconds))
+        stages[name] = {
+            'seconds': median,
+            'noise': float(np.median(np.abs(seconds - median)) / median) if median > 0 else 0.0,
+            'repeats': len(runs),
+            'peakMB': memory.get(name, {'peakMB': 0.0})['peakMB'],
+            'rows': runs[0]['rows'],
+        }
+    return stages
+
+
+def runSuite(selected, directory, repeat, buildings, workers):
+    render = hasStreamlit()
+    if render:
+        logging.getLogger('streamlit').setLevel(logging.ERROR)
+    results = {}
+
+    for name in selected:
+        if name == 'portfolio':
+            from batchRun import readManifest, runPortfolio
+            manifest = writePortfolio(os.path.join(directory, 'portfolio'), buildings)
+            outputDir = os.path.join(directory, 'portfolio', 'output')
+
+            def run():
+                with stage('portfolio', buildings):
+                    runPortfolio(readManifest(manifest), outputDir, workers)
+
+            results[name] = timeCase(run, repeat)
+            results[name]['portfolio']['buildingsPerSecond'] = buildings / results[name]['portfolio']['seconds']
+            continue
+
+        year, freq, historyYears = cases[name]
+        meterFile, weatherFile = writeBuilding(os.path.join(directory, name), name, (year,), freq, seed=1)
+        historyFile = None
+        if historyYears:
+            historyFile = os.path.join(directory, name, 'history.noaa.csv')
+            dailyWeather(list(range(year - historyYears, year)), np.random.default_rng(2)).to_csv(historyFile, index=False)
+        results[name] = timeCase(lambda: runPipeline(meterFile, weatherFile, year, freq, render, historyFile), repeat)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'case':<18} {'stage':<34} {'seconds':>10} {'baseline':>10} {'change':>8} {'peak MB':>9}")
+    for case, stages in results.items():
+        for name, current in stages.items():
+            previous = baseline.get('results', {}).get(case, {}).get(name)
+            line = f"{case:<18} {name:<34} {current['seconds']:>10.4f}"
+            if previous is None:
+                print(f"{line} {'-':>10} {'':>8} {current['peakMB']:>9.2f}")
+                continue
+
+            change = current['seconds'] / previous['seconds'] - 1 if previous['seconds'] > 0 else 0
+            # Baselines saved before the spread was recorded (or from a single run) can't be judged
+            comparable = min(current.get('repeats', 1), previous.get('repeats', 1)) >= minRepeat
+            noise = noiseWidth*max(current.get('noise', 0), previous.get('noise', 0))
+            slower = comparable and change > max(tolerance, noise)
+            note = '  <- regression' if slower else '' if comparable else '  (too few repeats)'
+            print(f"{line} {previous['seconds']:>10.4f} {change:>+7.0%} {current['peakMB']:>9.2f}{note}")
+            if slower:
+                regressions.append((case, name, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the heat pump model on synthetic buildings.")
+    parser.add_argument('--cases', nargs='+', default=list(cases) + ['portfolio'], choices=list(cases) + ['portfolio'])
+    parser.add_argument('--repeat', type=int, default=5, help=f"Repeats per case (at least {minRepeat}), the median is kept")
+    parser.add_argument('--buildings', type=int, default=50, help="Buildings in the portfolio case")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for the portfolio case")
+    parser.add_argument('--data', default=None, help="Directory for the generated files (default: a temporary one)")
+    parser.add_argument('--baseline', default=baselinePath)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown per stage")
+    parser.add_argument('--save', action='store_true', help="Store this run as the baseline")
+    args = parser.parse_args(argv)
+    if args.repeat < minRepeat:
+        parser.error(f"--repeat must be at least {minRepeat}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        start = time.perf_counter()
+        results = runSuite(args.cases, args.data or scratch, args.repeat, args.buildings, args.workers)
+        print(f"Ran {len(results)} cases in {time.perf_counter() - start:.1f}s\n")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'cpus': os.cpu_count(),
+                'results': results,
+            }, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) slower than the baseline")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import calendar
+import os
+
+import numpy as np
+import pandas as pd
+
+# Synthetic buildings and weather for the benchmarks, in the same formats as the
+# example CSVs: NOAA daily summaries (DATE, TMAX, TMIN) and a meter file with one
+# power (kW) column. Everything is drawn from a seeded generator, so the same
+# arguments always write the same files.
+
+
+def dailyWeather(years, rng, meanTemp=52, swing=18, dailyRange=14):
+    # NOAA-style daily TMAX/TMIN covering every day of the given years
+    dates = pd.date_range(start=f'{years[0]}-01-01', end=f'{years[-1]}-12-31', freq='D')
+    dayOfYear = dates.dayofyear.to_numpy()
+
+    # Coldest in mid January, plus a few days of persistent weather on top
+    seasonal = meanTemp - swing*np.cos(2*np.pi*(dayOfYear - 15)/365.25)
+    weather = np.convolve(rng.normal(0, 6, len(dates)), np.ones(3)/3, mode='same')
+    tavg = seasonal + weather
+    spread = np.clip(dailyRange + rng.normal(0, 3, len(dates)), 2, None)
+
+    return pd.DataFrame({
+        'STATION': 'SYNTHETIC',
+        'NAME': 'SYNTHETIC STATION',
+        'DATE': dates.strftime('%Y-%m-%d'),
+        'PRCP': np.round(np.clip(rng.normal(0, 0.1, len(dates)), 0, None), 2),
+        'TAVG': '',
+        'TMAX': np.round(tavg + spread/2).astype(int),
+        'TMIN': np.round(tavg - spread/2).astype(int),
+    })
+
+
+def meterPower(weather, years, freq, rng, baseLoad=5, heatSlope=0.35, balanceTemp=55):
+    # Resistive heating below the balance point on top of a base load with a daily cycle
+    perHour = 4 if freq == '15-Minute' else 1
+    hours = sum(8784 if calendar.isleap(y) else 8760 for y in years)
+    intervals = np.arange(hours*perHour)
+    hourOfDay = (intervals / perHour) % 24
+
+    tavg = ((weather['TMAX'] + weather['TMIN']) / 2).to_numpy(dtype=float)
+    delta = (weather['TMAX'] - weather['TMIN']).to_numpy(dtype=float)
+    day = intervals // (24*perHour)
+    outside = tavg[day] - delta[day]/2*np.cos(2*np.pi*(hourOfDay - 3)/24)
+
+    base = baseLoad*(1 + 0.3*np.sin(2*np.pi*(hourOfDay - 9)/24))
+    heating = heatSlope*np.clip(balanceTemp - outside, 0, None)
+    power = np.clip(base + heating + rng.normal(0, 0.4, len(intervals)), 0, None)
+    return np.round(power, 2)
+
+
+def writeBuilding(directory, name, years=(2023,), freq='15-Minute', seed=0, weatherFile=None):
+    # One meter CSV plus (unless a shared one is given) its weather CSV; returns both paths
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    years = list(years)
+
+    if weatherFile is None:
+        weather = dailyWeather(years, rng)
+        weatherFile = os.path.join(directory, f'{name}.noaa.csv')
+        weather.to_csv(weatherFile, index=False)
+    else:
+        weather = pd.read_csv(weatherFile)
+
+    power = meterPower(weather, years, freq, rng,
+                       baseLoad=rng.uniform(2, 12), heatSlope=rng.uniform(0.1, 0.8), balanceTemp=rng.uniform(50, 62))
+    meterFile = os.path.join(directory, f'{name}.meter.csv')
+    pd.DataFrame({'Power': power}).to_csv(meterFile, index=False)
+    return meterFile, weatherFile
+
+
+def writePortfolio(directory, buildings, years=(2023,), freq='15-Minute', seed=0, stations=10):
+    # Buildings share a handful of weather stations, like a real portfolio in a few cities.
+    # Writes a batchRun manifest and returns its path.
+    os.makedirs(directory, exist_ok=True)
+    years = list(years)
+
+    weatherFiles = []
+    for station in range(min(stations, buildings)):
+        weather = dailyWeather(years, np.random.default_rng((seed, station)), meanTemp=45 + 2*station)
+        path = os.path.join(directory, f'station{station}.noaa.csv')
+        weather.to_csv(path, index=False)
+        weatherFiles.append(path)
+
+    rows = []
+    for b in range(buildings):
+        name = f'building{b:05d}'
+        meterFile, weatherFile = writeBuilding(directory, name, years, freq, seed=(seed, b),
+                                               weatherFile=weatherFiles[b % len(weatherFiles)])
+        rows.append({'building': name, 'energy_file': os.path.basename(meterFile),
+                     'temp_file': os.path.basename(weatherFile), 'year': years[0], 'freq': freq})
+
+    manifest = os.path.join(directory, 'manifest.csv')
+    pd.DataFrame(rows).to_csv(manifest, index=False)
+    return manifest
@@ -0,0 +1,171 @@
+import numpy as np
+from dataclasses import dataclass
+
+# Automatic balance-point detection for the monthly energy vs. temperature points.
+#
+# bestSplit scores every split between the heating and base load lines (the two
+# linregress fits used by the app) at once from cumulative sums of x, y, x², xy, y².
+# fitChangePoint fits the ASHRAE Guideline 14 style 3P/4P/5P change-point models
+# for every candidate balance point in one batched least-squares solve.
+
+
+@dataclass
+class SplitFit:
+    splitTemp: float
+    heatSlope: float
+    heatIntercept: float
+    baseSlope: float
+    baseIntercept: float
+    r2: float
+    cvrmse: float
+    candidates: np.ndarray     # Split temperatures that were scored
+    sse: np.ndarray            # Total squared error for each candidate
+
+
+@dataclass
+class ChangePointFit:
+    model: str                 # '3PH', '3PC', '4P' or '5P'
+    breakpoints: tuple         # Balance point(s) in °F
+    coefficients: np.ndarray   # Base load then slope(s)
+    r2: float
+    cvrmse: float
+
+    def predict(self, T):
+        return hingeDesign(np.asarray(T, dtype=float), self.model, *map(np.asarray, self.breakpoints)) @ self.coefficients
+
+
+def cleanPoints(temp, energy):
+    temp = np.asarray(temp, dtype=float)
+    energy = np.asarray(energy, dtype=float)
+    valid = ~(np.isnan(temp) | np.isnan(energy))
+    order = np.argsort(temp[valid])
+    return temp[valid][order], energy[valid][order]
+
+
+def fitQuality(sse, energy, parameters):
+    # R² and CV(RMSE) with n - p degrees of freedom, as in ASHRAE Guideline 14
+    n = len(energy)
+    sst = np.sum((energy - energy.mean())**2)
+    r2 = 1 - sse / sst if sst > 0 else np.nan
+    cvrmse = np.sqrt(sse / max(n - parameters, 1)) / energy.mean()
+    return r2, cvrmse
+
+
+def lineFit(x, y):
+    # Least-squares slope and intercept, what scipy's linregress returns, without importing scipy.stats
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    dx = x - x.mean()
+    slope = np.dot(dx, y - y.mean()) / np.dot(dx, dx)
+    return slope, y.mean() - slope*x.mean()
+
+
+def lineStats(n, sx, sy, sxx, sxy, syy):
+    # Least-squares line and its squared error from raw sums, element-wise over candidates
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cxx = sxx - sx*sx/n
+        cxy = sxy - sx*sy/n
+        cyy = syy - sy*sy/n
+        slope = cxy / cxx
+        intercept = (sy - slope*sx) / n
+        sse = np.where(cxx > 0, np.maximum(cyy - cxy*slope, 0), np.inf)
+    return slope, intercept, sse
+
+
+def bestSplit(temp, energy, minPoints=3):
+    x, y = cleanPoints(temp, energy)
+    n = len(x)
+    if n < 2*minPoints:
+        raise ValueError(f"Need at least {2*minPoints} monthly points to find a balance point, got {n}")
+
+    # Cumulative sums with a leading zero, so index k holds the sums of the k coldest points
+    sums = np.zeros((6, n + 1))
+    sums[:, 1:] = np.cumsum([np.ones(n), x, y, x*x, x*y, y*y], axis=1)
+    k = np.arange(minPoints, n - minPoints + 1)
+
+    left = sums[:, k]
+    right = sums[:, -1:] - left
+    heatSlope, heatIntercept, heatSSE = lineStats(*left)
+    baseSlope, baseIntercept, baseSSE = lineStats(*right)
+
+    # Split halfway between neighbouring months, ties can't be separated
+    candidates = (x[k - 1] + x[k]) / 2
+    sse = np.where(x[k - 1] < x[k], heatSSE + baseSSE, np.inf)
+    if not np.isfinite(sse).any():
+        raise ValueError("No split temperature separates the monthly points")
+
+    best = np.argmin(sse)
+    r2, cvrmse = fitQuality(sse[best], y, 4)
+
+    return SplitFit(candidates[best], heatSlope[best], heatIntercept[best], baseSlope[best], baseIntercept[best],
+                    r2, cvrmse, candidates, sse)
+
+
+def hingeDesign(T, model, *breakpoints):
+    # Design matrix [1, hinge...] with any leading candidate dimensions from the breakpoints
+    shape = np.broadcast(*breakpoints).shape if breakpoints else ()
+    T = np.broadcast_to(T, shape + T.shape[-1:])
+    columns = [np.ones_like(T)]
+
+    if model == '3PH':
+        columns.append(np.maximum(breakpoints[0][..., None] - T, 0))
+    elif model == '3PC':
+        columns.append(np.maximum(T - breakpoints[0][..., None], 0))
+    elif model == '4P':
+        columns.append(np.maximum(breakpoints[0][..., None] - T, 0))
+        columns.append(np.maximum(T - breakpoints[0][..., None], 0))
+    elif model == '5P':
+        columns.append(np.maximum(breakpoints[0][..., None] - T, 0))
+        columns.append(np.maximum(T - breakpoints[1][..., None], 0))
+    else:
+        raise ValueError(f"Unknown change-point model {model!r}")
+
+    return np.stack(columns, axis=-1)
+
+
+def fitChangePoint(temp, energy, model='3PH', candidates=None):
+    x, y = cleanPoints(temp, energy)
+    if candidates is None:
+        candidates = np.linspace(x[0], x[-1], 102)[1:-1]
+    candidates = np.asarray(candidates, dtype=float)
+
+    if model == '5P':
+        heat, cool = np.meshgrid(candidates, candidates, indexing='ij')
+        keep = heat < cool
+        breakpoints = (heat[keep], cool[keep])
+    else:
+        breakpoints = (candidates,)
+
+    # One batched least-squares solve for every candidate: (candidates x points x parameters)
+    X = hingeDesign(x, model, *map(np.asarray, breakpoints))
+    XtX = np.einsum('cnp,cnq->cpq', X, X)
+    Xty = np.einsum('cnp,n->cp', X, y)
+    coefficients = np.einsum('cpq,cq->cp', np.linalg.pinv(XtX), Xty)
+    sse = np.sum((y - np.einsum('cnp,cp->cn', X, coefficients))**2, axis=1)
+
+    # Every hinge needs at least two points past its balance point, and outside of the 4P
+    # model (free slope on each side) heating and cooling slopes can't be negative
+    valid = (X[:, :, 1:] > 0).sum(axis=1).min(axis=1) >= 2
+    if model != '4P':
+        valid &= (coefficients[:, 1:] >= 0).all(axis=1)
+    sse = np.where(valid, sse, np.inf)
+    if not np.isfinite(sse).any():
+        raise ValueError(f"No valid {model} change-point fit for these points")
+
+    best = np.argmin(sse)
+    r2, cvrmse = fitQuality(sse[best], y, X.shape[2] + len(breakpoints))
+
+    return ChangePointFit(model, tuple(float(b[best]) for b in breakpoints), coefficients[best], r2, cvrmse)
+
+
+def fitBest(temp, energy, models=('3PH', '3PC', '4P', '5P')):
+    # Model with the lowest CV(RMSE), which already penalizes extra parameters
+    fits = []
+    for model in models:
+        try:
+            fits.append(fitChangePoint(temp, energy, model))
+        except ValueError:
+            continue
+    if not fits:
+        raise ValueError("No change-point model could be fit to these points")
+    return min(fits, key=lambda f: f.cvrmse)
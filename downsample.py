@@ -0,0 +1,77 @@
+import numpy as np
+
+# Shape-preserving downsampling for the hourly charts. Both methods return indices
+# into the original series, so x values, hover data and every other column can be
+# taken at the same points.
+#
+#   'lttb'    Largest-Triangle-Three-Buckets, keeps the points that shape the line
+#   'minmax'  Lowest and highest point of every bucket, keeps every peak and dip
+
+methods = ('lttb', 'minmax')
+
+
+def bucketEdges(n, buckets):
+    return np.linspace(0, n, buckets + 1).astype(int)
+
+
+def lttbIndices(y, points, x=None):
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    filled = np.where(np.isnan(y), 0, y)
+
+    # First and last points are always kept, the rest are split into points - 2 buckets
+    edges = bucketEdges(n - 2, points - 2) + 1
+    counts = np.diff(edges)
+    meanX = np.add.reduceat(x[1:-1], edges[:-1] - 1) / counts
+    meanY = np.add.reduceat(filled[1:-1], edges[:-1] - 1) / counts
+    meanX = np.append(meanX, x[-1])
+    meanY = np.append(meanY, filled[-1])
+
+    indices = np.empty(points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for b in range(points - 2):
+        start, end = edges[b], edges[b + 1]
+        # Triangle between the last kept point, each candidate and the next bucket's mean
+        area = np.abs((x[previous] - meanX[b + 1])*(filled[start:end] - filled[previous])
+                      - (x[previous] - x[start:end])*(meanY[b + 1] - filled[previous]))
+        previous = start + np.argmax(area)
+        indices[b + 1] = previous
+    return indices
+
+
+def minMaxIndices(y, points):
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    buckets = (points - 2) // 2     # Two points per bucket plus both ends
+    if points >= n or buckets < 1:
+        return np.arange(n)
+
+    # The ends are kept and the points between them split like LTTB's buckets, at most one
+    # apart in size. Padding each to the largest finds every minimum and maximum at once
+    edges = bucketEdges(n - 2, buckets) + 1
+    index = edges[:-1, None] + np.arange(np.diff(edges).max())
+    padded = np.where(index < edges[1:, None], y[np.minimum(index, n - 1)], np.nan)
+
+    rows = np.arange(buckets)
+    low = index[rows, np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)]
+    high = index[rows, np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)]
+    return np.unique(np.concatenate([[0], low, high, [n - 1]]))
+
+
+def downsampleIndices(y, points, method='lttb', start=0, end=None, x=None):
+    # Indices of the points to draw inside [start, end), at full detail when they fit
+    end = len(y) if end is None else min(end, len(y))
+    start = max(start, 0)
+    if method not in methods:
+        raise ValueError(f"Unknown downsampling method {method!r}, use one of {', '.join(methods)}")
+
+    window = np.asarray(y)[start:end]
+    if method == 'lttb':
+        windowX = None if x is None else np.asarray(x)[start:end]
+        return start + lttbIndices(window, points, windowX)
+    return start + minMaxIndices(window, points)
@@ -1,630 +1,714 @@
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from scipy import stats
 import streamlit as st
 import plotly.graph_objects as go
 
-def electricModel(energy_file, temp_file, date_range, column_name, retro, cost, year, customCOP, customEER):
+from modelEngine import months
+from pipeline import modelPipeline
+from uncertainty import Uncertainty, monteCarlo
+from downsample import downsampleIndices
+from instrumentation import stage
+from thermalMass import rcScenarios
+from heatPumpSizing import EquipmentCost, sizingSweep, dispatchLoads, hourlyTotal, nominalTons
+from weatherEnsemble import runEnsemble
+from hpCatalog import catalogModels
+from ingestCache import cachedTemperature
+
+# Hourly charts draw WebGL traces, downsampled to a fixed number of points per trace.
+# Only the zoom window is sent, so narrowing it brings back full hourly detail.
+resolutions = {"Downsampled (LTTB)": 'lttb', "Downsampled (Min/Max)": 'minmax', "Full detail": None}
+
+def hourlyPoints(y, method, points, window):
+  if method is None:
+    return np.arange(window[0], window[1] + 1)
+  return downsampleIndices(y, points, method, window[0], window[1] + 1)
+
+def showChart(fig, name):
+  # Plotly serialization is timed as its own stage
+  with stage(f'render {name}'):
+    st.plotly_chart(fig, use_container_width=True)
+
+def electricModel(energy_file, temp_file, date_range, column_name, retro, cost, year, customCOP, customEER, inputs=None, curveKind='linear', tariff=None,
+                  unit=None, efficiency=1.0, fuelCost=None, weather_file=None, utcOffset=0):
 
   if customCOP == 1 and customEER == 1:
-    from CustomHP import COP, EER
-  
+    from CustomHP import COP, EER, defaultCapacity as capacity
+
   else:
-    from CustomHP import customCOPslope, customCOPintercept, customEERslope, customEERintercept
-    customCOPfile = pd.read_csv(customCOP)
-    def COP(T):
-      return customCOPslope(customCOPfile) * T + customCOPintercept(customCOPfile)
-    
-    customEERfile = pd.read(customEER)
-    def EER(T):
-      return customEERslope(customEERfile) * T + customEERintercept(customEERfile)
-
-
-
-
-  
-  data = pd.read_csv(energy_file)
-  tempData = pd.read_csv(temp_file)
-  
-  ### Import Energy Usage
-  
-  
-  
-  # Generate datetime index. Had to use 2023 since 2024 had a leap year, but we removed leap year from meter data
-  data.insert(0, 'DATE', date_range.date)
-  data.insert(1, 'TIME', date_range.time)
-  
-  data['DATE'] = pd.to_datetime(data['DATE'], format='%Y-%m-%d')
-  data['TIME'] = pd.to_datetime(data['TIME'], format='%H:%M:%S')
-  
-  
-  data['HourOfYear'] = data['TIME'].dt.hour
-  data['DayOfYear'] = data['DATE'].dt.dayofyear
-  
-          
-  # Remove Unnamed Columns
-  cols_to_drop = [3,4,5,6,7,8]
-  cols_to_drop = [i for i in cols_to_drop if i < len(data.columns)]
-  data.drop(data.columns[cols_to_drop], axis=1, inplace=True)
-  
-  energy = data[f'{column_name}'] * 0.25
-  data.insert(3, 'Energy', energy)
-  
-  
-  
-  
-  
-  
-      ### Import Temp Data
-  
-  
-  
-  tempData['TAVG'] = ( tempData['TMAX'] + tempData['TMIN'] ) / 2
-  
-  
-  
-  
-  
-    ###  Manipulate Energy Data & Temp Data
-  
-  
-  
-  
-  # Conver to Datetime
-  data['DATE'] = pd.to_datetime(data['DATE'], format='%Y-%m-%d')
-  data['TIME'] = pd.to_datetime(data['TIME'], format='%H:%M:%S')
-  tempData['DATE'] = pd.to_datetime(tempData['DATE'])
-  
-  data['HourOfYear'] = data['TIME'].dt.hour
-  data['DayOfYear'] = data['DATE'].dt.dayofyear
-  
-  # Group 15 minute energy data by hour in year
-  hourlyEnergy = data.groupby(['DayOfYear', 'HourOfYear'])['Energy'].sum().reset_index()
-  
-  hourlyEnergy['DayOfYear'] = pd.to_datetime(hourlyEnergy['DayOfYear'], format='%j')
-  
-  hourlyEnergy['month'] = hourlyEnergy['DayOfYear'].dt.month
-  
-  monthlyEnergy = hourlyEnergy.groupby('month')['Energy'].mean()
-  monthlyEnergyTotal = hourlyEnergy.groupby('month')['Energy'].sum()
-  
-  # Group temperature values by month and take average
-  tempData['tempMonths'] = tempData['DATE'].dt.month
-  monthlyTemp = tempData.groupby('tempMonths')['TAVG'].mean()
-  
-  hourlyEnergy['month_day'] = pd.to_datetime(hourlyEnergy['DayOfYear']).dt.strftime('%m-%d')
-  tempData['month_day'] = pd.to_datetime(tempData['DATE']).dt.strftime('%m-%d')
-  
-  fig, ax = plt.subplots(figsize=(12,6))
-  
-  ax.scatter(monthlyTemp.values, monthlyEnergy)
-  ax.set_xlabel("Monthly Average Temperature (°F)")
-  ax.set_ylabel("Avg Hourly Electricity for Month (kWh)")
-  ax.set_title(f'Energy Demand vs. Temperature in {year}')
-  
-  st.pyplot(fig)
-  
+    # Parsed and fit once per file, then evaluated over whole arrays
+    from CustomHP import copCurve, eerCurve, capacityCurve
+    COP = copCurve(customCOP, curveKind)
+    EER = eerCurve(customEER, curveKind)
+    capacity = capacityCurve(customEER, curveKind)
+
+
+
+
+  ### Import Energy Usage & Temp Data
+
+  # All parsing, aggregation and simulation happens in the model pipeline, this function only renders.
+  # The pipeline lives in the session, so a rerun only recomputes the stages whose inputs
+  # changed (see pipeline.py). Saved buildings from projectStore pass their inputs in directly
+  if 'modelPipeline' not in st.session_state:
+    st.session_state['modelPipeline'] = modelPipeline()
+  pipeline = st.session_state['modelPipeline']
+
+  pipeline.set(aggregation=inputs)
+  uploaded = inputs is None
+  if uploaded:
+    pipeline.set(energy_file=energy_file, temp_file=temp_file, column_name=column_name, date_range=date_range, unit=unit,
+                 weather_file=weather_file, utcOffset=utcOffset)
+  with stage('load inputs'):
+    inputs = pipeline.get('aggregation')
+
+  # Observed hourly temperatures (ISD/ISD-Lite) replace the sinusoid, which still fills long gaps
+  observedWeather = uploaded and weather_file is not None
+  if observedWeather:
+    observed = pipeline.get('weather')
+    st.caption(f"Hourly temperatures: {observed.observed} hours observed, {observed.interpolated} interpolated, "
+               f"{observed.missing} from the daily sinusoid")
+
+  # Time-of-use/tiered rates are compiled for this year's hours. The sweep, catalog and
+  # uncertainty views use the tariff's effective $/kWh for the original usage.
+  pipeline.set(tariffFile=tariff)
+  tariff = pipeline.get('tariff')
+  if tariff is not None:
+    cost = tariff.averagePrice(inputs.energy)
+    st.caption(f"Tariff: {tariff.name} (effective ${cost:.4f}/kWh for the original usage)")
+
+  # Gas bills run through the same pipeline in kWh-equivalent, see pages/page1.py
+  gas = fuelCost is not None
+  usage = 'Energy' if gas else 'Electricity'    # Gas charts are gas plus the heat pump's electricity
+  kWh = 'kWh-equivalent' if gas else 'kWh'
+  if gas:
+    st.caption(f"Gas is shown in kWh-equivalent. Heat pump scenarios are the gas left for the base load plus the heat pump's "
+               f"electricity, replacing a {efficiency:.0%} efficient furnace.")
+
+  monthlyTemp = inputs.monthlyTemp
+  monthlyEnergy = inputs.monthlyEnergy
+  monthlyEnergyTotal = inputs.monthlyEnergyTotal
+  hoursInYear = inputs.hoursInYear
+
+  # Plotly like the rest of the page, matplotlib is no longer needed
+  fig = go.Figure(go.Scatter(x=monthlyTemp.values, y=monthlyEnergy, mode='markers', name='Months',
+                             hovertemplate='Temperature: %{x:.1f} °F<br>Energy: %{y:.2f} ' + kWh + '<extra></extra>'))
+  fig.update_layout(
+      title=f'Energy Demand vs. Temperature in {year}',
+      xaxis_title="Monthly Average Temperature (°F)",
+      yaxis_title=f"Avg Hourly {usage} for Month ({kWh})",
+  )
+
+  showChart(fig, 'energy scatter')
+
       ### Separating Heating from Base Energy Usage
-  
+
   st.subheader('Separating Heating from Base Energy Usage')
-  
-  
-  splitTemp = st.number_input("Enter a temperature value (\u00b0F) that is between the heating and base loads:")
-  
-  
-  
+
+
   x1 = np.array(monthlyTemp.values)
   y1 = np.array(monthlyEnergy)
-  
+
+  # Best split between the heating and base load lines, found from every candidate at once
+  autoSplit, changePointFit = pipeline.get('balancePoint')
+
+  splitTemp = st.number_input("Enter a temperature value (°F) that is between the heating and base loads:",
+                              value=round(float(autoSplit.splitTemp), 1))
+
+  st.caption(f"Detected balance point: {autoSplit.splitTemp:.1f} °F (R² = {autoSplit.r2:.3f}, CV(RMSE) = {autoSplit.cvrmse:.1%}). "
+             f"Best ASHRAE change-point model: {changePointFit.model} at "
+             f"{', '.join(f'{b:.1f} °F' for b in changePointFit.breakpoints)} (R² = {changePointFit.r2:.3f}, CV(RMSE) = {changePointFit.cvrmse:.1%})")
+
+  pipeline.set(splitTemp=splitTemp)
+  fit = pipeline.get('loadFit')
+
   tempValues1 = x1[(x1 <= splitTemp)]
-  energyValues1 = y1[(x1 <= splitTemp)]
   tempValues2 = x1[(x1 >= splitTemp)]
-  energyValues2 = y1[(x1 >= splitTemp)]
-  
-  fit1 = stats.linregress(tempValues1, energyValues1)
-  line1 = fit1.slope*tempValues1 + fit1.intercept
-  fit2 = stats.linregress(tempValues2, energyValues2)
-  line2 = fit2.slope*tempValues2 + fit2.intercept
-  
-  
-  fig1, ax = plt.subplots(figsize=(12,6))
-  ax.scatter(x1, y1, color = 'b')
-  ax.plot(tempValues1, line1, label = f'Heating Load, Slope = {fit1.slope:.2f}, Intercept = {fit1.intercept:.2f}', color = 'purple')
-  ax.plot(tempValues2, line2, label = f'Base Load, Slope = {fit2.slope:.2f}, Intercept = {fit2.intercept:.2f}', color = 'green')
-  ax.legend()
-  ax.set_xlabel("Monthly Average Temperature (°F)")
-  ax.set_ylabel("Avg Hourly Electricity for Month (kWh)")
-  ax.set_title(f'Energy Demand vs. Temperature in {year}')
-  
-  st.pyplot(fig1)
-  
-  hourlyEnergy['heatUsage'] = np.where(hourlyEnergy['Energy'] - fit2.intercept < 0, 0, hourlyEnergy['Energy'] - fit2.intercept)
-  hourlyEnergy['lighting'] = hourlyEnergy['Energy'] - hourlyEnergy['heatUsage']
-  
-  hourlyEnergy['month'] = hourlyEnergy['DayOfYear'].dt.month
-  
-  monthlyEnergyHeating = hourlyEnergy.groupby('month')['heatUsage'].mean()
-  monthlyEnergyLighting = hourlyEnergy.groupby('month')['lighting'].mean()
-  
-  monthlyEnergyHeatingTotal = hourlyEnergy.groupby('month')['heatUsage'].sum()
-  monthlyEnergyLightingTotal = hourlyEnergy.groupby('month')['lighting'].sum()
-  
-  
-  
-  
-  
-  
-  
-    ###  Merge Temp Data to get hourly temps (just makes daily temps equal to hourly)
-  
-  
-  
-  
-  merged = pd.merge(hourlyEnergy, tempData, how='left', on='month_day')
-  
-  
-  
-  
-  
-  
-    ###  Create Sinusoidal Model of Data
-  
-  
-  
-  
-  hourlyTempAvg = merged['TAVG']
-  delta_Tday = merged['TMAX']- merged['TMIN']
-  hoursInYear = np.arange(0, 8760, 1)
-  
-  sinT =  hourlyTempAvg - delta_Tday*np.cos((2*np.pi*hoursInYear)/24)
-  
-  fig = go.Figure()
-  
-  fig.add_trace(go.Scatter(
-      x=hoursInYear,
-      y=sinT,
-      mode='markers',
-      marker=dict(symbol='x', color='blue'),
-      name='Sinusoidal Temp',
-      hovertemplate='Hour: %{x}<br>Temp: %{y:.2f} °F'
-  ))
-  
-  fig.update_layout(
-      title='Sinusoidal Model of Hourly Outdoor Temperature',
-      xaxis_title='Hour in Year',
-      yaxis_title='Outside Temp (°F)',
-      width=1000,
-      height=500
+  line1 = fit.heatSlope*tempValues1 + fit.heatIntercept
+  line2 = fit.baseSlope*tempValues2 + fit.baseIntercept
+
+
+  fig1 = go.Figure()
+  fig1.add_trace(go.Scatter(x=x1, y=y1, mode='markers', name='Months', marker=dict(color='blue'),
+                            hovertemplate='Temperature: %{x:.1f} °F<br>Energy: %{y:.2f} ' + kWh + '<extra></extra>'))
+  fig1.add_trace(go.Scatter(x=tempValues1, y=line1, mode='lines', line=dict(color='purple'),
+                            name=f'Heating Load, Slope = {fit.heatSlope:.2f}, Intercept = {fit.heatIntercept:.2f}'))
+  fig1.add_trace(go.Scatter(x=tempValues2, y=line2, mode='lines', line=dict(color='green'),
+                            name=f'Base Load, Slope = {fit.baseSlope:.2f}, Intercept = {fit.baseIntercept:.2f}'))
+  fig1.update_layout(
+      title=f'Energy Demand vs. Temperature in {year}',
+      xaxis_title="Monthly Average Temperature (°F)",
+      yaxis_title=f"Avg Hourly {usage} for Month ({kWh})",
   )
-  
-  st.plotly_chart(fig, use_container_width=True)
-  
-  
-  
-  
-  
-  
-  
-    ###  Create EER Function & Cooling Model
-  
-  from scipy.optimize import fsolve
-  
-  def coolingModel(T):
-      return 2*abs(fit1.slope*T + fit1.intercept)
-  
-  def heating(T):
-      return (fit1.slope*T + fit1.intercept)
-  
+
+  showChart(fig1, 'load lines')
+
+
+
+
   st.subheader("Customize Comfort Settings")
-  
-  x_intercept_cool = int(fsolve(coolingModel, 70))
-  x_intercept_heat = int(fsolve(heating, 60))
-  
-  heatingTemp = st.number_input("Enter heating setpoint temperature (\u00b0F):", min_value=5, max_value=x_intercept_heat, value=x_intercept_heat)
-  coolingTemp = st.number_input("Enter cooling setpoint temperature (\u00b0F):", min_value=x_intercept_cool, max_value=90, value=x_intercept_cool)
-  
-  
-  
-  
-  
-  
-  coolingEnergy = []
-  
-  for temp in sinT:
-      if temp <= coolingTemp:
-          coolingEnergy.append(0)
-      else:
-          coolingEnergy.append(coolingModel(temp))
-  
-  
-  coolingEnergyPump = (coolingEnergy / EER(sinT))*3.412
-  merged['coolingHourlyPump'] = coolingEnergyPump
-  
-  monthlyCooling = merged.groupby('month')['coolingHourlyPump'].sum()
-  
-  
-  
-  
-  
-  
-  
-    #  Create COP Function & Heating Model
-  
-  
-  
-  
-  
-  
-  
-  
-  
-  heatingEnergy = [] # Total energy used on at heating temps
-  
-  for temp in sinT:
-      if temp > heatingTemp:
-          heatingEnergy.append(int(fit2.intercept))
-      else:
-          heatingEnergy.append(heating(temp))
-  
-  
-  merged['heatingEnergy'] = heatingEnergy
-  monthlyModelTotal = merged.groupby('month')['heatingEnergy'].sum()
-  
-  heatingModel  = [] # Energy used for heating 
-  
-  for heating in heatingEnergy:
-      if heating - int(fit2.intercept) < 0:
-          heatingModel.append(0)
-      else:
-          heatingModel.append(heating-int(fit2.intercept))
-  
-  heatingEnergy = np.array(heatingEnergy)
-  heatingModel = np.array(heatingModel)
-  
-  merged['heatingModel'] = heatingModel
-  monthlyHeating = merged.groupby('month')['heatingModel'].sum()
-  
-  lightingModel = heatingEnergy - heatingModel
-  
-  merged['lightingModel'] = lightingModel
-  monthlyLightingModel = merged.groupby('month')['lightingModel'].sum()
-  
-  
-  heatingPump = heatingModel / COP(sinT)
-  merged['heatingPump'] = heatingPump
-  monthlyHeatingPump = merged.groupby('month')['heatingPump'].sum()
-  
-  totalModelOne = monthlyHeating + monthlyLightingModel # Monthly Heating Model Total
-  totalModelTwo = monthlyHeatingPump + monthlyLightingModel # Monthly Heating Model w/ heat pump, no cooling
-  totalModelThree = totalModelTwo + monthlyCooling # Monthly Heating Model w/ heat pump including cooling
-  
-  hourlyModelOne = heatingEnergy
-  hourlyModelTwo = heatingPump + lightingModel
-  hourlyModelThree = hourlyModelTwo + coolingEnergyPump
-  
-  
-  
-  
-  
-    #  Define Comfort, costs, and retrofit values
-  
-  
-  months = ['January', 'Febuary', 'March', 'April', 'May', 'June', 'July',
-            'August', 'September', 'October', 'November', 'December']
-  
-  
-  noComfortHeat = hourlyEnergy['heatUsage']
-  noComfortLight = hourlyEnergy['lighting']
-  
-  noComfortPump = noComfortHeat / COP(hourlyTempAvg)
-  
-  noComfortTotal = noComfortPump + noComfortLight
-  
-  merged['noComfortTotal'] = noComfortTotal
-  monthlyNoComfort = merged.groupby('month')['noComfortTotal'].sum()
-      
-      
-  
-  
+
+  x_intercept_cool = fit.heatingZero()
+  x_intercept_heat = fit.heatingZero()
+
+  heatingTemp = st.number_input("Enter heating setpoint temperature (°F):", min_value=5, max_value=x_intercept_heat, value=x_intercept_heat)
+  coolingTemp = st.number_input("Enter cooling setpoint temperature (°F):", min_value=x_intercept_cool, max_value=90, value=x_intercept_cool)
+
+  pipeline.set(heatingTemp=heatingTemp, coolingTemp=coolingTemp, COP=COP, EER=EER, efficiency=efficiency,
+               retro=retro, cost=cost, fuelCost=fuelCost)
+  result = pipeline.get('costing')
+
+  # The sweep, catalog and Monte Carlo price every kWh at the electricity cost, so they're electric only.
+  # Expanders run their contents even when closed, so the heavy sections only compute once switched on
+  if not gas:
+    with st.expander("Explore all setpoint combinations"):
+      if st.checkbox("Compute the setpoint sweep", key='runSweep'):
+        with stage('setpoint sweep'):
+          sweep = pipeline.get('sweep')
+        bestHeat, bestCool, bestSavings = sweep.best()
+
+        fig = go.Figure(go.Heatmap(
+            x=sweep.coolingTemps,
+            y=sweep.heatingTemps,
+            z=sweep.savingsCost,
+            colorscale='RdYlGn',
+            colorbar=dict(title='Annual Savings ($)'),
+            customdata=sweep.annualKWh,
+            hovertemplate='Heating: %{y} °F<br>Cooling: %{x} °F<br>Savings: $%{z:.2f}<br>Usage: %{customdata:.0f} kWh<extra></extra>'
+        ))
+
+        fig.update_layout(
+            title='Annual Savings with Heat Pump & Comfort Control',
+            xaxis_title='Cooling Setpoint (°F)',
+            yaxis_title='Heating Setpoint (°F)',
+            width=1000,
+            height=500
+        )
+
+        showChart(fig, 'setpoint heatmap')
+        st.write(f'Highest savings: ${bestSavings:.2f}/year at heating {bestHeat} °F and cooling {bestCool} °F')
+
+  # Catalog curves and their hourly runs stay in the pipeline, a price change only reprices them.
+  # Listing the models is enough for the expander, the curves are read once the ranking is switched on
+  models = catalogModels()
+  if models and not gas:
+    with st.expander(f"Compare {len(models)} catalog heat pumps"):
+      if st.checkbox("Rank the catalog for this building", key='runCatalog'):
+        pipeline.set(curveKind=curveKind)
+        with stage('catalog ranking', len(models)):
+          ranking = pipeline.get('ranking')
+        st.dataframe(ranking.rename(columns={
+            'model': 'Model',
+            'comfortKWh': 'Comfort kWh/yr',
+            'comfortCost': 'Comfort Cost ($/yr)',
+            'comfortSavings': 'Comfort Savings ($/yr)',
+            'noComfortKWh': 'No Comfort kWh/yr',
+            'noComfortCost': 'No Comfort Cost ($/yr)',
+            'noComfortSavings': 'No Comfort Savings ($/yr)',
+        }), use_container_width=True)
+
+
+
+
+    ###  Sinusoidal Model of Data
+
+
+  resolution = st.selectbox("Hourly chart resolution", list(resolutions))
+  method = resolutions[resolution]
+  chartPoints = int(st.number_input("Points drawn per hourly trace", min_value=200, max_value=20000, value=2000, step=100))
+  lastHour = len(hoursInYear) - 1
+
+  # Reruns on its own when the window changes
+  @st.fragment
+  def temperatureChart():
+    sinWindow = st.slider("Hours shown (temperature)", min_value=0, max_value=lastHour, value=(0, lastHour))
+    shown = hourlyPoints(result.sinT, method, chartPoints, sinWindow)
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scattergl(
+        x=hoursInYear[shown],
+        y=result.sinT[shown],
+        mode='markers',
+        marker=dict(symbol='x', color='blue'),
+        name='Observed Temp' if observedWeather else 'Sinusoidal Temp',
+        hovertemplate='Hour: %{x}<br>Temp: %{y:.2f} °F'
+    ))
+
+    fig.update_layout(
+        title='Observed Hourly Outdoor Temperature' if observedWeather else 'Sinusoidal Model of Hourly Outdoor Temperature',
+        xaxis_title='Hour in Year',
+        xaxis_range=list(sinWindow),
+        yaxis_title='Outside Temp (°F)',
+        width=1000,
+        height=500
+    )
+
+    showChart(fig, 'temperature chart')
+
+  temperatureChart()
+
+
+
+
+
    #   Summary Plot
-  
-  
-  
+
+
+
   width = 1.4
   x = np.arange(len(months)) * 6
-  
+
   fig = go.Figure()
-  
+
   fig.add_bar(
       x=x - 1.2 * width,
-      y=monthlyEnergyTotal * cost,
+      y=result.monthlyCost(),
       width=width,
-      name='Original Electricity Usage',
+      name=f'Original {usage} Usage',
       marker=dict(color='limegreen', line=dict(color='black', width=1))
   )
-  
+
   fig.add_bar(
       x=x,
-      y=monthlyNoComfort * cost,
+      y=result.monthlyCost("No Comfort Mode"),
       width=width,
-      name='Electricity Usage after Installing a Heat Pump',
+      name=f'{usage} Usage after Installing a Heat Pump',
       marker=dict(color='salmon', line=dict(color='black', width=1))
   )
-  
+
   fig.add_bar(
       x=x + 1.2 * width,
-      y=totalModelThree * cost,
+      y=result.monthlyCost("Comfort Mode"),
       width=width,
-      name='Electricity Usage with Heat Pump & Comfort Control',
+      name=f'{usage} Usage with Heat Pump & Comfort Control',
       marker=dict(color='deepskyblue', line=dict(color='black', width=1))
   )
-  
+
   fig.update_layout(
-      title='Monthly Electricity Usage Summary',
+      title=f'Monthly {usage} Cost Summary',
       xaxis=dict(
           tickmode='array',
           tickvals=x,
           ticktext=months
       ),
-      yaxis_title='Monthly Electricity Usage (kWh)',
+      yaxis_title=f'Monthly {usage} Cost ($)',
       barmode='group',
       legend_title_text='Scenario',
       width=1000,
       height=500
   )
-  
-  st.plotly_chart(fig, use_container_width=True)
-  
-  
-  
-  
-  
-  
-  
-  
-  st.subheader("Select Monthly Energy Scenarios to Compare")
-  
-  st.markdown('Comfort = Maintaining Building Between Temperature Setpoints')
-  
-  show_retrofit = st.checkbox("Include Retrofit")
-  show_heat_pump = st.checkbox("Include Heat Pump")
-  
-  heat_pump_mode = None
-  if show_heat_pump:
-      heat_pump_mode = st.radio("Select Heat Pump Mode", ["Comfort Mode", "No Comfort Mode"])
-  
-  fig = go.Figure()
-  
-  # Original baseline
-  fig.add_bar(x=months, y=monthlyEnergyTotal, name="Original Usage",
-              marker=dict(color='purple', line=dict(color='black', width=1)))
-  
-  # Heat pump scenarios
-  if show_heat_pump:
-      if heat_pump_mode == "No Comfort Mode":
-          y_vals = monthlyNoComfort * (1 - retro) if show_retrofit else monthlyNoComfort
-          label = "Heat Pump (No Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
-          fig.add_bar(x=months, y=y_vals, name=label,
-          marker=dict(color='salmon', line=dict(color='black', width=1)))
-  
-      elif heat_pump_mode == "Comfort Mode":
-          y_vals = totalModelThree * (1 - retro) if show_retrofit else totalModelThree
-          label = "Heat Pump (Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
-          fig.add_bar(x=months, y=y_vals, name=label,
-          marker=dict(color='deepskyblue', line=dict(color='black', width=1)))
-  
-  # Retrofit-only (only if heat pump NOT selected)
-  if show_retrofit and not show_heat_pump:
-      fig.add_bar(x=months, y=monthlyEnergyTotal * (1 - retro), name="Retrofit Only",
-      marker=dict(color='deepskyblue', line=dict(color='black', width=1)))
-  
-  fig.update_layout(
-      title='Electricity Usage Comparison',
-      yaxis_title='Monthly Electricity Usage (kWh)',
-      barmode='group',
-      legend_title_text='Scenario'
-  )
-  
-  st.plotly_chart(fig, use_container_width=True)
-  
-  
-  
-  
-  
-  
-  
-  st.subheader("Select Hourly Energy Scenarios to Compare")
-  st.markdown("""
-              **Comfort = Maintaining Building Between Temperature Setpoints**
-              
-              **Hover over graph to see corresponding week!**
-              
-              """)
-  
-  show_retrofit = st.checkbox("Include Retrofit (hourly)")
-  show_heat_pump = st.checkbox("Include Heat Pump (hourly)")
-  
-  
-  hourly_timestamps = pd.date_range(start=f'{year}-01-01', periods=len(hourlyEnergy), freq='H')
-  weeks = hourly_timestamps.isocalendar().week.values
-  
-  
-  heat_pump_mode = None
-  if show_heat_pump:
-      heat_pump_mode = st.radio("Select Hourly Heat Pump Mode", ["Comfort Mode", "No Comfort Mode"])
-  
-  fig = go.Figure()
-  
-  # Original baseline
-  fig.add_trace(go.Scatter(
-      x=hoursInYear,
-      y=hourlyEnergy['Energy'].values,
-      mode='lines',
-      name="Original Usage",
-      line=dict(color='purple'),
-      customdata=np.stack([weeks], axis=-1),
-      hovertemplate='Hour: %{x}<br>Usage: %{y:.2f} kWh<br>Week: %{customdata[0]}<extra></extra>'
-  ))
-  
-  # Heat pump scenarios
-  if show_heat_pump:
-      if heat_pump_mode == "No Comfort Mode":
-          y_vals = noComfortTotal * (1 - retro) if show_retrofit else noComfortTotal
-          label = "Heat Pump (No Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
-          fig.add_trace(go.Scatter(
-              x=hoursInYear,
-              y=y_vals,
-              mode='lines',
-              name=label,
-              line=dict(color='salmon'),
-              customdata=np.stack([weeks], axis=-1),
-              hovertemplate='Hour: %{x}<br>Usage: %{y:.2f} kWh<br>Week: %{customdata[0]}<extra></extra>'
-          ))
-  
-      elif heat_pump_mode == "Comfort Mode":
-          y_vals = hourlyModelThree * (1 - retro) if show_retrofit else hourlyModelThree
-          label = "Heat Pump (Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
-          fig.add_trace(go.Scatter(
-              x=hoursInYear,
-              y=y_vals,
-              mode='lines',
-              name=label,
-              line=dict(color='deepskyblue'),
-              customdata=np.stack([weeks], axis=-1),
-              hovertemplate='Hour: %{x}<br>Usage: %{y:.2f} kWh<br>Week: %{customdata[0]}<extra></extra>'
-          ))
-  
-  # Retrofit-only (only if heat pump NOT selected)
-  if show_retrofit and not show_heat_pump:
-      fig.add_trace(go.Scatter(
-          x=hoursInYear,
-          y=hourlyEnergy['Energy'] * (1 - retro),
-          mode='lines',
-          name="Retrofit Only",
-          line=dict(color='lightgreen'),
-          customdata=np.stack([weeks], axis=-1),
-          hovertemplate='Hour: %{x}<br>Usage: %{y:.2f} kWh<br>Week: %{customdata[0]}<extra></extra>'
-      ))
-  
-  fig.update_layout(
-      title='Hourly Electricity Usage Comparison',
-      xaxis_title='Hour of Year',
-      yaxis_title='Electricity Usage (kWh)',
-      width=1000,
-      height=500,
-      legend_title_text='Scenario'
-  )
-  
-  st.plotly_chart(fig, use_container_width=True)
-  
-  
-  
-  
-  
-  
-  from plotly.subplots import make_subplots
-  
-  
-  st.subheader("Energy + Savings: Select Scenarios to Compare")
-  st.markdown("""
-              **Comfort = Maintaining Building Between Temperature Setpoints**
-              
-              Use Autoscale feature when changing configurations
-              
-              
-              """)
-  
-  show_retrofit = st.checkbox("Includes Retrofit")
-  show_heat_pump = st.checkbox("Includes Heat Pump")
-  
-  heat_pump_mode = None
-  if show_heat_pump:
-      heat_pump_mode = st.radio("Heat Pump Mode", ["Comfort Mode", "No Comfort Mode"])
-  
-  # Base values
-  baseline_energy = monthlyEnergyTotal
-  baseline_cost = monthlyEnergyTotal * cost
-  
-  # Decide which model and savings to show
-  selected_energy = None
-  selected_label = ""
-  savings = None
-  
-  if show_heat_pump:
-      if heat_pump_mode == "Comfort Mode":
-          selected_energy = totalModelThree
-          selected_label = "Energy Usage with Heat Pump (60-75°F)"
-          savings = (monthlyEnergyTotal - totalModelThree) * cost
-      elif heat_pump_mode == "No Comfort Mode":
-          selected_energy = monthlyNoComfort
-          selected_label = "Energy Usage with Heat Pump (No Comfort)"
-          savings = (monthlyEnergyTotal - monthlyNoComfort) * cost
-  
-      if show_retrofit:
-          selected_energy *= (1 - retro)
-          savings *= (1 - retro)
-          selected_label += " + Retrofit"
-  
-  elif show_retrofit and not show_heat_pump:
-      selected_energy = monthlyEnergyTotal * (1 - retro)
-      selected_label = "Energy Usage with Retrofit Only"
-      savings = monthlyEnergyTotal * cost * retro
-  
-  # Build figure
-  fig = make_subplots(specs=[[{"secondary_y": True}]])
-  
-  # Bar: Energy usage
-  if selected_energy is not None:
-      fig.add_trace(
-          go.Bar(
-              x=months,
-              y=selected_energy,
-              name=selected_label,
-              marker=dict(color='deepskyblue', line=dict(color='black', width=1)),
-              hovertemplate='Month: %{x}<br>Energy Usage: %{y:.1f} kWh<extra></extra>'
-          ),
-          secondary_y=False
-      )
-  
-  percent_savings = (monthlyEnergyTotal - totalModelThree) / monthlyEnergyTotal * 100
-  
-  # Line: Savings
-  if savings is not None:
-      fig.add_trace(
-          go.Scatter(
-              x=months,
-              y=savings,
-              name="Monthly Savings",
-              mode='lines+markers',
-              line=dict(color='black', width=3),
-              marker=dict(color='blueviolet', size=10),
-              hovertemplate='Month: %{x}<br>Savings: $%{y:.2f}<extra></extra>'
-          ),
-          secondary_y=True
+
+  showChart(fig, 'summary chart')
+
+
+
+
+
+
+
+
+  # Each scenario section reruns on its own and reads the already computed result
+  @st.fragment
+  def monthlyScenarios():
+    st.subheader("Select Monthly Energy Scenarios to Compare")
+
+    st.markdown('Comfort = Maintaining Building Between Temperature Setpoints')
+
+    show_retrofit = st.checkbox("Include Retrofit")
+    show_heat_pump = st.checkbox("Include Heat Pump")
+
+    heat_pump_mode = None
+    if show_heat_pump:
+        heat_pump_mode = st.radio("Select Heat Pump Mode", ["Comfort Mode", "No Comfort Mode"])
+
+    fig = go.Figure()
+
+    # Original baseline
+    fig.add_bar(x=months, y=monthlyEnergyTotal, name="Original Usage",
+                marker=dict(color='purple', line=dict(color='black', width=1)))
+
+    # Heat pump scenarios
+    if show_heat_pump:
+        if heat_pump_mode == "No Comfort Mode":
+            y_vals = result.scenario(heat_pump_mode, show_retrofit)
+            label = "Heat Pump (No Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
+            fig.add_bar(x=months, y=y_vals, name=label,
+            marker=dict(color='salmon', line=dict(color='black', width=1)))
+
+        elif heat_pump_mode == "Comfort Mode":
+            y_vals = result.scenario(heat_pump_mode, show_retrofit)
+            label = "Heat Pump (Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
+            fig.add_bar(x=months, y=y_vals, name=label,
+            marker=dict(color='deepskyblue', line=dict(color='black', width=1)))
+
+    # Retrofit-only (only if heat pump NOT selected)
+    if show_retrofit and not show_heat_pump:
+        fig.add_bar(x=months, y=result.scenario(None, True), name="Retrofit Only",
+        marker=dict(color='deepskyblue', line=dict(color='black', width=1)))
+
+    fig.update_layout(
+        title=f'{usage} Usage Comparison',
+        yaxis_title=f'Monthly {usage} Usage ({kWh})',
+        barmode='group',
+        legend_title_text='Scenario'
+    )
+
+    showChart(fig, 'monthly scenarios chart')
+
+  monthlyScenarios()
+
+
+
+
+
+  # Reruns on its own, see monthlyScenarios
+  @st.fragment
+  def hourlyScenarios():
+    st.subheader("Select Hourly Energy Scenarios to Compare")
+    st.markdown("""
+                **Comfort = Maintaining Building Between Temperature Setpoints**
+
+                **Hover over graph to see corresponding week!**
+
+                """)
+
+    show_retrofit = st.checkbox("Include Retrofit (hourly)")
+    show_heat_pump = st.checkbox("Include Heat Pump (hourly)")
+
+
+    hourly_timestamps = pd.date_range(start=f'{year}-01-01', periods=len(hoursInYear), freq='h')
+    weeks = hourly_timestamps.isocalendar().week.values
+
+
+    heat_pump_mode = None
+    if show_heat_pump:
+        heat_pump_mode = st.radio("Select Hourly Heat Pump Mode", ["Comfort Mode", "No Comfort Mode"])
+
+    usageWindow = st.slider("Hours shown (usage)", min_value=0, max_value=lastHour, value=(0, lastHour))
+
+    def usageTrace(y, name, color):
+        shown = hourlyPoints(y, method, chartPoints, usageWindow)
+        return go.Scattergl(
+            x=hoursInYear[shown],
+            y=y[shown],
+            mode='lines',
+            name=name,
+            line=dict(color=color),
+            customdata=weeks[shown],
+            hovertemplate='Hour: %{x}<br>Usage: %{y:.2f} ' + kWh + '<br>Week: %{customdata}<extra></extra>'
+        )
+
+    fig = go.Figure()
+
+    # Original baseline
+    fig.add_trace(usageTrace(result.hourlyOriginal, "Original Usage", 'purple'))
+
+    # Heat pump scenarios
+    if show_heat_pump:
+        if heat_pump_mode == "No Comfort Mode":
+            y_vals = result.scenario(heat_pump_mode, show_retrofit, hourly=True)
+            label = "Heat Pump (No Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
+            fig.add_trace(usageTrace(y_vals, label, 'salmon'))
+
+        elif heat_pump_mode == "Comfort Mode":
+            y_vals = result.scenario(heat_pump_mode, show_retrofit, hourly=True)
+            label = "Heat Pump (Comfort) " + ("w/ Retrofit" if show_retrofit else "w/o Retrofit")
+            fig.add_trace(usageTrace(y_vals, label, 'deepskyblue'))
+
+    # Retrofit-only (only if heat pump NOT selected)
+    if show_retrofit and not show_heat_pump:
+        fig.add_trace(usageTrace(result.scenario(None, True, hourly=True), "Retrofit Only", 'lightgreen'))
+
+    fig.update_layout(
+        title=f'Hourly {usage} Usage Comparison',
+        xaxis_title='Hour of Year',
+        xaxis_range=list(usageWindow),
+        yaxis_title=f'{usage} Usage ({kWh})',
+        width=1000,
+        height=500,
+        legend_title_text='Scenario'
+    )
+
+    showChart(fig, 'hourly scenarios chart')
+
+  hourlyScenarios()
+
+
+  # Optional thermal mass model, reruns on its own like the scenario sections
+  @st.fragment
+  def thermalMassModel():
+    with st.expander("Thermal mass (RC) model"):
+      st.markdown("Indoor temperature carries over from hour to hour, the thermostat holds it between the indoor setpoints.")
+      if not st.checkbox("Run the thermal mass model", key='runThermalMass'):
+        return
+      tau = st.number_input("Building time constant (hours)", min_value=0.0, max_value=500.0, value=24.0)
+      indoorHeat = st.number_input("Indoor heating setpoint (°F)", min_value=40, max_value=80, value=68)
+      indoorCool = st.number_input("Indoor cooling setpoint (°F)", min_value=indoorHeat, max_value=95, value=max(75, indoorHeat))
+
+      with stage('thermal mass model', len(hoursInYear)):
+        rc = rcScenarios(result, tau, indoorHeat, indoorCool)
+
+      window = (0, lastHour)
+      fig = go.Figure()
+      for y, name, color in ((result.sinT, 'Outside Temp', 'blue'), (rc.thermal.indoorTemp, 'Indoor Temp', 'orangered')):
+        shown = hourlyPoints(y, method, chartPoints, window)
+        fig.add_trace(go.Scattergl(x=hoursInYear[shown], y=y[shown], mode='lines', name=name, line=dict(color=color),
+                                   hovertemplate='Hour: %{x}<br>Temp: %{y:.2f} °F<extra></extra>'))
+      fig.update_layout(title='Indoor Temperature with Thermal Mass', xaxis_title='Hour in Year', yaxis_title='Temp (°F)')
+      showChart(fig, 'thermal mass temperature')
+
+      fig = go.Figure()
+      fig.add_bar(x=months, y=monthlyEnergyTotal, name='Original Usage', marker=dict(color='purple'))
+      fig.add_bar(x=months, y=rc.monthly['resistive'], name='Resistive Heating with Thermal Mass', marker=dict(color='limegreen'))
+      fig.add_bar(x=months, y=result.totalModelThree, name='Heat Pump (Comfort), no Thermal Mass', marker=dict(color='deepskyblue'))
+      fig.add_bar(x=months, y=rc.monthly['heatPump'], name='Heat Pump with Thermal Mass', marker=dict(color='salmon'))
+      fig.update_layout(title=f'Monthly {usage} Usage with Thermal Mass', yaxis_title=f'Monthly {usage} Usage ({kWh})',
+                        barmode='group', legend_title_text='Scenario')
+      showChart(fig, 'thermal mass monthly')
+
+      st.write(f"Annual heating: {np.nansum(rc.thermal.heatingLoad):.0f} {kWh}, cooling: {np.nansum(rc.thermal.coolingLoad):.0f} {kWh} of heat, "
+               f"heat pump with thermal mass: {np.nansum(rc.heatPump):.0f} kWh")
+
+  thermalMassModel()
+
+
+  # Capacity-limited heat pump with backup strips, and the unit size with the lowest yearly cost
+  @st.fragment
+  def capacitySizing():
+    with st.expander("Heat pump capacity, backup strips and sizing"):
+      st.markdown("The heat pump only covers each hour's heating up to its capacity at that outdoor temperature, "
+                  "electric resistance strips make up the rest. Every size below is simulated in one pass.")
+      if not st.checkbox("Run the sizing sweep", key='runSizing'):
+        return
+      retention17 = st.number_input("Heating capacity at 17 °F (% of the 47 °F rating)", min_value=10, max_value=100, value=60) / 100
+      lockoutTemp = None
+      if st.checkbox("Lock out the heat pump below an outdoor temperature"):
+        lockoutTemp = st.number_input("Lockout temperature (°F)", min_value=-40, max_value=50, value=0)
+      equipment = EquipmentCost(
+        fixed=st.number_input("Installed cost, fixed part ($)", min_value=0.0, value=4000.0, step=500.0),
+        perTon=st.number_input("Installed cost per ton ($)", min_value=0.0, value=2500.0, step=100.0),
+        lifetime=st.number_input("Unit lifetime (years)", min_value=1.0, value=15.0),
       )
-  
-  
-  
-  fig.update_layout(
-      title='Electricity Usage & Savings Comparison',
-      barmode='group',
-      width=1000,
-      height=600,
-      legend_title_text='Scenario',
-      xaxis=dict(tickmode='array', tickvals=months, ticktext=months, tickangle=45, tickfont=dict(size=15))
-  )
-  
-  fig.update_yaxes(
-      title_text="Energy Usage (kWh)",
-      secondary_y=False,
-      tickfont=dict(size=15),
-      range=[0, 5500]
-  )
-  fig.update_yaxes(
-      title_text="Monthly Savings ($)",
-      secondary_y=True,
-      tickfont=dict(size=15)
-  )
-  
-  st.plotly_chart(fig, use_container_width=True)
+
+      with stage('capacity sizing', len(hoursInYear)):
+        sizing = sizingSweep(result, capacity, retention17=retention17, lockoutTemp=lockoutTemp, equipment=equipment)
+      best = sizing.best
+
+      fig = go.Figure()
+      for column, name, color in (('totalCost', 'Energy + Equipment', 'black'), ('energyCost', 'Energy', 'deepskyblue'),
+                                  ('equipmentCost', 'Equipment', 'salmon')):
+        fig.add_trace(go.Scatter(x=sizing.table['tons'], y=sizing.table[column], mode='lines+markers', name=name,
+                                 line=dict(color=color), hovertemplate='%{x:.2f} tons<br>$%{y:.2f}/yr<extra></extra>'))
+      fig.add_vline(x=best['tons'], line_dash='dash', line_color='green')
+      fig.update_layout(title='Yearly Cost by Heat Pump Size', xaxis_title='Nominal Size (tons)', yaxis_title='Cost ($/yr)')
+      showChart(fig, 'sizing chart')
+
+      st.write(f"Lowest yearly cost: {best['tons']:.2f} tons (${best['totalCost']:.2f}/yr), strips carry "
+               f"{best['backupShare']:.1%} of the heating. The curve's unit is {nominalTons(capacity):.2f} tons.")
+      st.dataframe(sizing.table.rename(columns={
+          'tons': 'Size (tons)',
+          'heatPumpKWh': 'Heat Pump kWh/yr',
+          'backupKWh': 'Backup Strips kWh/yr',
+          'backupShare': 'Heating from Strips',
+          'unmetCoolingKWh': 'Unmet Cooling kWh/yr',
+          'energyCost': 'Energy Cost ($/yr)',
+          'equipmentCost': 'Equipment Cost ($/yr)',
+          'totalCost': 'Total Cost ($/yr)',
+      }), use_container_width=True)
+
+      # One size in detail, the sweep's pick unless another is entered
+      tons = st.number_input("Size to show by month (tons)", min_value=0.25, value=float(best['tons']), step=0.25)
+      dispatch = dispatchLoads(result, tons, capacity, retention17, lockoutTemp)
+      fig = go.Figure()
+      fig.add_bar(x=months, y=result.totalModelThree, name='Heat Pump (Comfort), unlimited capacity', marker=dict(color='deepskyblue'))
+      fig.add_bar(x=months, y=inputs.monthlySum(hourlyTotal(result, dispatch)), name=f'{tons:.2f} ton Heat Pump + Strips',
+                  marker=dict(color='salmon'))
+      fig.add_bar(x=months, y=inputs.monthlySum(dispatch.backupHeat), name='of which Backup Strips', marker=dict(color='orangered'))
+      fig.update_layout(title='Monthly Usage with a Capacity-Limited Heat Pump', yaxis_title=f'Monthly Usage ({kWh})',
+                        barmode='group', legend_title_text='Scenario')
+      showChart(fig, 'backup strips monthly')
+
+  capacitySizing()
+
+
+  # Same calibrated building against every year of a long daily temperature history
+  @st.fragment
+  def weatherEnsemble():
+    with st.expander("Weather-year ensemble"):
+      st.markdown("Runs the comfort model for this building against every year of a NOAA daily history (e.g. 30 years "
+                  "of the same station), for typical-year and worst-year numbers. Costs are modeled for both sides.")
+      history_file = st.file_uploader("Upload a multi-year NOAA daily CSV (DATE, TMAX, TMIN)", type='csv', key='historyFile')
+      if history_file is None:
+        return
+      workers = int(st.number_input("Worker processes (years are split between them)", min_value=1, max_value=64, value=1))
+      if not st.checkbox("Run the ensemble", key='runEnsemble'):
+        return
+
+      ensemble = runEnsemble(result, cachedTemperature(history_file), workers=workers)
+      annual = ensemble.annual
+      if ensemble.weather.skipped:
+        st.caption(f"Skipped years with too few days: {', '.join(map(str, ensemble.weather.skipped))}")
+
+      fig = go.Figure(go.Histogram(x=annual['savings'], nbinsx=min(len(annual), 30), marker=dict(color='blueviolet'),
+                                   hovertemplate='Savings: $%{x}<br>Years: %{y}<extra></extra>'))
+      for p, dash in (('P10', 'dot'), ('P50', 'dash'), ('P90', 'dot')):
+        fig.add_vline(x=ensemble.percentiles.loc[p, 'savings'], line_dash=dash, annotation_text=p)
+      fig.update_layout(title=f'Annual Comfort Mode Savings over {len(annual)} Weather Years',
+                        xaxis_title='Annual Savings ($)', yaxis_title='Years')
+      showChart(fig, 'ensemble savings')
+
+      typical, worst = ensemble.typicalYear, ensemble.worstYear
+      st.write(f"Typical year: {typical} (${annual.loc[typical, 'savings']:.2f} savings), "
+               f"worst year: {worst} (${annual.loc[worst, 'savings']:.2f} savings)")
+
+      labels = {
+          'heatingKWh': f'Heating {kWh}',
+          'coolingKWh': f'Cooling {kWh}',
+          'originalKWh': f'Original {kWh}',
+          'heatPumpKWh': f'Heat Pump {kWh}',
+          'originalCost': 'Original Cost ($)',
+          'heatPumpCost': 'Heat Pump Cost ($)',
+          'savings': 'Savings ($)',
+      }
+      st.dataframe(ensemble.percentiles.rename(columns=labels), use_container_width=True)
+      st.dataframe(annual.rename(columns=labels), use_container_width=True)
+
+  weatherEnsemble()
+
+
+
+
+
+  from plotly.subplots import make_subplots
+
+
+  # Reruns on its own, see monthlyScenarios
+  @st.fragment
+  def savingsScenarios():
+    st.subheader("Energy + Savings: Select Scenarios to Compare")
+    st.markdown("""
+                **Comfort = Maintaining Building Between Temperature Setpoints**
+
+                Use Autoscale feature when changing configurations
+
+
+                """)
+
+    show_retrofit = st.checkbox("Includes Retrofit")
+    show_heat_pump = st.checkbox("Includes Heat Pump")
+
+    heat_pump_mode = None
+    if show_heat_pump:
+        heat_pump_mode = st.radio("Heat Pump Mode", ["Comfort Mode", "No Comfort Mode"])
+
+    # Decide which model and savings to show
+    selected_energy = None
+    selected_label = ""
+    savings = None
+
+    if show_heat_pump:
+        if heat_pump_mode == "Comfort Mode":
+            selected_label = "Energy Usage with Heat Pump (60-75°F)"
+        elif heat_pump_mode == "No Comfort Mode":
+            selected_label = "Energy Usage with Heat Pump (No Comfort)"
+
+        if heat_pump_mode is not None:
+            selected_energy = result.scenario(heat_pump_mode, show_retrofit)
+            savings = result.savings(heat_pump_mode, show_retrofit)
+
+        if show_retrofit:
+            selected_label += " + Retrofit"
+
+    elif show_retrofit and not show_heat_pump:
+        selected_energy = result.scenario(None, True)
+        selected_label = "Energy Usage with Retrofit Only"
+        savings = result.savings(None, True)
+
+    # Build figure
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # Bar: Energy usage
+    if selected_energy is not None:
+        fig.add_trace(
+            go.Bar(
+                x=months,
+                y=selected_energy,
+                name=selected_label,
+                marker=dict(color='deepskyblue', line=dict(color='black', width=1)),
+                hovertemplate='Month: %{x}<br>Energy Usage: %{y:.1f} ' + kWh + '<extra></extra>'
+            ),
+            secondary_y=False
+        )
+
+    # Line: Savings
+    if savings is not None:
+        fig.add_trace(
+            go.Scatter(
+                x=months,
+                y=savings,
+                name="Monthly Savings",
+                mode='lines+markers',
+                line=dict(color='black', width=3),
+                marker=dict(color='blueviolet', size=10),
+                hovertemplate='Month: %{x}<br>Savings: $%{y:.2f}<extra></extra>'
+            ),
+            secondary_y=True
+        )
+
+
+
+    fig.update_layout(
+        title=f'{usage} Usage & Savings Comparison',
+        barmode='group',
+        width=1000,
+        height=600,
+        legend_title_text='Scenario',
+        xaxis=dict(tickmode='array', tickvals=months, ticktext=months, tickangle=45, tickfont=dict(size=15))
+    )
+
+    fig.update_yaxes(
+        title_text=f"Energy Usage ({kWh})",
+        secondary_y=False,
+        tickfont=dict(size=15),
+        range=[0, 5500]
+    )
+    fig.update_yaxes(
+        title_text="Monthly Savings ($)",
+        secondary_y=True,
+        tickfont=dict(size=15)
+    )
+
+    showChart(fig, 'savings chart')
+
+    # Spread of the savings when the uncertain inputs are sampled together
+    if heat_pump_mode is not None and not gas:
+      with st.expander("Savings uncertainty (Monte Carlo)"):
+        if not st.checkbox("Run the Monte Carlo", key='runMonteCarlo'):
+          return
+        samples = int(st.number_input("Samples", min_value=100, max_value=100000, value=10000, step=1000))
+        spread = Uncertainty(
+          retroSpread=st.number_input("Retrofit % spread (±)", min_value=0.0, max_value=100.0, value=10.0) / 100,
+          coolingSpread=st.number_input("Cooling multiplier std. dev.", min_value=0.0, max_value=2.0, value=0.5),
+          copSpread=st.number_input("COP/EER curve std. dev. (%)", min_value=0.0, max_value=50.0, value=10.0) / 100,
+          costSpread=st.number_input("Cost per kWh std. dev. (%)", min_value=0.0, max_value=50.0, value=10.0) / 100,
+        )
+        spread.eerSpread = spread.copSpread
+
+        with stage('Monte Carlo savings', samples):
+          uncertain = monteCarlo(result, spread, samples, show_retrofit)
+        monthly = uncertain.monthly[heat_pump_mode]
+        annual = uncertain.annual[heat_pump_mode]
+
+        band = go.Figure()
+        band.add_trace(go.Scatter(x=monthly.index, y=monthly['P90'], name='P90', mode='lines', line=dict(width=0), showlegend=False))
+        band.add_trace(go.Scatter(x=monthly.index, y=monthly['P10'], name='P10 - P90', mode='lines', line=dict(width=0),
+                                  fill='tonexty', fillcolor='rgba(138, 43, 226, 0.25)'))
+        band.add_trace(go.Scatter(x=monthly.index, y=monthly['P50'], name='P50', mode='lines+markers',
+                                  line=dict(color='black', width=3), marker=dict(color='blueviolet', size=10),
+                                  hovertemplate='Month: %{x}<br>Savings: $%{y:.2f}<extra></extra>'))
+        band.update_layout(title=f'Monthly Savings Range over {samples} Samples', yaxis_title='Monthly Savings ($)')
+        showChart(band, 'savings range chart')
+
+        st.write(f"Annual savings: P10 ${annual['P10']:.2f}, P50 ${annual['P50']:.2f}, P90 ${annual['P90']:.2f}")
+
+  savingsScenarios()
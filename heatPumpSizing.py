@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+
+# Capacity-limited heat pump with electric resistance backup strips.
+#
+# The comfort model sends all of every hour's heating to the heat pump, however cold it
+# is outside. Here the unit only delivers what its capacity allows at that hour's
+# outdoor temperature:
+#
+#   heating   heat pump  min(load, heating capacity(T)) at COP(T)
+#             strips     the rest, at COP 1 (everything below the lockout temperature)
+#   cooling   heat pump  min(load, cooling capacity(T)) at EER(T), the rest goes unmet
+#
+# Cooling capacity is the unit's capacity curve (totalBTU against outdoor °F in the EER
+# data), scaled so its value at the 95 °F rating point is the nominal size. Heating
+# capacity follows the AHRI heating rating points: the nominal size at 47 °F, falling in
+# a straight line to retention17 of it at 17 °F.
+#
+# Unit sizes are a leading axis on every hourly array, so a sizing sweep over many
+# nominal capacities is a single (sizes x hours) evaluation.
+
+btuPerKWh = 3412
+btuPerTon = 12000
+
+ratedCooling = 95       # °F, AHRI cooling rating point
+ratedHeating = 47       # °F, AHRI heating rating points
+lowHeating = 17
+
+
+def nominalTons(capacity):
+    # Size of the unit a capacity curve was measured on
+    return float(capacity(ratedCooling)) / btuPerTon
+
+
+def sizeAxis(tons):
+    # Sizes as a column so they broadcast against the hours
+    return np.asarray(tons, dtype=float)[..., None]
+
+
+def heatingCapacity(T, tons, retention17=0.6):
+    # kW of heat at each outdoor temperature, shape (sizes..., hours)
+    fraction = 1 - (1 - retention17)*(ratedHeating - np.asarray(T, dtype=float)) / (ratedHeating - lowHeating)
+    return sizeAxis(tons)*btuPerTon / btuPerKWh * np.clip(fraction, 0, None)
+
+
+def coolingCapacity(T, tons, capacity):
+    # kW of cooling at each outdoor temperature, the capacity curve scaled to each size
+    scale = sizeAxis(tons) / nominalTons(capacity)
+    return scale*np.clip(capacity(np.asarray(T, dtype=float)), 0, None) / btuPerKWh
+
+
+@dataclass
+class Dispatch:
+    tons: np.ndarray
+    heatPumpHeat: np.ndarray   # kWh of heat from the heat pump, (sizes..., hours)
+    backupHeat: np.ndarray     # kWh of heat from the strips, also their electricity
+    heatPump: np.ndarray       # kWh of heat pump electricity, heating and cooling
+    unmetCooling: np.ndarray   # kWh of cooling above capacity
+
+    @property
+    def electric(self):
+        return self.heatPump + self.backupHeat
+
+
+def dispatchLoads(result, tons, capacity, retention17=0.6, lockoutTemp=None):
+    # Comfort mode loads of a ModelResult split between the heat pump and the strips
+    T = result.sinT
+
+    # Gas buildings: only the furnace's output has to be replaced, as in coolingPump/heatingPump
+    heating = np.nan_to_num(result.heatingModel*result.efficiency)
+    cooling = np.nan_to_num(result.coolingEnergy*result.efficiency)
+
+    heatPumpHeat = np.minimum(heating, heatingCapacity(T, tons, retention17))
+    if lockoutTemp is not None:
+        heatPumpHeat = np.where(T < lockoutTemp, 0, heatPumpHeat)
+    cooled = np.minimum(cooling, coolingCapacity(T, tons, capacity))
+
+    heatPump = heatPumpHeat / result.COP(T) + (cooled / result.EER(T))*3.412
+    return Dispatch(np.asarray(tons, dtype=float), heatPumpHeat, heating - heatPumpHeat, heatPump, cooling - cooled)
+
+
+def hourlyTotal(result, dispatch):
+    # Scenario kWh: the base load plus the heat pump and strips, like hourlyModelThree
+    return dispatch.electric + result.lightingModel
+
+
+def annualCost(result, dispatch):
+    # $ per year for every size, priced like ModelResult.monthlyCost
+    electric = np.nansum(dispatch.electric, axis=-1)
+    if result.fuelCost is not None:
+        # Base load stays on gas, heat pump and strips are electric
+        return np.nansum(result.lightingModel)*result.fuelCost + electric*result.cost
+    if result.tariff is not None:
+        return result.tariff.annualCost(hourlyTotal(result, dispatch))
+    return (electric + np.nansum(result.lightingModel))*result.cost
+
+
+@dataclass
+class EquipmentCost:
+    # Installed cost spread evenly over the unit's life, per year
+    fixed: float = 4000.0
+    perTon: float = 2500.0
+    lifetime: float = 15.0
+
+    def annual(self, tons):
+        return (self.fixed + self.perTon*np.asarray(tons, dtype=float)) / self.lifetime
+
+
+def fullSize(result, capacity, retention17=0.6):
+    # Smallest size that carries every hour's heating and cooling without the strips
+    T = result.sinT
+    needed = 0.0
+    for load, perTon in ((result.heatingModel, heatingCapacity(T, 1, retention17)),
+                         (result.coolingEnergy, coolingCapacity(T, 1, capacity))):
+        load = np.nan_to_num(load*result.efficiency)
+        # Hours too cold for any heat pump stay on the strips whatever the size
+        tons = np.divide(load, perTon, out=np.zeros_like(load), where=perTon > 0)
+        needed = max(needed, float(tons.max(initial=0)))
+    return needed
+
+
+def sizeRange(result, capacity, retention17=0.6, count=40):
+    # Quarter ton steps (or coarser for large buildings) up to a quarter above the full size
+    top = max(1.25*fullSize(result, capacity, retention17), 1.0)
+    step = max(0.25, np.ceil(top / count * 4) / 4)
+    return np.arange(step, top + step, step)
+
+
+@dataclass
+class Sizing:
+    table: pd.DataFrame       # One row per size
+    best: pd.Series           # Lowest total cost among the sizes that meet the cooling load
+    dispatch: Dispatch = field(repr=False)
+
+
+def sizingSweep(result, capacity, tons=None, retention17=0.6, lockoutTemp=None, equipment=None, unmetTolerance=0.01):
+    # Every size in one (sizes x hours) dispatch, ranked by energy plus equipment $ per year
+    tons = sizeRange(result, capacity, retention17) if tons is None else np.asarray(tons, dtype=float)
+    equipment = EquipmentCost() if equipment is None else equipment
+    dispatch = dispatchLoads(result, tons, capacity, retention17, lockoutTemp)
+
+    heating = np.nansum(dispatch.heatPumpHeat + dispatch.backupHeat, axis=-1)
+    cooling = np.nansum(np.nan_to_num(result.coolingEnergy*result.efficiency))
+    table = pd.DataFrame({
+        'tons': tons,
+        'heatPumpKWh': np.nansum(dispatch.heatPump, axis=-1),
+        'backupKWh': np.nansum(dispatch.backupHeat, axis=-1),
+        'backupShare': np.nansum(dispatch.backupHeat, axis=-1) / np.where(heating > 0, heating, 1),
+        'unmetCoolingKWh': np.nansum(dispatch.unmetCooling, axis=-1),
+        'energyCost': annualCost(result, dispatch),
+        'equipmentCost': equipment.annual(tons),
+    })
+    table['totalCost'] = table['energyCost'] + table['equipmentCost']
+
+    # Sizes that leave cooling unmet would look cheapest, so they only win if nothing meets it
+    meets = table['unmetCoolingKWh'] <= unmetTolerance*cooling
+    candidates = table[meets] if meets.any() else table.iloc[[table['tons'].idxmax()]]
+    best = table.loc[candidates['totalCost'].idxmin()]
+    return Sizing(table, best, dispatch)
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from CustomHP import HeatPumpCurve, copCurve, eerCurve
+
+# Catalog of heat pump models loaded from a local directory. Every model has two
+# files in the same formats as the app's custom uploads:
+#
+#   catalog/<model>.cop.csv    columns Temp, COP
+#   catalog/<model>.eer.csv    columns totalBTU, totalWATT, temp
+#
+# All curves are tabulated on the same temperature grid and stacked, so N models
+# are evaluated against the hourly temperatures as one (units x hours) matrix.
+
+catalogDir = os.environ.get('HP_MODEL_CATALOG', 'catalog')
+
+
+def catalogModels(directory=None):
+    # Models with both curve files, from a directory listing alone
+    directory = directory or catalogDir
+    files = os.listdir(directory) if os.path.isdir(directory) else []
+    copModels = {f[:-len('.cop.csv')] for f in files if f.endswith('.cop.csv')}
+    eerModels = {f[:-len('.eer.csv')] for f in files if f.endswith('.eer.csv')}
+    return sorted(copModels & eerModels)
+
+
+class HeatPumpCatalog:
+    def __init__(self, directory=None, kind='linear'):
+        self.directory = directory or catalogDir
+        self.kind = kind
+
+        self.models = catalogModels(self.directory)
+        self.index = {model: i for i, model in enumerate(self.models)}
+
+        self.cop = [copCurve(self.path(m, 'cop'), kind) for m in self.models]
+        self.eer = [eerCurve(self.path(m, 'eer'), kind) for m in self.models]
+
+        # Stacked lookup tables, one row per model
+        grid = np.arange(HeatPumpCurve.tableMin, HeatPumpCurve.tableMax + HeatPumpCurve.tableStep, HeatPumpCurve.tableStep)
+        self.copTable = np.array([c.evaluate(grid) for c in self.cop]).reshape(len(self.models), len(grid))
+        self.eerTable = np.array([c.evaluate(grid) for c in self.eer]).reshape(len(self.models), len(grid))
+
+    def __len__(self):
+        return len(self.models)
+
+    def path(self, model, curve):
+        return os.path.join(self.directory, f'{model}.{curve}.csv')
+
+    def evaluate(self, table, curves, T):
+        # (units x hours) values by interpolating every table at the same positions
+        T = np.asarray(T, dtype=float)
+        position = (T - HeatPumpCurve.tableMin) / HeatPumpCurve.tableStep
+        inside = (position >= 0) & (position < table.shape[1] - 1)
+        index = np.where(inside, position, 0).astype(int)
+        fraction = np.where(inside, position, 0) - index
+        values = table[:, index] + fraction*(table[:, index + 1] - table[:, index])
+
+        if not inside.all():
+            values[:, ~inside] = np.array([c.evaluate(T[~inside]) for c in curves]).reshape(len(curves), -1)
+        return values
+
+    def COP(self, T):
+        return self.evaluate(self.copTable, self.cop, T)
+
+    def EER(self, T):
+        return self.evaluate(self.eerTable, self.eer, T)
+
+
+def simulateUnits(result, catalog):
+    # The result's model with every catalog model's curves, its hourly series are (units x hours)
+    return result.withCurves(catalog.COP, catalog.EER)
+
+
+def annualCost(result, hourly, electric):
+    # $ per year of (units x hours) scenario kWh, priced like ModelResult.monthlyCost
+    if result.fuelCost is not None:
+        # Gas that is left at the gas price, heat pump electricity at the electric price
+        gas = np.nansum(hourly - electric, axis=-1)
+        return gas*result.fuelCost + np.nansum(electric, axis=-1)*result.cost
+    if result.tariff is not None:
+        return result.tariff.annualCost(hourly)
+    return np.nansum(hourly, axis=-1)*result.cost
+
+
+def rankUnits(result, catalog, units=None):
+    # Catalog models ordered by annual comfort-mode cost for this building. units are the
+    # simulateUnits of the same energy, kept between reruns that only change prices
+    units = simulateUnits(result, catalog) if units is None else units
+    original = annualCost(result, result.hourlyOriginal, 0)
+
+    ranking = pd.DataFrame({
+        'model': catalog.models,
+        'comfortKWh': np.nansum(units.hourlyModelThree, axis=-1),
+        'noComfortKWh': np.nansum(units.noComfortTotal, axis=-1),
+        'comfortCost': annualCost(result, units.hourlyModelThree, units.heatingPump + units.coolingPump),
+        'noComfortCost': annualCost(result, units.noComfortTotal, units.noComfortPump),
+    })
+    ranking['comfortSavings'] = original - ranking['comfortCost']
+    ranking['noComfortSavings'] = original - ranking['noComfortCost']
+
+    return ranking.sort_values('comfortCost').reset_index(drop=True)
@@ -1,9 +1,8 @@
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from scipy import stats
 import streamlit as st
-import plotly.graph_objects as go
+
+import instrumentation
+from modelEngine import meterDateRange
+from projectStore import listProjects, importProject, projectInputs
 
 st.set_page_config(page_title="Heat Pump Model", layout="wide", page_icon='⚡', initial_sidebar_state="expanded")
 st.title("Heat Pump Building Modeling")
@@ -19,17 +18,17 @@ This app allows you to:
 - Simulate and compare energy usage with a heat pump/retrofit under different desired temperature conditions 
 
 **Supported Inputs**:
-- Energy CSV with **only one** column that represents power in kW
+- Energy CSV with **only one** column that represents power in kW (gas meter data goes on the Gas page)
 - Temperature CSV from NOAA with daily high/low
 - Heat Pump COP and EER CSV performance parameters
 
 **Current Assumptions/Limitations**
 - Current building only uses resistive heating for temp control
-- No heat accumulation in building
+- No heat accumulation in building, unless the thermal mass (RC) model is used
 - Building must not currently have cooling
 - Cooling model is 2x the usage of the heating model
 - Cannot support energy (kWh) input
-- Energy cost is fixed
+- Energy cost is fixed unless a time-of-use/tiered tariff is uploaded
 
 **Email me with any bugs!**
 - parsanick11@gmail.com
@@ -42,32 +41,10 @@ energy_file = None
 temp_file = None
 date_range = None
 power_column = None
-hourlyEnergy = None
-dataType = None
-gasUnit = None
 
-dataType = st.selectbox(
-  "Which bill are we analyzing? (gas doesn't currently work)",
-  ('Electric', 'Gas')
-)
+st.caption("Analyzing a gas bill? Use the Gas page in the sidebar.")
 
-if dataType == 'Gas':
-  gasUnit = st.radio("Select Energy Unit", ["CCF", "Btu", "Therms", "MJ", "kWh"])
-
-if gasUnit == "CCF":
-  gasConv = 30.36
-elif gasUnit == "Btu":
-  gasConv = (30.36/103,600)
-elif gasUnit == "Therms":
-  gasConv = (30.36/1.036)
-elif gasUnit == "MJ":
-  gasConv = (30.36/109.3)
-elif gasUnit == "kWh":
-  gasConv = 1
-elif gasUnit == None:
-  gasConv = 1
-
-year = st.number_input("Enter year data is from (ie. 2023). Leap years currently don't work.", 
+year = st.number_input("Enter year data is from (ie. 2023).", 
                        value=2023)
 
 column_name = st.text_input("Enter exact header name of column for power data (case sensitive!)",
@@ -81,6 +58,11 @@ retro = retro/100
 cost = st.number_input("Enter energy cost per kWh in $",
                        value = 0.1241)
 
+tariff = None
+rateType = st.selectbox("Rate structure", ('Flat cost per kWh', 'Time-of-use / tiered (JSON)'))
+if rateType == 'Time-of-use / tiered (JSON)':
+    tariff = st.file_uploader("Upload a JSON rate definition (see tariff.py for the format)", type='json')
+
 hp_input = st.selectbox(
     "Do you want to import custom heat pump performance data, or just use a deafult one (DZ17VSA361B* + DV36FECC14A*)",
     ('Default','Custom')
@@ -88,6 +70,7 @@ hp_input = st.selectbox(
 
 customCOP = None
 customEER = None
+curveKind = 'linear'
 
 if hp_input == 'Default':
     customCOP = 1
@@ -101,6 +84,9 @@ elif hp_input == 'Custom':
     st.write('EER Data')
     customEER = st.file_uploader("Upload CSV with three columns named 'totalBTU' 'totalWATT' and 'temp' (case sensitive)", type='csv')
 
+    curveKinds = {'Linear': 'linear', 'Polynomial (2nd order)': 'poly', 'Piecewise linear': 'piecewise'}
+    curveKind = curveKinds[st.selectbox("How should the COP/EER data be fit?", tuple(curveKinds))]
+
 freq = st.selectbox(
     "What type of data are you using?",
     ("Hourly", "15-Minute")
@@ -110,75 +96,85 @@ if freq == 'Hourly':
     #data_type = st.selectbox('Select Data Type',('Energy (kWh)','Power (kW'))
     st.write('Upload Hourly Power CSV')
     energy_file = st.file_uploader('Upload CSV File', type='csv')
-    date_range = pd.date_range(start=f'{year}-01-01', periods=8760, freq='h')
-    if energy_file is not None and temp_file is not None:
-        data = pd.read_csv(energy_file)
-
-        if date_range is not None:
-            data.insert(0, 'DATE', date_range.date)
-            data.insert(1, 'TIME', date_range.time)
-            
-            data['DATE'] = pd.to_datetime(data['DATE'], format='%Y-%m-%d')
-            data['TIME'] = pd.to_datetime(data['TIME'], format='%H:%M:%S')
-
-            
-            data['HourOfYear'] = data['TIME'].dt.hour
-            data['DayOfYear'] = data['DATE'].dt.dayofyear
-            
-            # Remove Unnamed Columns
-            cols_to_drop = [3,4,5,6,7,8]
-            cols_to_drop = [i for i in cols_to_drop if i < len(data.columns)]
-            data.drop(data.columns[cols_to_drop], axis=1, inplace=True)
-            
-            energy = data[f'{column_name}']
-            data.insert(3, 'Energy', energy)
-
-            
-            hourlyEnergy = energy
-            
+    date_range = meterDateRange(year, freq)
 
 elif freq == "15-Minute":
     st.write('Upload 15-Min Power CSV')
     energy_file = st.file_uploader('Upload CSV File', type='csv')
-    date_range = pd.date_range(start=f'{year}-01-01', periods=35040, freq='15min')
-    if energy_file is not None and temp_file is not None:
-        data = pd.read_csv(energy_file)
-
-        if date_range is not None:
-            data.insert(0, 'DATE', date_range.date)
-            data.insert(1, 'TIME', date_range.time)
-            
-            # Remove Unnamed Columns
-            cols_to_drop = [3,4,5,6,7,8]
-            cols_to_drop = [i for i in cols_to_drop if i < len(data.columns)]
-            data.drop(data.columns[cols_to_drop], axis=1, inplace=True)
-            
-            energy = data[f'{column_name}'] * 0.25
-            data.insert(3, 'Energy', energy)
-            
-            # Group 15 minute energy data by hour in year
-            hourlyEnergy = data.groupby(['DayOfYear', 'HourOfYear'])['Energy'].sum().reset_index()
+    date_range = meterDateRange(year, freq)
 
 
 temp_file = st.file_uploader("Upload Temperature CSV File, use NOAA databases",
                              type="csv")
 
+# Optional hourly station observations, the daily highs/lows sinusoid is used without one
+weather_file = st.file_uploader("Optional: NOAA ISD or ISD-Lite hourly station file (observed hourly temperatures)")
+utcOffset = 0
+if weather_file is not None:
+    utcOffset = st.number_input("Meter time zone offset from UTC in standard time (e.g. -8 for Pacific)",
+                                min_value=-12, max_value=14, value=-5)
+
+
+
+
+
+with st.sidebar:
+    st.header("Saved Buildings")
+    savedProjects = listProjects()
+    project = st.selectbox("Open a saved building instead of uploading", [None] + savedProjects,
+                           format_func=lambda p: "—" if p is None else p)
 
+    # Widget state is per session, so is the profiler (see instrumentation.py)
+    profile = st.checkbox("Show pipeline timings", key='showTimings')
 
+# Stages are only recorded while the panel is on, for this session's thread only
+instrumentation.enable(profile)
+instrumentation.reset()
 
 
-if energy_file is not None and temp_file is not None and year is not None and column_name is not None:
+if project is not None:
     try:
         from electricDataProcessing import electricModel
 
-        electricModel(energy_file, temp_file, date_range, column_name, retro, cost, year, customCOP, customEER)
+        inputs = projectInputs(project)
+        electricModel(None, None, None, None, retro, cost, inputs.year, customCOP, customEER, inputs=inputs, curveKind=curveKind, tariff=tariff)
+
+    except Exception as e:
+        st.error(f"Error processing saved building: {e}")
+
+elif energy_file is not None and temp_file is not None and year is not None and column_name is not None:
+    try:
+        from electricDataProcessing import electricModel
+
+        electricModel(energy_file, temp_file, date_range, column_name, retro, cost, year, customCOP, customEER, curveKind=curveKind, tariff=tariff,
+                      weather_file=weather_file, utcOffset=utcOffset)
         
         
 
     except Exception as e:
         st.error(f"Error processing files: {e}")
+
+    # Convert these uploads once so the building can be reopened without re-uploading
+    with st.sidebar:
+        projectName = st.text_input("Save uploaded data as")
+        if st.button("Save building") and projectName:
+            try:
+                importProject(projectName, energy_file, temp_file, column_name, date_range)
+                st.success(f"Saved {projectName}")
+            except Exception as e:
+                st.error(f"Could not save building: {e}")
 else:
     st.info("Please upload both CSV files and define inputs to begin.")
 
 
-    
+if profile:
+    with st.sidebar:
+        st.header("Pipeline Timings")
+        stages = instrumentation.report()
+        st.dataframe([{
+            'Stage': '· '*s['depth'] + s['stage'],
+            'Seconds': round(s['seconds'], 4),
+            'Rows': s['rows'],
+            'Peak MB': round(s['peakMB'], 2),
+        } for s in stages], use_container_width=True, hide_index=True)
+        st.caption(f"Total: {sum(s['seconds'] for s in stages if s['depth'] == 0):.3f} s")
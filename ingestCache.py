@@ -0,0 +1,185 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from modelEngine import hourlyRange, readHourlyEnergy, prepareTemperature, prepareInputs
+
+# Content-hash keyed cache for parsed uploads and their aggregates. Streamlit reruns
+# the whole script on every widget change, so keying on the file bytes (not the
+# upload object) lets cost/checkbox changes skip CSV parsing and the groupbys.
+
+
+def fileBytes(file):
+    # Streamlit UploadedFile, any file-like object, or a path
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    if hasattr(file, 'read'):
+        position = file.tell()
+        file.seek(0)
+        data = file.read()
+        file.seek(position)
+        return data.encode() if isinstance(data, str) else data
+    with open(file, 'rb') as f:
+        return f.read()
+
+
+def csvSource(file):
+    # Paths go to pandas as they are, so the readers stream them from disk.
+    # Uploads are in memory already
+    if isinstance(file, (str, os.PathLike)):
+        return file
+    return io.BytesIO(fileBytes(file))
+
+
+hashBlock = 1024**2
+
+
+def fileHash(file):
+    # Paths and open files are hashed a block at a time, never read whole
+    if hasattr(file, 'getvalue'):
+        return hashlib.sha256(file.getvalue()).hexdigest()
+
+    digest = hashlib.sha256()
+    if hasattr(file, 'read'):
+        position = file.tell()
+        file.seek(0)
+        while block := file.read(hashBlock):
+            digest.update(block.encode() if isinstance(block, str) else block)
+        file.seek(position)
+    else:
+        with open(file, 'rb') as f:
+            while block := f.read(hashBlock):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def sizeOf(value):
+    # Rough in-memory size in bytes, used for the size bound
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, '__dict__'):
+        return sum(sizeOf(v) for v in vars(value).values())
+    if isinstance(value, (tuple, list)):
+        return sum(sizeOf(v) for v in value)
+    return 64
+
+
+class LRUCache:
+    def __init__(self, maxEntries=32, maxBytes=256 * 1024**2):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()   # key -> (value, size)
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        size = sizeOf(value)
+        with self.lock:
+            if key in self.entries:
+                self.totalBytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.totalBytes += size
+            self.evict()
+
+    def evict(self):
+        # Drop least recently used entries, but always keep the newest one
+        while len(self.entries) > 1 and (len(self.entries) > self.maxEntries or self.totalBytes > self.maxBytes):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.totalBytes -= size
+
+    def getOrCompute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.totalBytes = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.totalBytes, 'hits': self.hits, 'misses': self.misses}
+
+
+cache = LRUCache()
+
+
+def configureCache(maxEntries=None, maxBytes=None):
+    if maxEntries is not None:
+        cache.maxEntries = maxEntries
+    if maxBytes is not None:
+        cache.maxBytes = maxBytes
+    with cache.lock:
+        cache.evict()
+
+
+def shared(value):
+    # Cached values go to every session: arrays are locked against writes, the small
+    # pandas objects are handed out as copies
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+        return value
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if is_dataclass(value):
+        return replace(value, **{f.name: shared(getattr(value, f.name)) for f in fields(value)})
+    return value
+
+
+def rangeKey(date_range):
+    # Year and data frequency of the meter file
+    return (str(date_range[0]), len(date_range), str(date_range[1] - date_range[0]))
+
+
+def cachedEnergy(energy_file, column_name, date_range, energyHash=None, unit=None):
+    # Hourly kWh, 15-minute files are rolled up while streaming. unit is None for
+    # power (kW) files, or the gas unit of the readings
+    energyHash = energyHash or fileHash(energy_file)
+    key = ('energy', energyHash, column_name, rangeKey(date_range), unit)
+
+    return shared(cache.getOrCompute(key, lambda: readHourlyEnergy(csvSource(energy_file), column_name, date_range, unit=unit)))
+
+
+def cachedTemperature(temp_file, tempHash=None):
+    tempHash = tempHash or fileHash(temp_file)
+    key = ('temperature', tempHash)
+
+    return shared(cache.getOrCompute(key, lambda: prepareTemperature(pd.read_csv(csvSource(temp_file)))))
+
+
+def cachedInputs(energy_file, temp_file, column_name, date_range, unit=None, observedTemp=None):
+    # Parsed hourly energy, daily temperatures and monthly aggregates in one ModelInputs.
+    # observedTemp (isdWeather hours) is keyed by its values, None means the sinusoid
+    energyHash = fileHash(energy_file)
+    tempHash = fileHash(temp_file)
+    weatherKey = None if observedTemp is None else hashlib.sha1(np.ascontiguousarray(observedTemp, dtype=float)).hexdigest()
+    key = ('inputs', energyHash, tempHash, column_name, rangeKey(date_range), unit, weatherKey)
+
+    def compute():
+        energy = cachedEnergy(energy_file, column_name, date_range, energyHash, unit)
+        tempData = cachedTemperature(temp_file, tempHash)
+        return prepareInputs(energy, tempData, hourlyRange(date_range), observedTemp)
+
+    return shared(cache.getOrCompute(key, compute))
+
@@ -0,0 +1,155 @@
+import itertools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from contextvars import ContextVar
+
+# Per-stage wall time, row counts and peak memory for the modeling pipeline.
+#
+#   with stage('parse energy CSV') as s:
+#       data = pd.read_csv(...)
+#       s.rows = len(data)
+#
+# Off by default. While it's off stage() hands back one shared no-op object, so an
+# instrumented call costs a function call and two empty methods. enable() turns it on
+# for the calling context only (thread or asyncio task): Streamlit runs every rerun on a
+# new thread, so the app enables it on each rerun from the session's setting and one
+# session's records never reach another. tracemalloc is process wide, it runs while any
+# profile is alive and stops as soon as the last one is disabled or dropped with its
+# thread. Worker processes start with it off and are enabled explicitly (see batchRun.py).
+# enable(memory=False) records wall time only and leaves tracemalloc off, which slows
+# allocation heavy stages severalfold; peakMB is None in its records.
+
+
+# Profiles alive in any thread of the process, tracemalloc stops when none are left
+lock = threading.Lock()
+live = 0
+
+
+def released():
+    global live
+    with lock:
+        live -= 1
+        if live == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class Profile:
+    def __init__(self, memory=True):
+        global live
+        self.records = []    # Finished stages of the current run, in completion order
+        self.active = []     # Open stages, innermost last
+        self.opened = itertools.count()
+        self.memory = memory
+        if memory:
+            with lock:
+                live += 1
+            weakref.finalize(self, released)
+
+
+current = ContextVar('profile', default=None)
+
+
+class NullStage:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+nullStage = NullStage()
+
+
+class Stage:
+    def __init__(self, profile, name, rows=None):
+        self.profile = profile
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        active = self.profile.active
+        memory, peak = tracemalloc.get_traced_memory() if self.profile.memory else (0, 0)
+        # The enclosing stage keeps the peak it reached before this one resets it
+        if active:
+            active[-1].peak = max(active[-1].peak, peak)
+        if self.profile.memory:
+            tracemalloc.reset_peak()
+
+        self.order = next(self.profile.opened)
+        self.depth = len(active)
+        self.startMemory = memory
+        self.peak = memory
+        active.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        if self.profile.memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        active = self.profile.active
+        active.pop()
+        if active:
+            active[-1].peak = max(active[-1].peak, self.peak)
+
+        self.profile.records.append({
+            'order': self.order,
+            'stage': self.name,
+            'depth': self.depth,
+            'seconds': seconds,
+            'rows': self.rows,
+            'peakMB': (self.peak - self.startMemory) / 2**20 if self.profile.memory else None,
+            'failed': exc[0] is not None,
+        })
+        return False
+
+
+def stage(name, rows=None):
+    profile = current.get()
+    if profile is None:
+        return nullStage
+    if profile.memory and not tracemalloc.is_tracing():
+        with lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+    return Stage(profile, name, rows)
+
+
+def enabled():
+    return current.get() is not None
+
+
+def enable(on=True, memory=True):
+    # On or off for the calling thread, keeping its records if it was already on the same way
+    profile = current.get()
+    if on and (profile is None or profile.memory != memory):
+        current.set(Profile(memory))
+    elif not on and profile is not None:
+        # Dropping the last reference releases the profile (and tracemalloc with the last one)
+        current.set(None)
+
+
+def reset():
+    profile = current.get()
+    if profile is not None:
+        profile.records.clear()
+
+
+def report():
+    # Finished stages ordered by start, nested stages after their parent
+    profile = current.get()
+    return [] if profile is None else sorted(profile.records, key=lambda r: r['order'])
+
+
+def logRecords(stream=None, stages=None, **context):
+    # One JSON object per stage, with context such as the building name on every line
+    stream = stream or sys.stderr
+    for record in report() if stages is None else stages:
+        stream.write(json.dumps({**context, **record}) + '\n')
+    stream.flush()
@@ -0,0 +1,139 @@
+import gzip
+from dataclasses import dataclass
+
+import numpy as np
+
+from ingestCache import fileBytes
+from instrumentation import stage
+from modelEngine import hourlyRange
+
+# Observed hourly temperatures from NOAA Integrated Surface Database station files,
+# in place of the sinusoid built from daily highs and lows.
+#
+#   ISD-Lite  one fixed-width line per hour: year month day hour temp(°C x10) ...
+#             "2023 01 01 08   -56   -89 10231   170    21     8 -9999 -9999"
+#   ISD       one record per observation, mandatory section at fixed positions:
+#             date (16-23), time (24-27), air temperature (88-92, °C x10) and its quality code (93)
+#
+# Both can be gzipped (.gz as downloaded from NOAA). The parser never splits the file into
+# Python strings: it finds the line starts in the raw bytes and reads every field of every
+# line at once as a (lines x width) array of characters, so multi-year files parse in
+# milliseconds. Times are UTC and are shifted to the meter's local standard time.
+
+missingValue = 9999
+
+# ISD quality codes for values that failed NOAA's checks (suspect or erroneous)
+rejectedQuality = b'2367'
+
+
+@dataclass
+class ObservedTemperature:
+    temp: np.ndarray      # °F for every meter hour, NaN where a gap was too long to bridge
+    observed: int         # Hours with at least one observation
+    interpolated: int     # Hours filled from the hours around them
+    missing: int          # Hours left NaN (the sinusoid fills them)
+
+
+def readBytes(file):
+    data = fileBytes(file)
+    return gzip.decompress(data) if data[:2] == b'\x1f\x8b' else data
+
+
+def lineStarts(buf):
+    # Start and length of every line in the raw bytes
+    ends = np.flatnonzero(buf == ord('\n'))
+    if len(buf) and buf[-1] != ord('\n'):
+        ends = np.append(ends, len(buf))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    return starts, ends - starts
+
+
+def fixedField(buf, starts, begin, end):
+    # Integer in columns [begin, end) of every line, right aligned with an optional sign
+    chars = buf[starts[:, None] + np.arange(begin, end)]
+    isDigit = (chars >= ord('0')) & (chars <= ord('9'))
+    digitsAfter = np.cumsum(isDigit[:, ::-1], axis=1)[:, ::-1] - isDigit
+    value = np.where(isDigit, (chars.astype(np.int64) - ord('0')) * 10**digitsAfter, 0).sum(axis=1)
+    return np.where((chars == ord('-')).any(axis=1), -value, value)
+
+
+def utcHours(year, month, day, hour):
+    months = ((year - 1970)*12 + month - 1).astype('datetime64[M]')
+    return months.astype('datetime64[D]') + (day - 1) + hour.astype('timedelta64[h]')
+
+
+def parseISD(file):
+    # UTC hour and °F of every valid observation in an ISD or ISD-Lite file
+    with stage('parse ISD weather') as s:
+        buf = np.frombuffer(readBytes(file), dtype=np.uint8)
+        starts, lengths = lineStarts(buf)
+        s.rows = len(starts)
+
+        # ISD-Lite has a space after the year, a full ISD record starts with its length digits
+        lite = len(buf) > 4 and buf[4] == ord(' ')
+        if lite:
+            keep = lengths >= 19
+            starts = starts[keep]
+            year, month, day, hour = (fixedField(buf, starts, b, e) for b, e in ((0, 4), (5, 7), (8, 10), (11, 13)))
+            tenths = fixedField(buf, starts, 13, 19)
+            valid = tenths != -missingValue
+        else:
+            keep = lengths >= 93
+            starts = starts[keep]
+            date = fixedField(buf, starts, 15, 23)
+            year, month, day = date // 10000, date // 100 % 100, date % 100
+            hour = fixedField(buf, starts, 23, 25)
+            tenths = fixedField(buf, starts, 87, 92)
+            quality = buf[starts + 92]
+            valid = (tenths != missingValue) & ~np.isin(quality, np.frombuffer(rejectedQuality, dtype=np.uint8))
+
+        if not len(starts):
+            raise ValueError("No ISD or ISD-Lite records found in the weather file")
+
+        hours = utcHours(year[valid], month[valid], day[valid], hour[valid])
+        tempF = tenths[valid] / 10 * 9/5 + 32
+    return hours, tempF
+
+
+def alignHours(hours, values, start, n, utcOffset=0):
+    # Mean of the values falling in each of the n local hours from start (several
+    # observations an hour are common in full ISD files); NaN for hours without one
+    first = np.datetime64(start, 'h') - np.timedelta64(int(utcOffset), 'h')
+    position = (hours - first).astype(np.int64)
+    inside = (position >= 0) & (position < n)
+
+    sums = np.bincount(position[inside], weights=values[inside], minlength=n)
+    counts = np.bincount(position[inside], minlength=n)
+    with np.errstate(invalid='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def fillGaps(temp, maxGap=6):
+    # Linear interpolation across gaps of up to maxGap hours, longer gaps stay NaN
+    valid = ~np.isnan(temp)
+    if not valid.any():
+        return temp.copy(), np.zeros(len(temp), dtype=bool)
+
+    index = np.arange(len(temp))
+    before = np.maximum.accumulate(np.where(valid, index, -1))
+    after = np.minimum.accumulate(np.where(valid, index, len(temp))[::-1])[::-1]
+    bridged = ~valid & (before >= 0) & (after < len(temp)) & (after - before - 1 <= maxGap)
+
+    filled = temp.copy()
+    filled[bridged] = np.interp(index[bridged], index[valid], temp[valid])
+    return filled, bridged
+
+
+def observedTemperature(weather_file, date_range, utcOffset=0, maxGap=6):
+    # Station temperatures on the meter's hour index, gaps bridged where they are short
+    hours, tempF = parseISD(weather_file)
+    n = len(hourlyRange(date_range))
+
+    with stage('align ISD weather', n):
+        temp = alignHours(hours, tempF, date_range[0], n, utcOffset)
+        observed = int((~np.isnan(temp)).sum())
+        if observed == 0:
+            raise ValueError("The weather file has no observations in the meter's year, check the station file and UTC offset")
+        temp, bridged = fillGaps(temp, maxGap)
+
+    return ObservedTemperature(temp, observed, int(bridged.sum()), int(np.isnan(temp).sum()))
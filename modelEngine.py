@@ -0,0 +1,574 @@
+import calendar
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+
+from changePoint import bestSplit, lineFit
+from instrumentation import stage
+from tariff import Tariff, compileTariff
+
+# Headless compute core for the heat pump model. Nothing in here imports
+# streamlit or a plotting library, so it can be driven from scripts, batch
+# jobs and services as well as from the Streamlit pages.
+
+months = ['January', 'Febuary', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+### Inputs
+
+
+def readEnergy(energy_file, column_name, date_range):
+    # Energy (kWh) per interval from a power (kW) CSV
+    with stage('parse energy CSV') as s:
+        data = pd.read_csv(energy_file)
+        s.rows = len(data)
+    return powerToEnergy(data[f'{column_name}'], date_range)
+
+
+# kWh in one unit of metered gas (1 CCF = 1.036 therms = 103,600 Btu)
+gasUnits = {
+    'CCF': 30.36,
+    'Btu': 30.36/103_600,
+    'Therms': 30.36/1.036,
+    'MJ': 30.36/109.3,
+    'kWh': 1.0,
+}
+
+
+def unitFactor(unit):
+    # kWh per unit of metered gas
+    if unit not in gasUnits:
+        raise ValueError(f"Unknown gas unit {unit!r}, use one of {', '.join(gasUnits)}")
+    return gasUnits[unit]
+
+
+def powerToEnergy(power, date_range):
+    power = np.asarray(power, dtype=float)
+    if len(power) != len(date_range):
+        raise ValueError(f"Expected {len(date_range)} power readings, got {len(power)}")
+
+    # kW -> kWh for the interval length (0.25 for 15-minute data, 1 for hourly)
+    return power * intervalHours(date_range)
+
+
+def intervalHours(date_range):
+    return (date_range[1] - date_range[0]) / pd.Timedelta(hours=1)
+
+
+def hourlyRange(date_range):
+    # Hourly timestamps covering the same span as date_range
+    return pd.date_range(start=date_range[0], periods=int(round(len(date_range) * intervalHours(date_range))), freq='h')
+
+
+def readHourlyEnergy(energy_file, column_name, date_range, chunkSize=200_000, unit=None):
+    # Streams the power column in fixed-size chunks and rolls it up to hourly kWh as it goes,
+    # so peak memory is one chunk plus the hourly result no matter how long the file is.
+    # A file with more or fewer readings than date_range is rejected like in powerToEnergy.
+    # With a gas unit the column holds gas used per interval instead of kW.
+    hoursPerInterval = intervalHours(date_range)
+    perHour = int(round(1 / hoursPerInterval))
+    toEnergy = hoursPerInterval if unit is None else unitFactor(unit)
+    totalHours = len(hourlyRange(date_range))
+
+    hourly = np.empty(totalHours)
+    filled = 0
+    remainder = np.empty(0)
+
+    chunks = pd.read_csv(energy_file, usecols=[column_name], dtype={column_name: np.float64}, chunksize=chunkSize)
+    with stage('stream energy CSV to hourly') as s, chunks:
+        s.rows = 0
+        for chunk in chunks:
+            s.rows += len(chunk)
+            power = np.concatenate([remainder, chunk[column_name].to_numpy()])
+            full = min(len(power) // perHour, totalHours - filled) * perHour
+
+            # kW (or gas units) -> kWh for each interval, then sum the intervals in each hour
+            hours = (power[:full] * toEnergy).reshape(-1, perHour).sum(axis=1)
+            hourly[filled:filled + len(hours)] = hours
+            filled += len(hours)
+            remainder = power[full:]
+
+            if filled == totalHours and len(remainder):
+                break
+
+        # Readings past the end of date_range are usually a wrong year or frequency, they are counted, not kept
+        unread = len(remainder) + sum(len(chunk) for chunk in chunks)
+
+    if filled != totalHours or unread:
+        raise ValueError(f"Expected {len(date_range)} power readings, got {filled * perHour + unread}")
+
+    return hourly
+
+
+def meterDateRange(year, freq):
+    # Timestamps of a full meter year, 8784 hours in leap years
+    hours = 8784 if calendar.isleap(int(year)) else 8760
+    if freq == '15-Minute':
+        return pd.date_range(start=f'{int(year)}-01-01', periods=hours * 4, freq='15min')
+    return pd.date_range(start=f'{int(year)}-01-01', periods=hours, freq='h')
+
+
+def readTemperature(temp_file):
+    with stage('parse temperature CSV') as s:
+        tempData = pd.read_csv(temp_file)
+        s.rows = len(tempData)
+    return prepareTemperature(tempData)
+
+
+def prepareTemperature(tempData):
+    # NOAA daily summaries: needs DATE, TMAX and TMIN columns
+    with stage('temperature datetime conversion', len(tempData)):
+        tempData = tempData.copy()
+        tempData['TAVG'] = (tempData['TMAX'] + tempData['TMIN']) / 2
+        tempData['DATE'] = pd.to_datetime(tempData['DATE'])
+        tempData['tempMonths'] = tempData['DATE'].dt.month
+        tempData['tempDays'] = tempData['DATE'].dt.day
+    return tempData
+
+
+### Integer Time Index
+
+
+def monthDayKey(month, day):
+    # Integer key for a calendar day that ignores the year, like the old '%m-%d' string
+    return month*32 + day
+
+
+def calendarDays(start, nDays):
+    # Month and day of month for nDays consecutive days from start, without any string formatting
+    days = np.datetime64(start, 'D') + np.arange(nDays)
+    monthStart = days.astype('datetime64[M]')
+    month = monthStart.astype(int) % 12 + 1
+    dayOfMonth = (days - monthStart.astype('datetime64[D]')).astype(int) + 1
+    return month, dayOfMonth
+
+
+def groupMean(groups, values, size=13):
+    # Mean of values in each integer group, skipping NaN like pandas groupby
+    valid = ~np.isnan(values)
+    counts = np.bincount(groups[valid], minlength=size)
+    sums = np.bincount(groups[valid], weights=values[valid], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts, counts
+
+
+@dataclass
+class ModelInputs:
+    year: int
+    energy: np.ndarray             # Hourly kWh
+    tempData: pd.DataFrame
+    monthlyEnergy: pd.Series       # Avg hourly kWh for each month
+    monthlyEnergyTotal: pd.Series
+    monthlyTemp: pd.Series
+    hourlyTempAvg: np.ndarray      # Daily TAVG repeated for every hour
+    deltaTday: np.ndarray          # Daily TMAX - TMIN repeated for every hour
+    hoursInYear: np.ndarray
+    dayOfYear: np.ndarray          # Day index (from 0) of every hour
+    month: np.ndarray              # Month of every hour
+    observedTemp: np.ndarray = None   # Station hourly °F (isdWeather), NaN in long gaps
+
+    def monthlySum(self, hourly):
+        hourly = np.asarray(hourly, dtype=float)
+        counts = np.bincount(self.month, minlength=13)
+        sums = np.bincount(self.month, weights=np.nan_to_num(hourly, nan=0.0), minlength=13)
+        present = np.flatnonzero(counts)
+        return pd.Series(sums[present], index=pd.Index(present, name='month'))
+
+
+def prepareInputs(energy, tempData, date_range, observedTemp=None):
+    # energy: kWh per interval aligned with date_range, tempData: DataFrame with DATE, TMAX, TMIN,
+    # observedTemp: optional hourly °F on the same hours (see isdWeather)
+    if 'TAVG' not in tempData or 'tempDays' not in tempData:
+        tempData = prepareTemperature(tempData)
+
+    energy = np.asarray(energy, dtype=float)
+    if len(energy) != len(date_range):
+        raise ValueError(f"Expected {len(date_range)} energy values, got {len(energy)}")
+
+    # Group 15 minute energy data by hour in year
+    perHour = int(round(1 / intervalHours(date_range)))
+    if perHour > 1:
+        with stage('hourly aggregation', len(energy)):
+            energy = energy.reshape(-1, perHour).sum(axis=1)
+
+    # Hour -> day -> month with array indexing, leap years included
+    start = date_range[0]
+    hoursInYear = np.arange(0, len(energy), 1)
+    dayOfYear = (hoursInYear + start.hour) // 24
+    dayMonth, dayOfMonth = calendarDays(start.date(), dayOfYear[-1] + 1)
+    month = dayMonth[dayOfYear]
+
+    with stage('monthly aggregation', len(energy)):
+        monthlyEnergy, _ = groupMean(month, energy)
+        monthlyEnergyTotal = np.bincount(month, weights=np.nan_to_num(energy, nan=0.0), minlength=13)
+        present = np.flatnonzero(np.bincount(month, minlength=13))
+
+        tempMonths = tempData['tempMonths'].to_numpy()
+        monthlyTemp, _ = groupMean(tempMonths, tempData['TAVG'].to_numpy(dtype=float))
+        tempPresent = np.flatnonzero(np.bincount(tempMonths, minlength=13))
+
+    # Daily temps looked up by month/day key (just makes daily temps equal to hourly)
+    with stage('hourly temperature merge', len(energy)):
+        lookup = np.full((monthDayKey(12, 31) + 1, 2), np.nan)
+        tempKeys = monthDayKey(tempMonths, tempData['tempDays'].to_numpy())
+        lookup[tempKeys, 0] = tempData['TAVG'].to_numpy(dtype=float)
+        lookup[tempKeys, 1] = (tempData['TMAX'] - tempData['TMIN']).to_numpy(dtype=float)
+        # A leap meter year on a non-leap weather year takes Feb 29 from Feb 28, as weatherEnsemble does
+        if monthDayKey(2, 29) not in tempKeys:
+            lookup[monthDayKey(2, 29)] = lookup[monthDayKey(2, 28)]
+        hourlyTemps = lookup[monthDayKey(dayMonth, dayOfMonth)[dayOfYear]]
+
+    if observedTemp is not None and len(observedTemp) != len(energy):
+        raise ValueError(f"Expected {len(energy)} hourly temperatures, got {len(observedTemp)}")
+
+    return ModelInputs(
+        year=start.year,
+        energy=energy,
+        tempData=tempData,
+        monthlyEnergy=pd.Series(monthlyEnergy[present], index=pd.Index(present, name='month')),
+        monthlyEnergyTotal=pd.Series(monthlyEnergyTotal[present], index=pd.Index(present, name='month')),
+        monthlyTemp=pd.Series(monthlyTemp[tempPresent], index=pd.Index(tempPresent, name='tempMonths')),
+        hourlyTempAvg=hourlyTemps[:, 0],
+        deltaTday=hourlyTemps[:, 1],
+        hoursInYear=hoursInYear,
+        dayOfYear=dayOfYear,
+        month=month,
+        observedTemp=None if observedTemp is None else np.asarray(observedTemp, dtype=float),
+    )
+
+
+### Separating Heating from Base Energy Usage
+
+
+@dataclass
+class LoadFit:
+    splitTemp: float
+    heatSlope: float
+    heatIntercept: float
+    baseSlope: float
+    baseIntercept: float
+
+    def heating(self, T):
+        return self.heatSlope*T + self.heatIntercept
+
+    def cooling(self, T):
+        # Cooling model is 2x the usage of the heating model
+        return 2*np.abs(self.heatSlope*T + self.heatIntercept)
+
+    def heatingZero(self):
+        # Temperature where the heating line reaches zero, also where cooling begins
+        return int(-self.heatIntercept / self.heatSlope)
+
+
+def fitLoads(monthlyTemp, monthlyEnergy, splitTemp=None):
+    x1 = np.array(monthlyTemp)
+    y1 = np.array(monthlyEnergy)
+
+    with stage('load regressions', len(x1)):
+        # No split given: use the one with the lowest combined error of both lines
+        if splitTemp is None:
+            splitTemp = bestSplit(x1, y1).splitTemp
+
+        heatSide = x1 <= splitTemp
+        baseSide = x1 >= splitTemp
+        if heatSide.sum() < 2 or baseSide.sum() < 2:
+            raise ValueError(f"Split temperature {splitTemp} °F needs at least two months on each side")
+
+        heatSlope, heatIntercept = lineFit(x1[heatSide], y1[heatSide])
+        baseSlope, baseIntercept = lineFit(x1[baseSide], y1[baseSide])
+
+    return LoadFit(splitTemp, heatSlope, heatIntercept, baseSlope, baseIntercept)
+
+
+### Hourly Simulation
+
+
+def sinusoidalTemp(hourlyTempAvg, deltaTday, hoursInYear):
+    return hourlyTempAvg - deltaTday*np.cos((2*np.pi*hoursInYear)/24)
+
+
+def hourlyTemperature(inputs):
+    # Observed station temperatures where there are any, the daily sinusoid everywhere else
+    sinT = sinusoidalTemp(inputs.hourlyTempAvg, inputs.deltaTday, inputs.hoursInYear)
+    if inputs.observedTemp is None:
+        return sinT
+    return np.where(np.isnan(inputs.observedTemp), sinT, inputs.observedTemp)
+
+
+def noComfortTemperature(inputs):
+    # No Comfort Mode runs on the day's average, observed hours replace it where there are any
+    if inputs.observedTemp is None:
+        return inputs.hourlyTempAvg
+    return np.where(np.isnan(inputs.observedTemp), inputs.hourlyTempAvg, inputs.observedTemp)
+
+
+@dataclass
+class ModelResult:
+    inputs: ModelInputs
+    fit: LoadFit
+    heatingTemp: float
+    coolingTemp: float
+    retro: float
+    cost: float
+    COP: object
+    EER: object
+
+    sinT: np.ndarray
+
+    # Comfort model (kWh), everything else is derived on first use
+    coolingEnergy: np.ndarray
+    heatingEnergy: np.ndarray
+    heatingModel: np.ndarray
+
+    # Compiled tariff, scenarios are costed at the flat cost per kWh without one
+    tariff: Tariff = None
+
+    # Gas buildings: furnace efficiency and $ per kWh-equivalent of gas. Heating
+    # (and cooling, sized from it) move to the heat pump, the base load stays on gas.
+    efficiency: float = 1.0
+    fuelCost: float = None
+
+    # Scaled scenario results, keyed by (heatPumpMode, retrofit, hourly)
+    scenarios: dict = field(default_factory=dict, repr=False)
+
+    # Monthly $ of the scenarios, keyed by (heatPumpMode, retrofit)
+    costs: dict = field(default_factory=dict, repr=False)
+
+    ### Hourly series (kWh)
+
+    @cached_property
+    def coolingPump(self):
+        return (self.coolingEnergy*self.efficiency / self.EER(self.sinT))*3.412
+
+    @cached_property
+    def lightingModel(self):
+        return self.heatingEnergy - self.heatingModel
+
+    @cached_property
+    def heatingPump(self):
+        return self.heatingModel*self.efficiency / self.COP(self.sinT)
+
+    @cached_property
+    def noComfort(self):
+        return noComfortSeries(self.inputs, self.fit, self.COP, self.efficiency)
+
+    @property
+    def noComfortHeat(self):
+        return self.noComfort[0]
+
+    @property
+    def noComfortPump(self):
+        return self.noComfort[1]
+
+    @property
+    def noComfortTotal(self):
+        return self.noComfort[2]
+
+    @property
+    def hourlyModelOne(self):
+        return self.heatingEnergy
+
+    @cached_property
+    def hourlyModelTwo(self):
+        return self.heatingPump + self.lightingModel
+
+    @cached_property
+    def hourlyModelThree(self):
+        return self.hourlyModelTwo + self.coolingPump
+
+    ### Monthly series (kWh)
+
+    @cached_property
+    def monthlyCooling(self):
+        return self.inputs.monthlySum(self.coolingPump)
+
+    @cached_property
+    def monthlyHeating(self):
+        return self.inputs.monthlySum(self.heatingModel)
+
+    @cached_property
+    def monthlyLightingModel(self):
+        return self.inputs.monthlySum(self.lightingModel)
+
+    @cached_property
+    def monthlyHeatingPump(self):
+        return self.inputs.monthlySum(self.heatingPump)
+
+    @cached_property
+    def monthlyNoComfort(self):
+        return self.inputs.monthlySum(self.noComfortTotal)
+
+    @cached_property
+    def totalModelOne(self):
+        return self.monthlyHeating + self.monthlyLightingModel # Monthly Heating Model Total
+
+    @cached_property
+    def totalModelTwo(self):
+        return self.monthlyHeatingPump + self.monthlyLightingModel # Monthly Heating Model w/ heat pump, no cooling
+
+    @cached_property
+    def totalModelThree(self):
+        return self.totalModelTwo + self.monthlyCooling # Monthly Heating Model w/ heat pump including cooling
+
+    @property
+    def hourlyOriginal(self):
+        return self.inputs.energy
+
+    @property
+    def monthlyOriginal(self):
+        return self.inputs.monthlyEnergyTotal
+
+    def scenario(self, heatPumpMode=None, retrofit=False, hourly=False):
+        # heatPumpMode: None, "Comfort Mode" or "No Comfort Mode"
+        # Only the requested scenario is computed, and only once
+        key = (heatPumpMode, retrofit, hourly)
+        if key not in self.scenarios:
+            name = f"scenario {heatPumpMode or 'Original'}{' + retrofit' if retrofit else ''}{' hourly' if hourly else ''}"
+            with stage(name, len(self.inputs.energy)):
+                if heatPumpMode == "Comfort Mode":
+                    values = self.hourlyModelThree if hourly else self.totalModelThree
+                elif heatPumpMode == "No Comfort Mode":
+                    values = self.noComfortTotal if hourly else self.monthlyNoComfort
+                else:
+                    values = self.hourlyOriginal if hourly else self.monthlyOriginal
+
+                self.scenarios[key] = values * (1 - self.retro) if retrofit else values
+        return self.scenarios[key]
+
+    def heatPumpEnergy(self, heatPumpMode=None, hourly=False):
+        # Electricity used by the heat pump in a scenario, the rest of the scenario is the metered fuel
+        if heatPumpMode == "Comfort Mode":
+            values = self.heatingPump + self.coolingPump
+        elif heatPumpMode == "No Comfort Mode":
+            values = self.noComfortPump
+        else:
+            values = np.zeros_like(self.inputs.energy)
+        return values if hourly else self.inputs.monthlySum(values)
+
+    def monthlyCost(self, heatPumpMode=None, retrofit=False):
+        # Monthly $ of a scenario, priced once per result (the charts and savings all read it)
+        key = (heatPumpMode, retrofit)
+        if key not in self.costs:
+            self.costs[key] = self.priceScenario(heatPumpMode, retrofit)
+        return self.costs[key]
+
+    def priceScenario(self, heatPumpMode, retrofit):
+        # One product of the scenario's hourly kWh with the tariff's prices
+        if self.fuelCost is not None:
+            # Gas that is left at the gas price, heat pump electricity at the electric price
+            electric = self.heatPumpEnergy(heatPumpMode)
+            cost = (self.scenario(heatPumpMode) - electric)*self.fuelCost + electric*self.cost
+            return cost * (1 - self.retro) if retrofit else cost
+
+        if self.tariff is None:
+            return self.scenario(heatPumpMode, retrofit) * self.cost
+
+        with stage('tariff costing', len(self.inputs.energy)):
+            cost = self.tariff.monthlyCost(self.scenario(heatPumpMode, retrofit, hourly=True))
+        return pd.Series(cost, index=self.monthlyOriginal.index)
+
+    def savings(self, heatPumpMode=None, retrofit=False):
+        # Monthly savings in $ compared to the original usage
+        if heatPumpMode is None:
+            return self.monthlyCost() - self.monthlyCost(None, True) if retrofit else self.monthlyOriginal * 0
+
+        savings = self.monthlyCost() - self.monthlyCost(heatPumpMode)
+        return savings * (1 - self.retro) if retrofit else savings
+
+    def repriced(self, retro, cost, tariff=None, fuelCost=None):
+        # Same energy at new prices or retrofit %, the series computed so far are shared.
+        # Only the retrofit scenarios depend on retro, so they are dropped.
+        priced = replace(self, retro=retro, cost=cost, tariff=tariff, fuelCost=fuelCost,
+                         scenarios={k: v for k, v in self.scenarios.items() if not k[1]}, costs={})
+        for name, value in vars(self).items():
+            priced.__dict__.setdefault(name, value)
+        return priced
+
+    def withCurves(self, COP, EER):
+        # Same building and loads with other heat pump curves. Curves that return one row per
+        # unit, e.g. a catalog's, make every heat pump series (units x hours)
+        fitted = replace(self, COP=COP, EER=EER, scenarios={}, costs={})
+        if 'lightingModel' in vars(self):
+            fitted.lightingModel = self.lightingModel
+        return fitted
+
+
+def comfortKernels(sinT, fit, heatingTemp, coolingTemp):
+    # Whole-array comfort model, works on any shape of sinT
+    baseLoad = int(fit.baseIntercept)
+
+    # Cooling only runs above the cooling setpoint
+    coolingEnergy = np.where(sinT <= coolingTemp, 0, fit.cooling(sinT))
+
+    # Total energy used on at heating temps, base load only above the heating setpoint
+    heatingEnergy = np.where(sinT > heatingTemp, baseLoad, fit.heating(sinT))
+
+    # Energy used for heating
+    heatingModel = np.clip(heatingEnergy - baseLoad, 0, None)
+
+    return coolingEnergy, heatingEnergy, heatingModel
+
+
+def noComfortSeries(inputs, fit, COP, efficiency=1.0):
+    # No Comfort Mode: metered usage above the base load is heating, moved hour for hour
+    # to the heat pump. Heat, heat pump kWh and the scenario's total kWh
+    energy = inputs.energy
+    heat = np.where(energy - fit.baseIntercept < 0, 0, energy - fit.baseIntercept)
+    pump = heat*efficiency / COP(noComfortTemperature(inputs))
+    return heat, pump, pump + energy - heat
+
+
+def simulate(inputs, fit, heatingTemp, coolingTemp, COP, EER, retro=0, cost=0, tariff=None, efficiency=1.0, fuelCost=None):
+    # Runs the comfort model only, heat pump and no comfort scenarios are computed
+    # by ModelResult when they are first read
+    if tariff is not None and fuelCost is not None:
+        raise ValueError("Tariffs are for electric bills, gas buildings use a flat gas and electricity price")
+
+    with stage('comfort model', len(inputs.energy)):
+        sinT = hourlyTemperature(inputs)
+
+        coolingEnergy, heatingEnergy, heatingModel = comfortKernels(sinT, fit, heatingTemp, coolingTemp)
+
+    return ModelResult(
+        inputs=inputs,
+        fit=fit,
+        heatingTemp=heatingTemp,
+        coolingTemp=coolingTemp,
+        retro=retro,
+        cost=cost,
+        COP=COP,
+        EER=EER,
+        sinT=sinT,
+        coolingEnergy=coolingEnergy,
+        heatingEnergy=heatingEnergy,
+        heatingModel=heatingModel,
+        tariff=tariff,
+        efficiency=efficiency,
+        fuelCost=fuelCost,
+    )
+
+
+def runModel(energy, tempData, date_range, splitTemp=None, heatingTemp=None, coolingTemp=None,
+             COP=None, EER=None, retro=0, cost=0, tariff=None, efficiency=1.0, fuelCost=None, observedTemp=None):
+    # One-call entry point: energy per interval + daily temperatures -> ModelResult
+    if COP is None or EER is None:
+        import CustomHP
+        COP = COP or CustomHP.COP
+        EER = EER or CustomHP.EER
+
+    inputs = prepareInputs(energy, tempData, date_range, observedTemp)
+    fit = fitLoads(inputs.monthlyTemp, inputs.monthlyEnergy, splitTemp)
+
+    # Default setpoints are where the heating line crosses zero
+    if heatingTemp is None:
+        heatingTemp = fit.heatingZero()
+    if coolingTemp is None:
+        coolingTemp = fit.heatingZero()
+
+    # Rate definitions (dict or JSON file) are compiled for this year's hours
+    if tariff is not None and not isinstance(tariff, Tariff):
+        tariff = compileTariff(tariff, inputs)
+
+    return simulate(inputs, fit, heatingTemp, coolingTemp, COP, EER, retro, cost, tariff, efficiency, fuelCost)
@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from batchRun import buildingFrom, modelBuilding, hourlyFrame
+from ingestCache import LRUCache, fileHash
+
+# Local HTTP service for the model, for internal tools that don't go through Streamlit.
+#
+#   python modelService.py --port 8765 --workers 4 --root /data/buildings
+#
+#   GET  /health     worker, in-flight and cache counts
+#   POST /summary    JSON building -> JSON summary (the numbers in batchRun's summary.csv)
+#   POST /hourly     JSON building -> hourly CSV, sent in chunks as it's written
+#
+# A request body is one manifest row as JSON (see batchRun.py for the keys), e.g.
+#   {"energy_file": "meter.csv", "temp_file": "noaa.csv", "year": 2023, "cost": 0.13}
+# with file paths relative to --root.
+#
+# Runs go to a bounded process pool. Requests are keyed by their parameters and the
+# content hashes of their files: identical requests arriving while one is running
+# all wait on that run, and recently finished results are answered from memory.
+
+fileKeys = ('energy_file', 'temp_file', 'cop_file', 'eer_file', 'tariff_file', 'weather_file')
+maxBody = 1024**2
+
+statusText = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+              413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error',
+              503: 'Service Unavailable'}
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+def requestKey(building):
+    # Same parameters and same file contents -> same key, whatever the building is called
+    params = {k: v for k, v in building.items() if k != 'building' and k not in fileKeys}
+    files = {k: fileHash(building[k]) for k in fileKeys if building.get(k) is not None}
+    text = json.dumps([params, files], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def runRequest(building):
+    # Worker process: summary dict plus the hourly frame (None if the model failed)
+    start = time.perf_counter()
+    summary = {'building': building['building'], 'status': 'ok', 'error': ''}
+    hourly = None
+    try:
+        result, numbers = modelBuilding(building)
+        summary.update(numbers)
+        hourly = hourlyFrame(result)
+    except Exception as e:
+        summary.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+        summary['traceback'] = traceback.format_exc()
+    summary['seconds'] = time.perf_counter() - start
+    return summary, hourly
+
+
+def jsonValue(value):
+    # numpy scalars from the summary, NaN and infinities become null (bare NaN isn't JSON)
+    if isinstance(value, dict):
+        return {k: jsonValue(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonValue(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+class ModelService:
+    def __init__(self, root='.', workers=None, maxPending=64, cacheEntries=32):
+        self.root = os.path.realpath(root)
+        self.workers = workers or os.cpu_count()
+        self.pool = self.newPool()
+        self.maxPending = maxPending
+        self.inflight = {}     # key -> (future, pool) of the running request
+        self.results = LRUCache(maxEntries=cacheEntries)
+        self.runs = 0
+        self.coalesced = 0
+        self.restarts = 0
+
+    def newPool(self):
+        # Spawned, not forked: forking next to the event loop's threads can deadlock the workers
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def restart(self, broken):
+        # A dead worker breaks the whole pool for good. The first request to find out replaces it,
+        # and the runs still listed for the old pool are dropped, their waiters submit again
+        if self.pool is not broken:
+            return
+        self.pool = self.newPool()
+        self.inflight = {k: v for k, v in self.inflight.items() if v[1] is not broken}
+        self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def building(self, params):
+        if not isinstance(params, dict):
+            raise ValueError("Request body must be a JSON object")
+        missing = {'energy_file', 'temp_file'} - set(params)
+        if missing:
+            raise ValueError(f"Request is missing: {', '.join(sorted(missing))}")
+        building = buildingFrom({'building': 'request', **params}, self.root)
+
+        # Absolute paths, ../ and symlinks must not reach files outside --root
+        for key in fileKeys:
+            if building.get(key) is not None:
+                resolved = os.path.realpath(building[key])
+                if os.path.commonpath([self.root, resolved]) != self.root:
+                    raise ValueError(f"{key} is outside the service root")
+                building[key] = resolved
+        return building
+
+    async def model(self, building):
+        key = await asyncio.to_thread(requestKey, building)
+        cached = self.results.get(key)
+        if cached is not None:
+            summary, hourly = cached
+            return {**summary, 'building': building['building']}, hourly
+
+        # A run lost to a broken pool goes again on a fresh one, like batchRun's suspects,
+        # and a run that breaks the new pool too is reported as the cause
+        for attempt in range(2):
+            future, pool = self.submit(key, building)
+            try:
+                # A client hanging up must not cancel the run other clients are waiting on
+                summary, hourly = await asyncio.shield(future)
+                break
+            except BrokenProcessPool:
+                self.restart(pool)
+                if attempt:
+                    raise
+        return {**summary, 'building': building['building']}, hourly
+
+    def submit(self, key, building):
+        if key in self.inflight:
+            self.coalesced += 1
+            return self.inflight[key]
+        if len(self.inflight) >= self.maxPending:
+            raise ServiceBusy(f"{len(self.inflight)} runs already queued, try again later")
+
+        pool = self.pool
+        try:
+            future = asyncio.get_running_loop().run_in_executor(pool, runRequest, building)
+        except BrokenProcessPool:
+            # Broken before this request got in, nothing of it was lost
+            self.restart(pool)
+            pool = self.pool
+            future = asyncio.get_running_loop().run_in_executor(pool, runRequest, building)
+        future.add_done_callback(lambda f: self.finished(key, f))
+        self.inflight[key] = (future, pool)
+        self.runs += 1
+        return future, pool
+
+    def finished(self, key, future):
+        # A restart may already have put a new run under this key
+        if self.inflight.get(key, (None,))[0] is future:
+            del self.inflight[key]
+        if not future.cancelled() and future.exception() is None:
+            summary, hourly = future.result()
+            if summary['status'] == 'ok':
+                self.results.put(key, future.result())
+
+    def health(self):
+        return {'status': 'ok', 'workers': self.workers, 'inflight': len(self.inflight),
+                'runs': self.runs, 'coalesced': self.coalesced, 'restarts': self.restarts,
+                'cache': self.results.stats()}
+
+    ### HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            method, target, headers, body = await readRequest(reader)
+            path = urlsplit(target).path
+            query = parse_qs(urlsplit(target).query)
+
+            if path == '/health':
+                await sendJSON(writer, 200, self.health())
+            elif path not in ('/summary', '/hourly'):
+                await sendJSON(writer, 404, {'error': f"No endpoint {path}"})
+            elif method != 'POST':
+                await sendJSON(writer, 405, {'error': f"{path} takes POST"})
+            else:
+                building = self.building(json.loads(body or b'{}'))
+                summary, hourly = await self.model(building)
+                summary.pop('traceback', None)
+                if summary['status'] != 'ok':
+                    await sendJSON(writer, 422, summary)
+                elif path == '/summary':
+                    await sendJSON(writer, 200, summary)
+                else:
+                    rows = int(query.get('rows', ['2000'])[0])
+                    await sendChunks(writer, 200, 'text/csv', csvChunks(hourly, rows))
+
+        except HTTPError as e:
+            await sendJSON(writer, e.status, {'error': str(e)})
+        except (ValueError, FileNotFoundError) as e:
+            await sendJSON(writer, 400, {'error': f"{type(e).__name__}: {e}"})
+        except ServiceBusy as e:
+            await sendJSON(writer, 503, {'error': str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await sendJSON(writer, 500, {'error': f"{type(e).__name__}: {e}"})
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            print(f"Serving the heat pump model on http://{host}:{port} with {self.workers} workers", file=sys.stderr)
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def readRequest(reader):
+    # Request line, headers and a Content-Length body, one request per connection
+    requestLine = (await reader.readline()).decode('latin-1').split()
+    if len(requestLine) != 3:
+        raise HTTPError(400, "Malformed request line")
+    method, target, _ = requestLine
+
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if length > maxBody:
+        raise HTTPError(413, f"Request body over {maxBody} bytes")
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+def header(status, contentType, extra=''):
+    return (f"HTTP/1.1 {status} {statusText.get(status, '')}\r\n"
+            f"Content-Type: {contentType}\r\nConnection: close\r\n{extra}\r\n").encode('latin-1')
+
+
+async def sendJSON(writer, status, payload):
+    data = json.dumps(jsonValue(payload), allow_nan=False).encode()
+    writer.write(header(status, 'application/json', f"Content-Length: {len(data)}\r\n") + data)
+    await writer.drain()
+
+
+async def sendChunks(writer, status, contentType, chunks):
+    # Chunked transfer encoding, waiting for the client to take each chunk before making the next
+    writer.write(header(status, contentType, "Transfer-Encoding: chunked\r\n"))
+    for chunk in chunks:
+        data = chunk.encode()
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def csvChunks(hourly, rows):
+    rows = max(rows, 1)
+    for start in range(0, len(hourly), rows):
+        yield hourly.iloc[start:start + rows].to_csv(header=start == 0, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the heat pump model as local JSON endpoints.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--root', default='.', help="Directory request file paths are relative to")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument('--max-pending', type=int, default=64, help="Distinct runs queued before requests get 503")
+    parser.add_argument('--cache-entries', type=int, default=32, help="Finished results kept in memory")
+    args = parser.parse_args(argv)
+
+    service = ModelService(args.root, args.workers, args.max_pending, args.cache_entries)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,58 +1,47 @@
 import streamlit as st
 
-
-
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from scipy import stats
-import streamlit as st
-import plotly.graph_objects as go
+from modelEngine import meterDateRange, gasUnits
 
 st.set_page_config(page_title="Gas", layout="wide", page_icon='⚡')
-st.title("Page 1")
-st.write("This is Page 1.")
+st.title("Gas Bill Modeling")
+
+st.markdown("""
+Gas meter data runs through the same model as the electric page, converted to
+kWh-equivalent. The heat pump scenarios replace the furnace: the heat it delivered
+(gas x furnace efficiency) comes from the heat pump's electricity instead, and
+savings compare the gas bill with the heat pump's electric bill.
+""")
 
 
 # Declare placeholder variables to fill based on the data type
 energy_file = None
 temp_file = None
 date_range = None
-power_column = None
-hourlyEnergy = None
-dataType = None
-gasUnit = None
-
-
-gasUnit = st.radio("Select Energy Unit", ["CCF", "Btu", "Therms", "MJ", "kWh"])
-
-if gasUnit == "CCF":
-  gasConv = 30.36
-elif gasUnit == "Btu":
-  gasConv = (30.36/103,600)
-elif gasUnit == "Therms":
-  gasConv = (30.36/1.036)
-elif gasUnit == "MJ":
-  gasConv = (30.36/109.3)
-elif gasUnit == "kWh":
-  gasConv = 1
-elif gasUnit == None:
-  gasConv = 1
-
-year = st.number_input("Enter year data is from (ie. 2023). Leap years currently don't work.", 
+
+gasUnit = st.radio("Select Energy Unit", list(gasUnits))
+
+year = st.number_input("Enter year data is from (ie. 2023).",
                        value=2023)
 
-column_name = st.text_input("Enter exact header name of column for power data (case sensitive!)",
-                            value='Power')
+column_name = st.text_input("Enter exact header name of column for gas usage (case sensitive!)",
+                            value='Gas')
 
 retro = st.number_input("Enter % building retrofit",
                             value=30)
 
 retro = retro/100
 
-cost = st.number_input("Enter energy cost per kWh in $",
+cost = st.number_input("Enter electricity cost per kWh in $",
                        value = 0.1241)
 
+gasPrice = st.number_input(f"Enter gas cost per {gasUnit} in $",
+                           value = 1.20)
+
+afue = st.number_input("Enter furnace efficiency (AFUE %)",
+                       min_value=1, max_value=100, value=80)
+
+afue = afue/100
+
 hp_input = st.selectbox(
     "Do you want to import custom heat pump performance data, or just use a deafult one (DZ17VSA361B* + DV36FECC14A*)",
     ('Default','Custom')
@@ -60,81 +49,43 @@ hp_input = st.selectbox(
 
 customCOP = None
 customEER = None
+curveKind = 'linear'
 
 if hp_input == 'Default':
     customCOP = 1
     customEER = 1
-    
+
 
 elif hp_input == 'Custom':
     st.write('COP Data')
     customCOP = st.file_uploader("Upload CSV with two columns named 'Temp' and 'COP' (case sensitive)", type='csv')
-    
+
     st.write('EER Data')
     customEER = st.file_uploader("Upload CSV with three columns named 'totalBTU' 'totalWATT' and 'temp' (case sensitive)", type='csv')
 
+    curveKinds = {'Linear': 'linear', 'Polynomial (2nd order)': 'poly', 'Piecewise linear': 'piecewise'}
+    curveKind = curveKinds[st.selectbox("How should the COP/EER data be fit?", tuple(curveKinds))]
+
 freq = st.selectbox(
     "What type of data are you using?",
     ("Hourly", "15-Minute")
 )
 
-if freq == 'Hourly':
-    #data_type = st.selectbox('Select Data Type',('Energy (kWh)','Power (kW'))
-    st.write('Upload Hourly Power CSV')
-    energy_file = st.file_uploader('Upload CSV File', type='csv')
-    date_range = pd.date_range(start=f'{year}-01-01', periods=8760, freq='h')
-    if energy_file is not None and temp_file is not None:
-        data = pd.read_csv(energy_file)
-
-        if date_range is not None:
-            data.insert(0, 'DATE', date_range.date)
-            data.insert(1, 'TIME', date_range.time)
-            
-            data['DATE'] = pd.to_datetime(data['DATE'], format='%Y-%m-%d')
-            data['TIME'] = pd.to_datetime(data['TIME'], format='%H:%M:%S')
-
-            
-            data['HourOfYear'] = data['TIME'].dt.hour
-            data['DayOfYear'] = data['DATE'].dt.dayofyear
-            
-            # Remove Unnamed Columns
-            cols_to_drop = [3,4,5,6,7,8]
-            cols_to_drop = [i for i in cols_to_drop if i < len(data.columns)]
-            data.drop(data.columns[cols_to_drop], axis=1, inplace=True)
-            
-            energy = data[f'{column_name}']
-            data.insert(3, 'Energy', energy)
-
-            
-            hourlyEnergy = energy
-            
-
-elif freq == "15-Minute":
-    st.write('Upload 15-Min Power CSV')
-    energy_file = st.file_uploader('Upload CSV File', type='csv')
-    date_range = pd.date_range(start=f'{year}-01-01', periods=35040, freq='15min')
-    if energy_file is not None and temp_file is not None:
-        data = pd.read_csv(energy_file)
-
-        if date_range is not None:
-            data.insert(0, 'DATE', date_range.date)
-            data.insert(1, 'TIME', date_range.time)
-            
-            # Remove Unnamed Columns
-            cols_to_drop = [3,4,5,6,7,8]
-            cols_to_drop = [i for i in cols_to_drop if i < len(data.columns)]
-            data.drop(data.columns[cols_to_drop], axis=1, inplace=True)
-            
-            energy = data[f'{column_name}'] * 0.25
-            data.insert(3, 'Energy', energy)
-            
-            # Group 15 minute energy data by hour in year
-            hourlyEnergy = data.groupby(['DayOfYear', 'HourOfYear'])['Energy'].sum().reset_index()
+st.write(f'Upload {freq} Gas Usage CSV ({gasUnit} per interval)')
+energy_file = st.file_uploader('Upload CSV File', type='csv')
+date_range = meterDateRange(year, freq)
 
 
 temp_file = st.file_uploader("Upload Temperature CSV File, use NOAA databases",
                              type="csv")
 
+# Optional hourly station observations, the daily highs/lows sinusoid is used without one
+weather_file = st.file_uploader("Optional: NOAA ISD or ISD-Lite hourly station file (observed hourly temperatures)")
+utcOffset = 0
+if weather_file is not None:
+    utcOffset = st.number_input("Meter time zone offset from UTC in standard time (e.g. -8 for Pacific)",
+                                min_value=-12, max_value=14, value=-5)
+
 
 
 
@@ -143,14 +94,16 @@ if energy_file is not None and temp_file is not None and year is not None and co
     try:
         from electricDataProcessing import electricModel
 
-        electricModel(energy_file, temp_file, date_range, column_name, retro, cost, year, customCOP, customEER)
-        
-        
+        # $ per kWh-equivalent of gas
+        fuelCost = gasPrice / gasUnits[gasUnit]
+
+        electricModel(energy_file, temp_file, date_range, column_name, retro, cost, year, customCOP, customEER,
+                      curveKind=curveKind, unit=gasUnit, efficiency=afue, fuelCost=fuelCost,
+                      weather_file=weather_file, utcOffset=utcOffset)
+
+
 
     except Exception as e:
         st.error(f"Error processing files: {e}")
 else:
     st.info("Please upload both CSV files and define inputs to begin.")
-
-
-    
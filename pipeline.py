@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+from dataclasses import fields, is_dataclass
+
+import numpy as np
+import pandas as pd
+
+from changePoint import bestSplit, fitBest
+from CustomHP import HeatPumpCurve
+from hpCatalog import HeatPumpCatalog, simulateUnits, rankUnits
+from ingestCache import cachedInputs, fileHash, rangeKey
+from instrumentation import stage
+from isdWeather import observedTemperature
+from modelEngine import fitLoads, hourlyTemperature, noComfortSeries, comfortKernels, ModelResult
+from setpointSweep import sweepSetpoints
+from tariff import Tariff, compileTariff
+
+# The model as a graph of memoized stages. Every stage declares the parameters and
+# stages it reads, and is only recomputed when one of them changed since its last run:
+#
+#   pipeline = modelPipeline()
+#   pipeline.set(energy_file=..., temp_file=..., column_name='Power', date_range=..., splitTemp=None,
+#                heatingTemp=60, coolingTemp=75, COP=COP, EER=EER, retro=0.3, cost=0.12)
+#   result = pipeline.get('costing')
+#   pipeline.set(cost=0.15)              # only 'costing' runs again
+#   result = pipeline.get('costing')
+#
+# Parameters are compared by content (file hashes, array bytes, values), so Streamlit
+# reruns that pass new upload objects for the same files, or rebuild equal curves,
+# tariffs and saved inputs, don't invalidate anything.
+#
+#   weather        weather_file, utcOffset, date_range   observed hourly temperatures, optional
+#   aggregation    energy_file, temp_file, column_name,  parsed files and monthly aggregates, shared
+#                  date_range, unit, weather             by sessions (or pinned to saved ModelInputs)
+#   balancePoint   aggregation                           automatic split and change-point fit
+#   loadFit        aggregation, balancePoint, splitTemp
+#   temperature    aggregation                           observed, or the hourly sinusoid
+#   comfort        temperature, loadFit, heatingTemp, coolingTemp
+#   noComfort      aggregation, loadFit, COP, efficiency
+#   tariff         aggregation, tariffFile
+#   result         comfort and no comfort energy, COP, EER
+#   costing        result, retro, cost, tariff, fuelCost
+#   sweep          aggregation, loadFit, COP, EER, cost, efficiency   annual savings of every setpoint pair
+#   catalog        catalogDir, curveKind                 heat pump catalog curves, read once
+#   units          result, catalog                       the result with every catalog model's curves
+#   ranking        costing, catalog, units               catalog models priced and ordered
+
+
+# Given as paths, these are compared by the file contents
+fileParams = ('energy_file', 'temp_file', 'weather_file', 'tariffFile')
+
+# What defines a heat pump curve, its lookup table follows from these
+curveFields = ('kind', 'temp', 'value', 'slope', 'intercept', 'coefficients')
+
+
+def fingerprint(value):
+    # Equal fingerprints mean a stage would compute the same thing
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+    if isinstance(value, pd.DatetimeIndex):
+        return rangeKey(value)
+    if isinstance(value, dict):
+        return json.dumps(value, sort_keys=True, default=str)
+    if hasattr(value, 'read') or hasattr(value, 'getvalue'):
+        return fileHash(value)
+    if isinstance(value, np.ndarray):
+        return hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        labels = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        return hashlib.sha1(pd.util.hash_pandas_object(value).to_numpy().tobytes() + repr(labels).encode()).hexdigest()
+    # Compiled tariffs and saved inputs by their fields, curves by what they were fit to
+    if is_dataclass(value) and not isinstance(value, type):
+        return fieldsKey(value, [f.name for f in fields(value)])
+    if isinstance(value, HeatPumpCurve):
+        return fieldsKey(value, curveFields)
+    # Functions such as the default curves, the same object is the same value
+    return ('id', id(value))
+
+
+def fieldsKey(value, names):
+    return (type(value).__name__,) + tuple((name, fingerprint(getattr(value, name))) for name in names)
+
+
+class Node:
+    def __init__(self, name, inputs, compute, reuse=False):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+        self.reuse = reuse      # compute also gets its last output as previous=
+
+
+class Pipeline:
+    def __init__(self, nodes):
+        self.nodes = {node.name: node for node in nodes}
+        self.values = {}                  # parameter -> latest value
+        self.keys = {}                    # parameter -> fingerprint
+        self.pinned = {}                  # stage -> value given in place of computing it
+        self.versions = defaultdict(int)  # parameter or stage -> bumped on every change
+        self.memo = {}                    # stage -> (input versions, value)
+        self.runs = Counter()             # stage -> times computed
+
+    def set(self, **values):
+        for name, value in values.items():
+            if name in self.nodes:
+                self.pin(name, value)
+                continue
+
+            key = fileHash(value) if name in fileParams and isinstance(value, (str, os.PathLike)) else fingerprint(value)
+            if name not in self.keys or self.keys[name] != key:
+                self.keys[name] = key
+                self.versions[name] += 1
+            self.values[name] = value
+
+    def pin(self, name, value):
+        # A stage output given directly (None computes it again), e.g. ModelInputs of a saved building
+        previous = self.pinned.get(name)
+        if value is None:
+            if name in self.pinned:
+                del self.pinned[name]
+                self.memo.pop(name, None)
+                self.versions[name] += 1
+        elif previous is None or fingerprint(previous) != fingerprint(value):
+            self.pinned[name] = value
+            self.versions[name] += 1
+
+    def get(self, name):
+        if name in self.pinned:
+            return self.pinned[name]
+        if name not in self.nodes:
+            if name not in self.values:
+                raise ValueError(f"Pipeline parameter {name!r} was never set")
+            return self.values[name]
+
+        node = self.nodes[name]
+        args = [self.get(i) for i in node.inputs]
+        versions = tuple(self.versions[i] for i in node.inputs)
+
+        memo = self.memo.get(name)
+        if memo is None or memo[0] != versions:
+            extra = {'previous': memo[1] if memo is not None else None} if node.reuse else {}
+            with stage(f'pipeline {name}'):
+                value = node.compute(*args, **extra)
+            self.memo[name] = (versions, value)
+            self.versions[name] += 1
+            self.runs[name] += 1
+        return self.memo[name][1]
+
+    def invalidate(self, name=None):
+        # Forget one stage (downstream stages follow on their next get) or everything
+        for stale in [name] if name is not None else list(self.memo):
+            if self.memo.pop(stale, None) is not None:
+                self.versions[stale] += 1
+
+
+### Stages
+
+
+def weather(weather_file, utcOffset, date_range):
+    return None if weather_file is None else observedTemperature(weather_file, date_range, utcOffset)
+
+
+def aggregate(energy_file, temp_file, column_name, date_range, unit, observed):
+    # Kept in the shared upload cache by file contents, other sessions with the same files reuse it
+    return cachedInputs(energy_file, temp_file, column_name, date_range, unit, None if observed is None else observed.temp)
+
+
+def balancePoint(inputs):
+    x, y = np.array(inputs.monthlyTemp), np.array(inputs.monthlyEnergy)
+    return bestSplit(x, y), fitBest(x, y)
+
+
+def loadFit(inputs, balance, splitTemp):
+    return fitLoads(inputs.monthlyTemp, inputs.monthlyEnergy, balance[0].splitTemp if splitTemp is None else splitTemp)
+
+
+def temperature(inputs):
+    return hourlyTemperature(inputs)
+
+
+def comfort(sinT, fit, heatingTemp, coolingTemp):
+    return comfortKernels(sinT, fit, heatingTemp, coolingTemp)
+
+
+def noComfort(inputs, fit, COP, efficiency):
+    # Kept apart from the result so setpoint changes skip it
+    return noComfortSeries(inputs, fit, COP, efficiency)
+
+
+def compileRates(inputs, tariffFile):
+    if tariffFile is None or isinstance(tariffFile, Tariff):
+        return tariffFile
+    return compileTariff(tariffFile, inputs)
+
+
+def energyResult(inputs, fit, sinT, kernels, noComfortParts, heatingTemp, coolingTemp, COP, EER, efficiency):
+    # Energy only, costing reprices it without touching the hourly series
+    coolingEnergy, heatingEnergy, heatingModel = kernels
+    result = ModelResult(inputs=inputs, fit=fit, heatingTemp=heatingTemp, coolingTemp=coolingTemp, retro=0, cost=0,
+                         COP=COP, EER=EER, sinT=sinT, coolingEnergy=coolingEnergy, heatingEnergy=heatingEnergy,
+                         heatingModel=heatingModel, efficiency=efficiency)
+    result.noComfort = noComfortParts
+    return result
+
+
+def costing(result, retro, cost, tariff, fuelCost, previous=None):
+    if tariff is not None and fuelCost is not None:
+        raise ValueError("Tariffs are for electric bills, gas buildings use a flat gas and electricity price")
+
+    # Repricing the last costed result of the same energy also keeps the series read from it since
+    source = previous if previous is not None and previous.base is result else result
+    priced = source.repriced(retro, cost, tariff, fuelCost)
+    priced.base = result
+    return priced
+
+
+def setpointGrid(inputs, fit, COP, EER, cost, efficiency):
+    # Heating setpoints up to where the heating line reaches zero, cooling setpoints from there
+    zero = fit.heatingZero()
+    return sweepSetpoints(inputs, fit, COP, EER, heatingTemps=np.arange(5, max(zero, 5) + 1),
+                          coolingTemps=np.arange(min(zero, 90), 91), cost=cost, efficiency=efficiency)
+
+
+def loadCatalog(directory, kind):
+    return HeatPumpCatalog(directory, kind)
+
+
+def ranking(result, catalog, units):
+    return rankUnits(result, catalog, units)
+
+
+def modelPipeline():
+    pipeline = Pipeline([
+        Node('weather', ('weather_file', 'utcOffset', 'date_range'), weather),
+        Node('aggregation', ('energy_file', 'temp_file', 'column_name', 'date_range', 'unit', 'weather'), aggregate),
+        Node('balancePoint', ('aggregation',), balancePoint),
+        Node('loadFit', ('aggregation', 'balancePoint', 'splitTemp'), loadFit),
+        Node('temperature', ('aggregation',), temperature),
+        Node('comfort', ('temperature', 'loadFit', 'heatingTemp', 'coolingTemp'), comfort),
+        Node('noComfort', ('aggregation', 'loadFit', 'COP', 'efficiency'), noComfort),
+        Node('tariff', ('aggregation', 'tariffFile'), compileRates),
+        Node('result', ('aggregation', 'loadFit', 'temperature', 'comfort', 'noComfort',
+                        'heatingTemp', 'coolingTemp', 'COP', 'EER', 'efficiency'), energyResult),
+        Node('costing', ('result', 'retro', 'cost', 'tariff', 'fuelCost'), costing, reuse=True),
+        Node('sweep', ('aggregation', 'loadFit', 'COP', 'EER', 'cost', 'efficiency'), setpointGrid),
+        Node('catalog', ('catalogDir', 'curveKind'), loadCatalog),
+        Node('units', ('result', 'catalog'), simulateUnits),
+        Node('ranking', ('costing', 'catalog', 'units'), ranking),
+    ])
+    pipeline.set(unit=None, weather_file=None, utcOffset=0, splitTemp=None, efficiency=1.0, retro=0, cost=0,
+                 tariffFile=None, fuelCost=None, catalogDir=None, curveKind='linear')
+    return pipeline
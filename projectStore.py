@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from modelEngine import readHourlyEnergy, readTemperature, prepareTemperature, prepareInputs
+from ingestCache import cache, csvSource
+
+# On-disk project store. Each building is converted once from CSV into plain .npy
+# columns plus a metadata.json, and reopened later with memory-mapped reads:
+#
+#   projects/<name>/metadata.json
+#   projects/<name>/energy.npy         hourly kWh (float64)
+#   projects/<name>/temp_date.npy      NOAA days (datetime64[D])
+#   projects/<name>/temp_tmax.npy
+#   projects/<name>/temp_tmin.npy
+
+projectRoot = os.environ.get('HP_MODEL_PROJECTS', 'projects')
+
+formatVersion = 1
+
+
+def projectPath(name, root=None):
+    # Names are one directory under the root: '.', '..' and other all-dot or blank names are refused
+    if not re.fullmatch(r'[\w\- .]+', name) or not name.strip('. '):
+        raise ValueError(f"Invalid project name: {name!r}")
+    root = os.path.realpath(root or projectRoot)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"Project {name!r} is outside the projects directory")
+    return path
+
+
+def listProjects(root=None):
+    root = root or projectRoot
+    if not os.path.isdir(root):
+        return []
+    return sorted(p for p in os.listdir(root) if os.path.isfile(os.path.join(root, p, 'metadata.json')))
+
+
+def saveProject(name, energy, tempData, start, metadata=None, root=None):
+    # energy: hourly kWh starting at start, tempData: DataFrame with DATE, TMAX, TMIN
+    path = projectPath(name, root)
+    tempData = prepareTemperature(tempData)
+    energy = np.ascontiguousarray(energy, dtype=np.float64)
+
+    meta = dict(metadata or {})
+    meta.update({
+        'formatVersion': formatVersion,
+        'name': name,
+        'start': str(pd.Timestamp(start)),
+        'hours': len(energy),
+        'days': len(tempData),
+        'saved': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+
+    # Write next to the final location and swap in, so a crash never leaves half a project
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f'.{name}-', dir=parent)
+    retired = None
+    try:
+        np.save(os.path.join(staging, 'energy.npy'), energy)
+        np.save(os.path.join(staging, 'temp_date.npy'), tempData['DATE'].to_numpy().astype('datetime64[D]'))
+        np.save(os.path.join(staging, 'temp_tmax.npy'), tempData['TMAX'].to_numpy(dtype=np.float64))
+        np.save(os.path.join(staging, 'temp_tmin.npy'), tempData['TMIN'].to_numpy(dtype=np.float64))
+        with open(os.path.join(staging, 'metadata.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        # The old project is renamed aside (one level down, so listProjects skips it) and only
+        # deleted once the new one has its name. A failed swap puts it back
+        if os.path.isdir(path):
+            retired = tempfile.mkdtemp(prefix=f'.{name}-', dir=parent)
+            os.replace(path, os.path.join(retired, name))
+        try:
+            os.replace(staging, path)
+        except BaseException:
+            if retired is not None:
+                os.replace(os.path.join(retired, name), path)
+            raise
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        if retired is not None:
+            shutil.rmtree(retired, ignore_errors=True)
+        raise
+
+    if retired is not None:
+        shutil.rmtree(retired, ignore_errors=True)
+    return path
+
+
+def importProject(name, energy_file, temp_file, column_name, date_range, root=None, metadata=None):
+    # Validate and convert a meter CSV + NOAA CSV pair once
+    energy = readHourlyEnergy(csvSource(energy_file), column_name, date_range)
+    tempData = readTemperature(csvSource(temp_file))
+
+    meta = {'column_name': column_name, 'intervalsPerHour': len(date_range) // len(energy)}
+    meta.update(metadata or {})
+    return saveProject(name, energy, tempData, date_range[0], meta, root)
+
+
+class Project:
+    def __init__(self, name, root=None):
+        self.path = projectPath(name, root)
+        with open(os.path.join(self.path, 'metadata.json')) as f:
+            self.metadata = json.load(f)
+
+        if self.metadata.get('formatVersion') != formatVersion:
+            raise ValueError(f"Project {name!r} was saved with an unsupported format version")
+
+        # Memory-mapped, nothing is read until the arrays are used
+        self.energy = self.column('energy')
+        self.tempDate = self.column('temp_date')
+        self.tempMax = self.column('temp_tmax')
+        self.tempMin = self.column('temp_tmin')
+
+    def column(self, name):
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+    @property
+    def start(self):
+        return pd.Timestamp(self.metadata['start'])
+
+    @property
+    def year(self):
+        return self.start.year
+
+    def dateRange(self):
+        return pd.date_range(start=self.start, periods=len(self.energy), freq='h')
+
+    def tempData(self):
+        return prepareTemperature(pd.DataFrame({'DATE': self.tempDate, 'TMAX': self.tempMax, 'TMIN': self.tempMin}))
+
+    def inputs(self):
+        return prepareInputs(self.energy, self.tempData(), self.dateRange())
+
+
+def loadProject(name, root=None):
+    return Project(name, root)
+
+
+def deleteProject(name, root=None):
+    shutil.rmtree(projectPath(name, root))
+
+
+def projectInputs(name, root=None):
+    # ModelInputs for a saved building, kept in the upload cache until the project is re-saved
+    project = loadProject(name, root)
+    key = ('project', os.path.abspath(project.path), project.metadata['saved'])
+    return cache.getOrCompute(key, project.inputs)
@@ -0,0 +1,49 @@
+import numpy as np
+from dataclasses import dataclass
+
+from modelEngine import hourlyTemperature, comfortKernels
+
+# Annual comfort-mode usage over a grid of (heatingTemp, coolingTemp) setpoints.
+# The heating side only depends on heatingTemp and the cooling side only on
+# coolingTemp, so comfortKernels broadcasts sinT against each side's setpoints
+# once and the surface is their outer sum.
+
+
+@dataclass
+class SweepResult:
+    heatingTemps: np.ndarray
+    coolingTemps: np.ndarray
+    annualKWh: np.ndarray        # (heatingTemps x coolingTemps), NaN where heating > cooling
+    savingsKWh: np.ndarray       # Compared to the original annual usage
+    savingsCost: np.ndarray      # $
+    originalKWh: float
+
+    def best(self):
+        # Setpoint pair with the largest $ savings
+        i, j = np.unravel_index(np.nanargmax(self.savingsCost), self.savingsCost.shape)
+        return self.heatingTemps[i], self.coolingTemps[j], self.savingsCost[i, j]
+
+
+def sweepSetpoints(inputs, fit, COP, EER, heatingTemps=None, coolingTemps=None, cost=0, retro=0, efficiency=1.0):
+    heatingTemps = np.arange(5, 91) if heatingTemps is None else np.asarray(heatingTemps, dtype=float)
+    coolingTemps = np.arange(5, 91) if coolingTemps is None else np.asarray(coolingTemps, dtype=float)
+
+    sinT = hourlyTemperature(inputs)
+    hours = sinT[None, :]
+
+    # Setpoints as columns: heating rows are (heatingTemps x hours), cooling rows (coolingTemps x hours)
+    coolingEnergy, heatingEnergy, heatingModel = comfortKernels(hours, fit, heatingTemps[:, None], coolingTemps[:, None])
+
+    # Heat pump + lighting for every heating setpoint, heat pump cooling for every cooling setpoint
+    heatingAnnual = np.nansum(heatingModel*efficiency / COP(hours) + heatingEnergy - heatingModel, axis=1)
+    coolingAnnual = np.nansum((coolingEnergy*efficiency / EER(hours))*3.412, axis=1)
+
+    modelKWh = heatingAnnual[:, None] + coolingAnnual[None, :]
+    modelKWh[heatingTemps[:, None] > coolingTemps[None, :]] = np.nan
+
+    # Retrofit scales the scenario and its savings, as in ModelResult.scenario and .savings
+    originalKWh = float(np.nansum(inputs.monthlyEnergyTotal))
+    annualKWh = modelKWh * (1 - retro)
+    savingsKWh = (originalKWh - modelKWh) * (1 - retro)
+
+    return SweepResult(heatingTemps, coolingTemps, annualKWh, savingsKWh, savingsKWh * cost, originalKWh)
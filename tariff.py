@@ -0,0 +1,130 @@
+import datetime
+import json
+
+import numpy as np
+from dataclasses import dataclass
+
+# Electricity tariffs compiled to an hourly price vector for the model year.
+#
+# A rate definition is a dict (or JSON file) like:
+#
+#   {
+#     "name": "Residential TOU",
+#     "rate": 0.12,                      $/kWh for hours no period covers
+#     "fixedMonthly": 10.0,              Customer charge, $/month (optional)
+#     "periods": [                       First matching period sets the hour's price
+#       {"name": "Summer peak", "months": [6, 7, 8, 9], "hours": [16, 17, 18, 19, 20],
+#        "days": "weekdays", "rate": 0.34},
+#       {"name": "Winter", "months": [11, 12, 1, 2, 3], "rate": 0.14}
+#     ],
+#     "tiers": [                         Extra $/kWh on monthly usage above each threshold
+#       {"above": 600, "adder": 0.03},
+#       {"above": 1200, "adder": 0.05}
+#     ]
+#   }
+#
+# months default to all of them, hours (0-23) to the whole day and days to "all"
+# ("weekdays" or "weekends" otherwise). Compiling builds the price of every hour
+# once, so costing hourly kWh is one matrix product against a (hours x months)
+# price matrix, for a single series or a whole (scenarios x hours) array.
+
+
+@dataclass
+class Tariff:
+    name: str
+    price: np.ndarray          # $/kWh for every hour of the year
+    month: np.ndarray          # Month of every hour
+    thresholds: np.ndarray     # Monthly kWh where each tier starts
+    adders: np.ndarray         # Extra $/kWh above each threshold
+    fixedMonthly: float = 0.0
+
+    def __post_init__(self):
+        self.present = np.flatnonzero(np.bincount(self.month, minlength=13))
+        months = np.zeros((len(self.month), 13))
+        months[np.arange(len(self.month)), self.month] = 1
+        self.months = months[:, self.present]                # (hours x months) 0/1
+        self.priceMonths = self.price[:, None] * self.months   # (hours x months) $/kWh
+
+    def monthlyCost(self, kWh):
+        # $ per month for hourly kWh of shape (..., hours)
+        kWh = np.nan_to_num(np.asarray(kWh, dtype=float))
+        energy = kWh @ self.priceMonths
+        if len(self.thresholds):
+            usage = kWh @ self.months
+            energy = energy + (np.clip(usage[..., None] - self.thresholds, 0, None) * self.adders).sum(axis=-1)
+        return energy + self.fixedMonthly
+
+    def annualCost(self, kWh):
+        return self.monthlyCost(kWh).sum(axis=-1)
+
+    def averagePrice(self, kWh):
+        # Effective $/kWh for this usage, for the parts of the app that take a flat cost
+        kWh = np.nan_to_num(np.asarray(kWh, dtype=float))
+        total = kWh.sum(axis=-1)
+        energy = self.annualCost(kWh) - self.fixedMonthly*len(self.present)
+        # No usage has no average, the plain mean of the hourly prices stands in for it
+        return np.where(total > 0, energy / np.where(total > 0, total, 1), self.price.mean())[()]
+
+
+def flatRate(cost):
+    return {'name': f'Flat ${cost}/kWh', 'rate': cost}
+
+
+def readTariff(file):
+    # JSON rate definition from a path or an uploaded file
+    if isinstance(file, dict):
+        return file
+    if hasattr(file, 'read'):
+        data = file.read()
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return json.loads(data)
+    with open(file) as f:
+        return json.load(f)
+
+
+def hourCalendar(inputs):
+    # Hour of day and weekday (Monday = 0) of every modeled hour, the year starts at midnight Jan 1
+    hourOfDay = inputs.hoursInYear % 24
+    weekday = (datetime.date(inputs.year, 1, 1).weekday() + inputs.dayOfYear) % 7
+    return hourOfDay, weekday
+
+
+def compileTariff(definition, inputs):
+    definition = readTariff(definition)
+    hourOfDay, weekday = hourCalendar(inputs)
+
+    price = np.full(len(inputs.hoursInYear), float(definition.get('rate', np.nan)))
+    assigned = np.zeros(len(price), dtype=bool)
+
+    for period in definition.get('periods', []):
+        days = period.get('days', 'all')
+        if days not in ('all', 'weekdays', 'weekends'):
+            raise ValueError(f"Unknown days {days!r} in period {period.get('name', '')!r}, use all, weekdays or weekends")
+
+        match = ~assigned
+        if 'months' in period:
+            match &= np.isin(inputs.month, period['months'])
+        if 'hours' in period:
+            match &= np.isin(hourOfDay, period['hours'])
+        if days == 'weekdays':
+            match &= weekday < 5
+        elif days == 'weekends':
+            match &= weekday >= 5
+
+        price[match] = period['rate']
+        assigned |= match
+
+    if np.isnan(price).any():
+        raise ValueError(f"Tariff {definition.get('name', '')!r} has no rate for some hours, add a default 'rate'")
+
+    tiers = sorted(definition.get('tiers', []), key=lambda t: t['above'])
+    return Tariff(
+        name=definition.get('name', 'Tariff'),
+        price=price,
+        month=inputs.month,
+        thresholds=np.array([t['above'] for t in tiers], dtype=float),
+        adders=np.array([t['adder'] for t in tiers], dtype=float),
+        fixedMonthly=float(definition.get('fixedMonthly', 0)),
+    )
+
@@ -0,0 +1,45 @@
+import os
+import sys
+import warnings
+
+import pytest
+
+# The modules live at the top of the repository, next to the Streamlit pages
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+energyFile = os.path.join(root, 'example meter data.csv')
+tempFile = os.path.join(root, 'example NOAA data.csv')
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    # The example files trip pandas' date inference warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+@pytest.fixture(scope='session')
+def tempData():
+    # The example NOAA file, parsed once
+    from modelEngine import readTemperature
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return readTemperature(tempFile)
+
+
+@pytest.fixture(scope='session')
+def example():
+    # The example building run once through the reference engine
+    import CustomHP
+    from modelEngine import meterDateRange, readHourlyEnergy, readTemperature, runModel, hourlyRange
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        dateRange = meterDateRange(2023, '15-Minute')
+        energy = readHourlyEnergy(energyFile, 'Power', dateRange)
+        temperature = readTemperature(tempFile)
+        return runModel(energy, temperature, hourlyRange(dateRange), COP=CustomHP.COP, EER=CustomHP.EER,
+                        retro=0.3, cost=0.1241, heatingTemp=50, coolingTemp=70)
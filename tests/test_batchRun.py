@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+import pytest
+
+import batchRun
+
+
+def fakeRun(building, outputDir, profile=False):
+    # Stands in for the model in the workers, a 'crash' building kills its process outright
+    if building['building'] == 'crash':
+        os._exit(1)
+    return {'building': building['building'], 'status': 'ok', 'error': ''}
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="workers must inherit the patched runBuilding")
+def test_dead_worker_only_fails_its_own_building(tmp_path, monkeypatch):
+    monkeypatch.setattr(batchRun, 'runBuilding', fakeRun)
+    buildings = [{'building': f'b{i}'} for i in range(10)]
+    buildings[4] = {'building': 'crash'}
+
+    summary = batchRun.runPortfolio(buildings, str(tmp_path), workers=2, chunkSize=3)
+
+    # Chunk mates of the crash and chunks that shared the broken pool are rerun, the crash alone fails
+    assert list(summary['building']) == [b['building'] for b in buildings]
+    failed = summary[summary['status'] != 'ok']
+    assert list(failed['building']) == ['crash']
+    assert failed['error'].iloc[0].startswith('BrokenProcessPool')
+
+
+def test_duplicate_building_names_are_rejected(tmp_path):
+    buildings = [dict(batchRun.defaults, building=name) for name in ('A', 'B', 'A')]
+    with pytest.raises(ValueError, match="Duplicate building names: A"):
+        batchRun.runPortfolio(buildings, str(tmp_path))
+    assert not os.path.exists(tmp_path / 'hourly')
+
+
+def test_manifest_defaults_match_the_app(tmp_path):
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text("building,energy_file,temp_file\nA,meter.csv,noaa.csv\n")
+    building, = batchRun.readManifest(str(manifest))
+    assert building['freq'] == 'Hourly'
+    assert building['energy_file'] == os.path.join(str(tmp_path), 'meter.csv')
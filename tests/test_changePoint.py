@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from changePoint import bestSplit, fitChangePoint, fitBest, lineFit
+
+# Twelve months of a building with heating below 55 °F and cooling above 70 °F
+temps = np.array([22.0, 27.0, 36.0, 47.0, 58.0, 66.0, 74.0, 78.0, 71.0, 56.0, 44.0, 31.0])
+
+
+def loads(T, base=10.0, heat=1.5, cool=0.0, heatBalance=55.0, coolBalance=70.0):
+    return base + heat*np.maximum(heatBalance - T, 0) + cool*np.maximum(T - coolBalance, 0)
+
+
+def test_line_fit_is_linregress():
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(50, 15, 20), rng.normal(30, 5, 20)
+    fit = stats.linregress(x, y)
+    assert np.allclose(lineFit(x, y), (fit.slope, fit.intercept))
+
+
+def test_split_scores_match_separate_regressions():
+    # Every candidate's error equals two linregress fits on either side of it
+    rng = np.random.default_rng(1)
+    energy = loads(temps) + rng.normal(0, 1, len(temps))
+    split = bestSplit(temps, energy)
+
+    for candidate, sse in zip(split.candidates, split.sse):
+        expected = 0.0
+        for side in (temps <= candidate, temps > candidate):
+            fit = stats.linregress(temps[side], energy[side])
+            expected += np.sum((energy[side] - fit.slope*temps[side] - fit.intercept)**2)
+        assert np.isclose(sse, expected)
+    assert split.splitTemp == split.candidates[np.argmin(split.sse)]
+
+
+def test_split_finds_the_heating_balance_point():
+    split = bestSplit(temps, loads(temps))
+    assert 47 < split.splitTemp < 58
+    assert np.isclose(split.heatSlope, -1.5) and np.isclose(split.baseIntercept, 10)
+    assert np.isclose(split.r2, 1)
+
+
+def test_split_needs_enough_months():
+    with pytest.raises(ValueError):
+        bestSplit(temps[:5], loads(temps[:5]))
+
+
+@pytest.mark.parametrize('model, energy, breakpoints', [
+    ('3PH', loads(temps), (55.0,)),
+    ('3PC', loads(temps, heat=0, cool=2.0), (70.0,)),
+    ('5P', loads(temps, cool=2.0), (55.0, 70.0)),
+])
+def test_change_point_recovers_exact_models(model, energy, breakpoints):
+    fit = fitChangePoint(temps, energy, model, candidates=np.arange(30.0, 76.0, 0.5))
+    assert fit.breakpoints == breakpoints
+    assert np.allclose(fit.predict(temps), energy)
+    assert np.isclose(fit.r2, 1)
+
+
+def test_best_model_has_lowest_error():
+    rng = np.random.default_rng(2)
+    energy = loads(temps, cool=2.0) + rng.normal(0, 1, len(temps))
+    fits = []
+    for model in ('3PH', '3PC', '4P', '5P'):
+        try:
+            fits.append(fitChangePoint(temps, energy, model))
+        except ValueError:
+            # A heating building has no cooling-only fit with a positive slope
+            assert model == '3PC'
+    best = fitBest(temps, energy)
+    assert best.cvrmse == min(f.cvrmse for f in fits)
+    assert abs(best.breakpoints[0] - 55) < 5
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from downsample import bucketEdges, downsampleIndices, lttbIndices, minMaxIndices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    return np.sin(np.arange(8760) / 300) + rng.normal(0, 0.2, 8760)
+
+
+@pytest.mark.parametrize('points', [3, 10, 501, 2000])
+def test_lttb_keeps_the_ends_and_the_point_count(series, points):
+    indices = lttbIndices(series, points)
+    assert len(indices) == points
+    assert indices[0] == 0 and indices[-1] == len(series) - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+@pytest.mark.parametrize('points', [4, 10, 500, 2000])
+def test_minmax_keeps_the_ends_and_the_point_count(series, points):
+    indices = minMaxIndices(series, points)
+    assert len(indices) == points
+    assert indices[0] == 0 and indices[-1] == len(series) - 1
+    assert np.all(np.diff(indices) > 0)
+    # An odd count has no room for another bucket's pair
+    assert len(minMaxIndices(series, points + 1)) == points
+
+
+def test_minmax_keeps_every_bucket_extreme(series):
+    points = 200
+    edges = bucketEdges(len(series) - 2, (points - 2) // 2) + 1
+    y = series.copy()
+    # A spike inside every bucket, up and down in turn, and a gap that must not count as either
+    spikes = (edges[:-1] + edges[1:]) // 2
+    y[spikes] = np.where(np.arange(len(spikes)) % 2, -10.0, 10.0)
+    y[1000:1010] = np.nan
+
+    kept = minMaxIndices(y, points)
+    assert set(spikes) <= set(kept)
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = kept[(kept >= start) & (kept < end)]
+        assert np.nanmax(y[start:end]) == np.nanmax(y[bucket])
+        assert np.nanmin(y[start:end]) == np.nanmin(y[bucket])
+
+
+def test_lttb_keeps_a_lone_spike():
+    y = np.zeros(5000)
+    y[3210] = 5.0
+    assert 3210 in lttbIndices(y, 50)
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_short_input_passes_through(series, method):
+    for points in (len(series), len(series) + 1, 10**6):
+        assert np.array_equal(downsampleIndices(series, points, method), np.arange(len(series)))
+    assert np.array_equal(downsampleIndices(series[:5], 100, method), np.arange(5))
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_window_indices_are_into_the_whole_series(series, method):
+    indices = downsampleIndices(series, 100, method, start=2000, end=4000)
+    assert indices[0] == 2000 and indices[-1] == 3999 and len(indices) == 100
+    assert np.array_equal(indices, 2000 + downsampleIndices(series[2000:4000], 100, method))
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError, match="Unknown downsampling method"):
+        downsampleIndices(np.zeros(10), 5, 'mean')
@@ -0,0 +1,52 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+
+from CustomHP import defaultCapacity
+from conftest import root
+from heatPumpSizing import dispatchLoads, hourlyTotal, annualCost, fullSize, sizingSweep, heatingCapacity
+from tariff import readTariff, compileTariff
+
+
+def test_unlimited_capacity_is_the_comfort_model(example):
+    dispatch = dispatchLoads(example, 1e6, defaultCapacity)
+    assert np.allclose(dispatch.backupHeat, 0) and np.allclose(dispatch.unmetCooling, 0)
+    assert np.allclose(hourlyTotal(example, dispatch), example.hourlyModelThree, equal_nan=True)
+    assert np.isclose(annualCost(example, dispatch), example.monthlyCost('Comfort Mode').sum())
+
+
+def test_unlimited_capacity_prices_like_the_model(example):
+    gas = replace(example, efficiency=0.8, fuelCost=0.05, scenarios={}, costs={})
+    tariff = compileTariff(readTariff(os.path.join(root, 'example tariff.json')), example.inputs)
+    for result in (gas, example.repriced(example.retro, example.cost, tariff)):
+        dispatch = dispatchLoads(result, 1e6, defaultCapacity)
+        assert np.isclose(annualCost(result, dispatch), result.monthlyCost('Comfort Mode').sum())
+
+
+def test_sizes_are_independent_rows(example):
+    tons = np.array([1.0, 2.5, 4.0])
+    together = dispatchLoads(example, tons, defaultCapacity)
+    for i, size in enumerate(tons):
+        alone = dispatchLoads(example, size, defaultCapacity)
+        assert np.allclose(together.electric[i], alone.electric)
+
+
+def test_strips_carry_heat_the_unit_cannot(example):
+    dispatch = dispatchLoads(example, 0.5, defaultCapacity, lockoutTemp=20)
+    heating = np.nan_to_num(example.heatingModel)
+    assert np.allclose(dispatch.heatPumpHeat + dispatch.backupHeat, heating)
+    assert np.allclose(dispatch.heatPumpHeat[example.sinT < 20], 0)
+
+
+def test_full_size_carries_every_hour_it_can(example):
+    size = fullSize(example, defaultCapacity)
+    dispatch = dispatchLoads(example, size*1.001, defaultCapacity)
+    warm = heatingCapacity(example.sinT, 1)[0] > 0
+    assert np.allclose(dispatch.backupHeat[warm], 0) and np.allclose(dispatch.unmetCooling, 0)
+
+
+def test_best_size_is_the_cheapest_that_meets_cooling(example):
+    sizing = sizingSweep(example, defaultCapacity)
+    meets = sizing.table['unmetCoolingKWh'] <= 0.01*np.nansum(example.coolingEnergy)
+    assert sizing.best['totalCost'] == sizing.table.loc[meets, 'totalCost'].min()
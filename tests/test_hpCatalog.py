@@ -0,0 +1,31 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+
+from conftest import root
+from hpCatalog import HeatPumpCatalog, catalogModels, rankUnits
+
+
+def test_ranking_matches_each_unit_alone(example):
+    catalog = HeatPumpCatalog(os.path.join(root, 'catalog'))
+    gas = replace(example, efficiency=0.8, fuelCost=0.05, scenarios={}, costs={})
+    for result in (example, gas):
+        ranking = rankUnits(result, catalog).set_index('model')
+        for model in catalog.models:
+            i = catalog.index[model]
+            unit = result.withCurves(catalog.cop[i], catalog.eer[i])
+            row = ranking.loc[model]
+            assert np.isclose(row['comfortKWh'], unit.totalModelThree.sum())
+            assert np.isclose(row['noComfortKWh'], unit.monthlyNoComfort.sum())
+            assert np.isclose(row['comfortSavings'], unit.savings('Comfort Mode').sum())
+            assert np.isclose(row['noComfortSavings'], unit.savings('No Comfort Mode').sum())
+
+
+def test_models_are_listed_without_reading_curves(tmp_path):
+    # Only models with both curve files count, nothing is parsed to find them
+    for name in ('b.cop.csv', 'b.eer.csv', 'a.cop.csv', 'a.eer.csv', 'orphan.cop.csv', 'notes.txt'):
+        (tmp_path / name).write_text("not a curve")
+    assert catalogModels(str(tmp_path)) == ['a', 'b']
+    assert catalogModels(str(tmp_path / 'missing')) == []
+    assert catalogModels(os.path.join(root, 'catalog')) == HeatPumpCatalog(os.path.join(root, 'catalog')).models
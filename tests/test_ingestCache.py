@@ -0,0 +1,105 @@
+import hashlib
+import io
+
+import numpy as np
+import pytest
+
+import ingestCache
+from conftest import energyFile, tempFile
+from modelEngine import meterDateRange
+
+
+def test_hash_is_the_same_for_every_source(monkeypatch):
+    with open(energyFile, 'rb') as f:
+        data = f.read()
+    expected = hashlib.sha256(data).hexdigest()
+
+    # Small blocks so the streamed hash runs over many of them
+    monkeypatch.setattr(ingestCache, 'hashBlock', 4096)
+    assert ingestCache.fileHash(energyFile) == expected
+    assert ingestCache.fileHash(io.BytesIO(data)) == expected
+    with open(energyFile, 'rb') as f:
+        f.seek(100)
+        assert ingestCache.fileHash(f) == expected
+        assert f.tell() == 100
+
+
+def test_path_and_upload_read_the_same(monkeypatch):
+    monkeypatch.setattr(ingestCache, 'cache', ingestCache.LRUCache())
+    dateRange = meterDateRange(2023, '15-Minute')
+    fromPath = ingestCache.cachedEnergy(energyFile, 'Power', dateRange)
+    with open(energyFile, 'rb') as f:
+        upload = io.BytesIO(f.read())
+
+    ingestCache.cache.clear()
+    assert np.array_equal(ingestCache.cachedEnergy(upload, 'Power', dateRange), fromPath, equal_nan=True)
+
+
+def test_lru_evicts_by_entry_count():
+    cache = ingestCache.LRUCache(maxEntries=3)
+    for key in 'abc':
+        cache.put(key, np.zeros(10))
+    cache.get('a')                      # 'b' is now the least recently used
+    cache.put('d', np.zeros(10))
+
+    assert list(cache.entries) == ['c', 'a', 'd']
+    assert cache.get('b') is None
+    assert cache.stats()['bytes'] == 3 * 80
+
+
+def test_lru_evicts_by_size_but_keeps_the_newest():
+    cache = ingestCache.LRUCache(maxEntries=10, maxBytes=2000)
+    for key in 'abc':
+        cache.put(key, np.zeros(100))   # 800 bytes each
+    assert list(cache.entries) == ['b', 'c'] and cache.totalBytes == 1600
+
+    # An entry over the bound on its own still stays, alone
+    cache.put('big', np.zeros(1000))
+    assert list(cache.entries) == ['big'] and cache.totalBytes == 8000
+
+
+def test_shrinking_the_cache_evicts(monkeypatch):
+    monkeypatch.setattr(ingestCache, 'cache', ingestCache.LRUCache())
+    for key in 'abcd':
+        ingestCache.cache.put(key, np.zeros(100))
+
+    ingestCache.configureCache(maxBytes=2000)
+    assert list(ingestCache.cache.entries) == ['c', 'd']
+    ingestCache.configureCache(maxEntries=1)
+    assert list(ingestCache.cache.entries) == ['d'] and ingestCache.cache.totalBytes == 800
+
+
+def test_cached_values_are_not_shared_for_writing(monkeypatch):
+    monkeypatch.setattr(ingestCache, 'cache', ingestCache.LRUCache())
+    dateRange = meterDateRange(2023, '15-Minute')
+
+    energy = ingestCache.cachedEnergy(energyFile, 'Power', dateRange)
+    with pytest.raises(ValueError):
+        energy[0] = 0
+
+    tempData = ingestCache.cachedTemperature(tempFile)
+    tempData['TAVG'] = 0
+    assert (ingestCache.cachedTemperature(tempFile)['TAVG'] != 0).any()
+
+    inputs = ingestCache.cachedInputs(energyFile, tempFile, 'Power', dateRange)
+    with pytest.raises(ValueError):
+        inputs.hourlyTempAvg[0] = 0
+    inputs.monthlyTemp[1] = 0
+    assert ingestCache.cachedInputs(energyFile, tempFile, 'Power', dateRange).monthlyTemp[1] != 0
+
+
+def test_aggregates_are_keyed_by_content(monkeypatch):
+    monkeypatch.setattr(ingestCache, 'cache', ingestCache.LRUCache())
+    dateRange = meterDateRange(2023, '15-Minute')
+    first = ingestCache.cachedInputs(energyFile, tempFile, 'Power', dateRange)
+    with open(energyFile, 'rb') as f:
+        upload = io.BytesIO(f.read())
+
+    # The same bytes from an upload reuse the aggregate, observed weather is a different one
+    again = ingestCache.cachedInputs(upload, tempFile, 'Power', dateRange)
+    assert again.hourlyTempAvg is first.hourlyTempAvg
+    assert ingestCache.cache.stats()['entries'] == 3
+
+    observed = np.full(len(first.energy), 50.0)
+    ingestCache.cachedInputs(energyFile, tempFile, 'Power', dateRange, observedTemp=observed)
+    assert ingestCache.cache.stats()['entries'] == 4
@@ -0,0 +1,74 @@
+import threading
+import tracemalloc
+
+import instrumentation
+from instrumentation import stage
+
+
+def inThread(run):
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+
+def timedRerun():
+    instrumentation.enable(True)
+    with stage('rerun'):
+        pass
+    assert instrumentation.report()[0]['stage'] == 'rerun'
+
+
+def test_off_is_shared_no_op():
+    instrumentation.enable(False)
+    assert stage('anything') is instrumentation.nullStage
+    assert instrumentation.report() == []
+
+
+def test_tracing_stops_when_another_rerun_turns_it_off():
+    # Streamlit runs each rerun on a new thread, the rerun that turns timings off holds no profile
+    inThread(timedRerun)
+    inThread(lambda: instrumentation.enable(False))
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_runs_while_any_context_has_a_profile():
+    started, release = threading.Event(), threading.Event()
+
+    def session():
+        timedRerun()
+        started.set()
+        release.wait()
+        instrumentation.enable(False)
+
+    thread = threading.Thread(target=session)
+    thread.start()
+    started.wait()
+    inThread(lambda: instrumentation.enable(False))
+    assert tracemalloc.is_tracing()
+    assert instrumentation.report() == []       # Records stay with the context that made them
+
+    release.set()
+    thread.join()
+    assert not tracemalloc.is_tracing()
+
+
+def test_timings_alone_leave_tracemalloc_off():
+    def timingsOnly():
+        instrumentation.enable(memory=False)
+        with stage('outer', 10):
+            with stage('inner'):
+                pass
+        assert not tracemalloc.is_tracing()
+        outer, inner = instrumentation.report()
+        assert (outer['stage'], outer['rows'], inner['depth']) == ('outer', 10, 1)
+        assert outer['peakMB'] is None and outer['seconds'] >= inner['seconds']
+
+        # Asking for memory swaps in a tracing profile
+        instrumentation.enable(memory=True)
+        with stage('measured'):
+            pass
+        assert tracemalloc.is_tracing() and instrumentation.report()[0]['peakMB'] is not None
+        instrumentation.enable(False)
+
+    inThread(timingsOnly)
+    assert not tracemalloc.is_tracing()
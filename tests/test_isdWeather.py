@@ -0,0 +1,92 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from isdWeather import parseISD, alignHours, fillGaps, observedTemperature
+from modelEngine import meterDateRange
+
+
+def liteLine(t, tenths):
+    return f"{t.year:4d} {t.month:02d} {t.day:02d} {t.hour:02d} {tenths:5d} {-89:5d} 10231   170    21     8 -9999 -9999"
+
+
+def isdLine(t, tenths, quality='1'):
+    # Control and mandatory sections up to the air temperature at columns 88-93
+    head = f"017572315003139{t:%Y%m%d%H%M}4+35433-082550FM-15+0645KAVLV0309999C00001999999N0160931N5".ljust(87, '9')
+    return head + f"{'+' if tenths >= 0 else '-'}{abs(tenths):04d}{quality}+99999999999ADDAA1"
+
+
+@pytest.fixture
+def lite(tmp_path):
+    # Two days around new year (UTC) with a missing reading and a gap of missing lines
+    hours = pd.date_range('2022-12-31 00:00', '2023-01-02 23:00', freq='h')
+    tenths = np.arange(len(hours))*5 - 100
+    tenths[40] = -9999
+    keep = np.ones(len(hours), dtype=bool)
+    keep[50:60] = False
+    text = ''.join(liteLine(t, v) + '\n' for t, v, k in zip(hours, tenths, keep) if k)
+    path = tmp_path / 'station.txt'
+    path.write_text(text)
+    return path, hours[keep], tenths[keep]
+
+
+def test_lite_values_and_hours(lite):
+    path, hours, tenths = lite
+    parsed, tempF = parseISD(str(path))
+    valid = tenths != -9999
+    assert np.array_equal(parsed, hours[valid].values.astype('datetime64[h]'))
+    assert np.allclose(tempF, tenths[valid] / 10 * 9/5 + 32)
+
+
+def test_gzip_parses_the_same(lite, tmp_path):
+    path, _, _ = lite
+    zipped = tmp_path / 'station.gz'
+    zipped.write_bytes(gzip.compress(path.read_bytes()))
+    for a, b in zip(parseISD(str(path)), parseISD(str(zipped))):
+        assert np.array_equal(a, b)
+
+
+def test_full_isd_drops_missing_and_rejected(tmp_path):
+    start = pd.Timestamp('2023-01-01 08:51')
+    lines = [isdLine(start + pd.Timedelta(hours=k), 10*k - 50, '7' if k == 3 else '1') for k in range(6)]
+    lines[4] = isdLine(start + pd.Timedelta(hours=4), 9999)
+    path = tmp_path / 'station.isd'
+    path.write_text('\n'.join(lines) + '\n')
+
+    hours, tempF = parseISD(str(path))
+    assert list(hours.astype(object)) == [(start + pd.Timedelta(hours=k)).floor('h').to_pydatetime() for k in (0, 1, 2, 5)]
+    assert np.allclose(tempF, (np.array([0, 1, 2, 5])*10 - 50) / 10 * 9/5 + 32)
+
+
+def test_align_shifts_to_local_time_and_averages():
+    hours = np.array(['2023-01-01T08', '2023-01-01T08', '2023-01-01T10'], dtype='datetime64[h]')
+    aligned = alignHours(hours, np.array([30.0, 32.0, 40.0]), '2023-01-01', 4, utcOffset=-8)
+    assert np.allclose(aligned[[0, 2]], [31, 40]) and np.isnan(aligned[[1, 3]]).all()
+
+
+def test_fill_bridges_short_gaps_only():
+    temp = np.array([1, np.nan, 3, np.nan, np.nan, np.nan, 7, np.nan])
+    filled, bridged = fillGaps(temp, maxGap=2)
+    assert np.allclose(filled[:3], [1, 2, 3])
+    assert np.isnan(filled[3:6]).all() and np.isnan(filled[7])
+    assert bridged.tolist() == [False, True] + [False]*6
+
+
+def test_observed_temperature_on_meter_hours(lite):
+    path, hours, tenths = lite
+    observed = observedTemperature(str(path), meterDateRange(2023, 'Hourly'), utcOffset=-8, maxGap=6)
+    assert len(observed.temp) == 8760
+
+    # Local midnight of the meter year is 08:00 UTC
+    first = tenths[np.flatnonzero(hours == pd.Timestamp('2023-01-01 08:00'))[0]]
+    assert np.isclose(observed.temp[0], first / 10 * 9/5 + 32)
+    assert observed.interpolated == 1          # The -9999 hour, the 10 missing lines stay a gap
+    assert observed.observed + observed.interpolated + observed.missing == 8760
+
+
+def test_no_observations_in_the_meter_year(lite):
+    path, _, _ = lite
+    with pytest.raises(ValueError):
+        observedTemperature(str(path), meterDateRange(2021, 'Hourly'))
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from modelEngine import comfortKernels, meterDateRange, powerToEnergy, prepareInputs, readHourlyEnergy
+
+
+def test_load_fit_is_two_line_regressions(example):
+    # The heating line below the split and the base line above it, as electricModel fit them
+    x = np.array(example.inputs.monthlyTemp)
+    y = np.array(example.inputs.monthlyEnergy)
+    split = example.fit.splitTemp
+    heat = stats.linregress(x[x <= split], y[x <= split])
+    base = stats.linregress(x[x >= split], y[x >= split])
+
+    assert np.isclose(example.fit.heatSlope, heat.slope) and np.isclose(example.fit.heatIntercept, heat.intercept)
+    assert np.isclose(example.fit.baseSlope, base.slope) and np.isclose(example.fit.baseIntercept, base.intercept)
+
+
+def test_monthly_sums_are_month_groupbys(example):
+    inputs = example.inputs
+    expected = pd.Series(example.hourlyModelThree).groupby(inputs.month).sum()
+    assert np.allclose(inputs.monthlySum(example.hourlyModelThree), expected)
+    assert np.allclose(example.totalModelThree, expected)
+    assert np.allclose(example.monthlyOriginal, pd.Series(inputs.energy).groupby(inputs.month).sum())
+
+
+def test_comfort_scenario_is_heat_pump_plus_base_load(example):
+    COP, EER, sinT = example.COP, example.EER, example.sinT
+    lighting = example.heatingEnergy - example.heatingModel
+    expected = example.heatingModel / COP(sinT) + lighting + (example.coolingEnergy / EER(sinT))*3.412
+    assert np.allclose(example.hourlyModelThree, expected)
+
+
+def test_no_comfort_moves_usage_above_base_load(example):
+    # Metered usage above the base intercept goes through the heat pump at the day's average
+    energy = example.inputs.energy
+    heat = np.where(energy - example.fit.baseIntercept < 0, 0, energy - example.fit.baseIntercept)
+    expected = heat / example.COP(example.inputs.hourlyTempAvg) + (energy - heat)
+    assert np.allclose(example.noComfortTotal, expected)
+
+
+def test_flat_price_savings(example):
+    for mode in ('Comfort Mode', 'No Comfort Mode'):
+        expected = (example.monthlyOriginal - example.scenario(mode))*example.cost
+        assert np.allclose(example.savings(mode), expected)
+        assert np.allclose(example.savings(mode, True), expected*(1 - example.retro))
+    assert np.allclose(example.savings(None, True), example.monthlyOriginal*example.retro*example.cost)
+
+
+def loopKernels(sinT, fit, heatingTemp, coolingTemp):
+    # The per-hour loops the vectorized kernels replaced
+    baseLoad = int(fit.baseIntercept)
+    coolingEnergy = [0 if temp <= coolingTemp else fit.cooling(temp) for temp in sinT]
+    heatingEnergy = [baseLoad if temp > heatingTemp else fit.heating(temp) for temp in sinT]
+    heatingModel = [0 if heating - baseLoad < 0 else heating - baseLoad for heating in heatingEnergy]
+    return np.array(coolingEnergy), np.array(heatingEnergy), np.array(heatingModel)
+
+
+def test_kernels_match_the_loops(example):
+    for heatingTemp, coolingTemp in ((50, 70), (5, 90), (example.fit.heatingZero(),)*2, (62.5, 62.5)):
+        vectorized = comfortKernels(example.sinT, example.fit, heatingTemp, coolingTemp)
+        for a, b in zip(vectorized, loopKernels(example.sinT, example.fit, heatingTemp, coolingTemp)):
+            assert np.array_equal(a, b)
+
+
+def test_kernels_broadcast_over_setpoints(example):
+    # A column of setpoints gives one row per setpoint, each equal to its own run
+    heatingTemps = np.array([40.0, 50.0, 60.0])
+    coolingEnergy, heatingEnergy, heatingModel = comfortKernels(example.sinT[None, :], example.fit,
+                                                                heatingTemps[:, None], 70)
+    for i, heatingTemp in enumerate(heatingTemps):
+        single = comfortKernels(example.sinT, example.fit, heatingTemp, 70)
+        assert np.array_equal(heatingEnergy[i], single[1]) and np.array_equal(heatingModel[i], single[2])
+
+
+def noaaYear(year):
+    # Daily NOAA rows whose TMAX and TMIN encode the day, so every lookup can be checked
+    dates = pd.date_range(f'{year}-01-01', f'{year}-12-31', freq='D')
+    return pd.DataFrame({'DATE': dates.strftime('%Y-%m-%d'),
+                         'TMAX': dates.month * 100 + dates.day + 10.0,
+                         'TMIN': dates.month * 100 + dates.day - 10.0})
+
+
+def test_leap_meter_year_has_8784_hours():
+    date_range = meterDateRange(2024, 'Hourly')
+    inputs = prepareInputs(np.ones(len(date_range)), noaaYear(2024), date_range)
+
+    assert len(date_range) == len(inputs.energy) == 8784
+    assert np.array_equal(inputs.month, date_range.month)
+    assert np.array_equal(inputs.dayOfYear, date_range.dayofyear - 1)
+    # Every hour carries its own day's temperature, Feb 29 and Dec 31 included
+    assert np.array_equal(inputs.hourlyTempAvg, date_range.month * 100 + date_range.day)
+    assert np.all(inputs.deltaTday == 20)
+    assert inputs.monthlySum(inputs.energy)[2] == 29 * 24
+
+
+def test_leap_meter_year_on_non_leap_weather_takes_feb_28():
+    date_range = meterDateRange(2024, '15-Minute')
+    inputs = prepareInputs(np.ones(len(date_range)), noaaYear(2023), date_range)
+
+    assert not np.isnan(inputs.hourlyTempAvg).any()
+    leapDay = (date_range.month == 2) & (date_range.day == 29)
+    assert np.all(inputs.hourlyTempAvg[leapDay[::4]] == 228)
+    # The rest of the year still lines up day for day
+    assert np.array_equal(inputs.hourlyTempAvg[~leapDay[::4]], (date_range.month * 100 + date_range.day)[::4][~leapDay[::4]])
+
+
+@pytest.mark.parametrize('readings', [35040 - 3, 35040 + 1, 35040 + 5000])
+def test_meter_length_must_match_the_year(tmp_path, readings):
+    # Short and long files fail alike, whichever chunk the extra readings fall in
+    meterFile = tmp_path / 'meter.csv'
+    pd.DataFrame({'Power': np.ones(readings)}).to_csv(meterFile, index=False)
+    dateRange = meterDateRange(2023, '15-Minute')
+
+    for read in (lambda: readHourlyEnergy(meterFile, 'Power', dateRange, chunkSize=1000),
+                 lambda: powerToEnergy(pd.read_csv(meterFile)['Power'], dateRange)):
+        with pytest.raises(ValueError, match=f"Expected 35040 power readings, got {readings}"):
+            read()
+
+
+def test_streamed_energy_is_hourly_kwh(tmp_path):
+    meterFile = tmp_path / 'meter.csv'
+    power = np.arange(35040, dtype=float)
+    pd.DataFrame({'Power': power}).to_csv(meterFile, index=False)
+    dateRange = meterDateRange(2023, '15-Minute')
+
+    hourly = readHourlyEnergy(meterFile, 'Power', dateRange, chunkSize=1001)
+    assert np.allclose(hourly, powerToEnergy(power, dateRange).reshape(-1, 4).sum(axis=1))
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+
+import numpy as np
+import pytest
+
+from conftest import root
+from modelService import ModelService, jsonValue
+
+building = {'energy_file': 'example meter data.csv', 'temp_file': 'example NOAA data.csv', 'freq': '15-Minute'}
+
+
+async def request(port, method, path, body=None):
+    # One request per connection, returns the status and the decoded JSON body
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+
+def serve(service, client):
+    # Runs client(port) against the service on a free port
+    async def main():
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        async with server:
+            return await client(server.sockets[0].getsockname()[1])
+    try:
+        return asyncio.run(main())
+    finally:
+        service.close()
+
+
+def test_health():
+    service = ModelService(root, workers=1)
+    status, health = serve(service, lambda port: request(port, 'GET', '/health'))
+    assert status == 200
+    assert health['workers'] == 1 and health['inflight'] == 0 and health['runs'] == 0
+    assert health['cache']['entries'] == 0
+
+
+def test_identical_requests_share_one_run():
+    service = ModelService(root, workers=1)
+
+    async def client(port):
+        first = await asyncio.gather(*(request(port, 'POST', '/summary', {**building, 'building': name})
+                                       for name in ('A', 'B')))
+        again = await request(port, 'POST', '/summary', {**building, 'building': 'C'})
+        return first + [again], (await request(port, 'GET', '/health'))[1]
+
+    responses, health = serve(service, client)
+    assert [status for status, _ in responses] == [200, 200, 200]
+    # Each caller gets its own name on the one shared result
+    assert [summary['building'] for _, summary in responses] == ['A', 'B', 'C']
+    assert len({summary['comfortSavings'] for _, summary in responses}) == 1
+    assert health['runs'] == 1 and health['coalesced'] == 1 and health['cache']['entries'] == 1
+
+
+def test_files_must_stay_under_root(tmp_path):
+    inside = tmp_path / 'root'
+    inside.mkdir()
+    (inside / 'meter.csv').write_text("Power\n1\n")
+    (tmp_path / 'secret.csv').write_text("Power\n1\n")
+    os.symlink(tmp_path / 'secret.csv', inside / 'link.csv')
+    service = ModelService(str(inside), workers=1)
+
+    try:
+        for path in (str(tmp_path / 'secret.csv'), '../secret.csv', 'link.csv'):
+            with pytest.raises(ValueError, match="outside the service root"):
+                service.building({'energy_file': path, 'temp_file': 'meter.csv'})
+        assert service.building({'energy_file': 'meter.csv', 'temp_file': 'meter.csv'})['energy_file'] == \
+            os.path.realpath(inside / 'meter.csv')
+    finally:
+        service.close()
+
+    service = ModelService(str(inside), workers=1)
+    status, error = serve(service, lambda port: request(port, 'POST', '/summary',
+                                                        {'energy_file': '../secret.csv', 'temp_file': 'meter.csv'}))
+    assert status == 400 and 'outside the service root' in error['error']
+
+
+def test_nan_is_sent_as_null():
+    payload = {'splitTemp': np.float64('nan'), 'values': [float('inf'), np.int64(3), -np.inf], 'ok': np.float32(1.5)}
+    assert json.loads(json.dumps(jsonValue(payload), allow_nan=False)) == \
+        {'splitTemp': None, 'values': [None, 3, None], 'ok': 1.5}
+
+
+def test_dead_worker_is_replaced():
+    service = ModelService(root, workers=1)
+
+    async def killWorkers():
+        # Wait until the run is in a worker, then kill it like the OOM killer would
+        while not service.inflight or not multiprocessing.active_children():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        for child in multiprocessing.active_children():
+            os.kill(child.pid, signal.SIGKILL)
+
+    async def client(port):
+        lost, _ = await asyncio.gather(request(port, 'POST', '/summary', building), killWorkers())
+        after = await request(port, 'POST', '/summary', {**building, 'retro': 50})
+        return lost, after, (await request(port, 'GET', '/health'))[1]
+
+    lost, after, health = serve(service, client)
+    # The killed run goes again on a new pool, which keeps serving
+    assert lost[0] == 200 and lost[1]['status'] == 'ok'
+    assert after[0] == 200
+    assert health['restarts'] == 1 and health['inflight'] == 0
@@ -0,0 +1,135 @@
+import os
+import pathlib
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+import CustomHP
+from conftest import energyFile, tempFile, root
+from modelEngine import meterDateRange, ModelInputs
+from pipeline import modelPipeline
+from tariff import compileTariff
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = modelPipeline()
+    pipeline.set(energy_file=energyFile, temp_file=tempFile, column_name='Power',
+                 date_range=meterDateRange(2023, '15-Minute'), heatingTemp=50, coolingTemp=70,
+                 COP=CustomHP.COP, EER=CustomHP.EER, retro=0.3, cost=0.1241)
+    pipeline.get('costing')
+    return pipeline
+
+
+def reruns(pipeline, **params):
+    # Stages that ran again after changing params
+    before = dict(pipeline.runs)
+    pipeline.set(**params)
+    pipeline.get('costing')
+    return {name for name, count in pipeline.runs.items() if count != before.get(name, 0)}
+
+
+def test_matches_reference(pipeline, example):
+    result = pipeline.get('costing')
+    for mode in (None, 'Comfort Mode', 'No Comfort Mode'):
+        for retrofit in (False, True):
+            assert np.allclose(result.savings(mode, retrofit), example.savings(mode, retrofit))
+            assert np.allclose(result.scenario(mode, retrofit, True), example.scenario(mode, retrofit, True))
+
+
+def test_every_stage_runs_once(pipeline):
+    assert all(count == 1 for count in pipeline.runs.values())
+
+
+def test_price_reruns_costing_only(pipeline):
+    heatingPump = pipeline.get('costing').heatingPump
+    assert reruns(pipeline, cost=0.2) == {'costing'}
+    assert reruns(pipeline, retro=0.1) == {'costing'}
+    assert pipeline.get('costing').heatingPump is heatingPump
+
+
+def test_setpoints_skip_ingestion_and_fit(pipeline):
+    assert reruns(pipeline, heatingTemp=55) == {'comfort', 'result', 'costing'}
+
+
+def test_split_temperature_refits(pipeline):
+    assert reruns(pipeline, splitTemp=60.0) == {'loadFit', 'comfort', 'noComfort', 'result', 'costing'}
+
+
+def test_same_value_is_not_a_change(pipeline):
+    assert reruns(pipeline, cost=0.1241, heatingTemp=50) == set()
+
+
+def test_same_content_is_not_a_change(pipeline):
+    # A new file object with the same bytes keeps every parsed stage
+    with open(energyFile, 'rb') as f:
+        assert reruns(pipeline, energy_file=f) == set()
+
+
+def test_price_reprices_the_catalog_only(pipeline):
+    pipeline.set(catalogDir=os.path.join(root, 'catalog'))
+    ranking = pipeline.get('ranking')
+    assert reruns(pipeline, cost=0.2) == {'costing'}
+    assert pipeline.get('ranking') is not ranking
+    assert pipeline.runs['units'] == 1 and pipeline.runs['catalog'] == 1
+
+
+def test_sweep_follows_price_not_setpoints(pipeline):
+    sweep = pipeline.get('sweep')
+    pipeline.set(heatingTemp=55)
+    assert pipeline.get('sweep') is sweep
+    pipeline.set(cost=0.2)
+    assert np.allclose(pipeline.get('sweep').savingsCost, sweep.savingsCost / 0.1241 * 0.2, equal_nan=True)
+
+
+def test_sessions_share_the_aggregate(pipeline):
+    # A second session on the same files takes the monthly aggregates from the upload cache
+    other = modelPipeline()
+    other.set(energy_file=energyFile, temp_file=tempFile, column_name='Power', date_range=meterDateRange(2023, '15-Minute'))
+    assert other.get('aggregation').hourlyTempAvg is pipeline.get('aggregation').hourlyTempAvg
+
+
+def test_paths_are_compared_by_content(pipeline, tmp_path):
+    assert reruns(pipeline, energy_file=pathlib.Path(energyFile)) == set()
+
+    # Same name, new bytes: the path alone must not hide the change
+    changed = tmp_path / 'meter.csv'
+    with open(energyFile) as f:
+        changed.write_text(f.read().replace('2.305', '9.305'))
+    assert 'aggregation' in reruns(pipeline, energy_file=changed)
+
+
+def test_rebuilt_equal_objects_keep_the_stages(pipeline):
+    # Streamlit reruns rebuild curves, tariffs and saved inputs, equal ones must not count as changes
+    def curve():
+        return CustomHP.HeatPumpCurve.fromLine(0.0236, 2.2127)
+
+    pipeline.set(COP=curve())
+    pipeline.get('costing')
+    assert reruns(pipeline, COP=curve()) == set()
+
+    inputs = pipeline.get('aggregation')
+    tariff = os.path.join(root, 'example tariff.json')
+    pipeline.set(tariffFile=compileTariff(tariff, inputs))
+    pipeline.get('costing')
+    assert reruns(pipeline, tariffFile=compileTariff(tariff, inputs)) == set()
+
+    copied = ModelInputs(**{name: value.copy() if hasattr(value, 'copy') else value for name, value in vars(inputs).items()})
+    pipeline.set(aggregation=copied)
+    pipeline.get('costing')
+    assert reruns(pipeline, aggregation=replace(copied)) == set()
+
+
+def test_rebuilt_different_objects_rerun(pipeline, example):
+    pipeline.set(COP=CustomHP.HeatPumpCurve.fromLine(0.0236, 2.2127))
+    pipeline.get('costing')
+    assert reruns(pipeline, COP=CustomHP.HeatPumpCurve.fromLine(0.03, 2.2127)) == {'noComfort', 'result', 'costing'}
+
+    # Back to the example's curve, the results are the reference ones again
+    pipeline.set(COP=CustomHP.HeatPumpCurve.fromLine(0.0236, 2.2127))
+    assert np.allclose(pipeline.get('costing').savings('Comfort Mode'), example.savings('Comfort Mode'))
+
+    inputs = pipeline.get('aggregation')
+    pipeline.set(aggregation=replace(inputs, energy=inputs.energy * 1.1))
+    assert 'balancePoint' in reruns(pipeline)
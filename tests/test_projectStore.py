@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+import projectStore
+
+
+def test_overwrite_swaps_in_new_project(tmp_path, tempData):
+    projectStore.saveProject('office', np.ones(8760), tempData, '2023-01-01', root=str(tmp_path))
+    projectStore.saveProject('office', np.full(8760, 2.0), tempData, '2023-01-01', root=str(tmp_path))
+    assert os.listdir(tmp_path) == ['office']
+    assert projectStore.Project('office', str(tmp_path)).energy[0] == 2
+
+
+def test_failed_swap_keeps_old_project(tmp_path, tempData, monkeypatch):
+    projectStore.saveProject('office', np.ones(8760), tempData, '2023-01-01', root=str(tmp_path))
+    replace = os.replace
+
+    def failingSwap(source, target):
+        # Only the staged project taking the final name fails
+        if os.path.basename(source).startswith('.office-') and target == os.path.join(str(tmp_path), 'office'):
+            raise OSError('disk full')
+        return replace(source, target)
+
+    monkeypatch.setattr(os, 'replace', failingSwap)
+    with pytest.raises(OSError):
+        projectStore.saveProject('office', np.full(8760, 2.0), tempData, '2023-01-01', root=str(tmp_path))
+    monkeypatch.undo()
+
+    assert os.listdir(tmp_path) == ['office']
+    assert projectStore.Project('office', str(tmp_path)).energy[0] == 1
+
+
+@pytest.mark.parametrize('name', ['.', '..', '...', ' ', ' . ', '../office', 'a/b', ''])
+def test_names_stay_under_the_root(tmp_path, tempData, name):
+    projects = tmp_path / 'projects'
+    projects.mkdir()
+    with pytest.raises(ValueError):
+        projectStore.saveProject(name, np.ones(8760), tempData, '2023-01-01', root=str(projects))
+    with pytest.raises(ValueError):
+        projectStore.deleteProject(name, root=str(projects))
+    assert os.listdir(tmp_path) == ['projects'] and os.listdir(projects) == []
+
+
+def test_symlinked_name_outside_the_root(tmp_path):
+    projects = tmp_path / 'projects'
+    projects.mkdir()
+    (projects / 'elsewhere').symlink_to(tmp_path)
+    with pytest.raises(ValueError):
+        projectStore.deleteProject('elsewhere', root=str(projects))
+    assert (tmp_path / 'projects').is_dir()
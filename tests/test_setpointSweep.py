@@ -0,0 +1,19 @@
+import numpy as np
+
+from setpointSweep import sweepSetpoints
+
+
+def test_matches_model_at_its_setpoints(example):
+    # The sweep's cell at the model's setpoints is the model's comfort scenario
+    for retro in (0, 0.3):
+        sweep = sweepSetpoints(example.inputs, example.fit, example.COP, example.EER, heatingTemps=[40, 50],
+                               coolingTemps=[70, 80], cost=example.cost, retro=retro)
+        retrofit = retro > 0
+        assert np.isclose(sweep.annualKWh[1, 0], example.scenario('Comfort Mode', retrofit).sum())
+        assert np.isclose(sweep.savingsCost[1, 0], example.savings('Comfort Mode', retrofit).sum())
+
+
+def test_heating_above_cooling_is_empty(example):
+    sweep = sweepSetpoints(example.inputs, example.fit, example.COP, example.EER, heatingTemps=[60, 75],
+                           coolingTemps=[70])
+    assert np.isnan(sweep.annualKWh[1, 0]) and not np.isnan(sweep.annualKWh[0, 0])
@@ -0,0 +1,22 @@
+import os
+
+import numpy as np
+
+from conftest import root
+from tariff import readTariff, compileTariff, flatRate
+
+
+def test_average_of_flat_rate_is_the_rate(example):
+    tariff = compileTariff(flatRate(0.15), example.inputs)
+    assert np.isclose(tariff.averagePrice(example.inputs.energy), 0.15)
+
+
+def test_average_price_without_usage(example):
+    tariff = compileTariff(readTariff(os.path.join(root, 'example tariff.json')), example.inputs)
+    usage = np.zeros((2, len(example.inputs.energy)))
+    usage[1] = example.inputs.energy
+
+    average = tariff.averagePrice(usage)
+    assert np.isfinite(average).all()
+    assert np.isclose(average[0], tariff.price.mean())
+    assert np.isclose(average[1], tariff.averagePrice(example.inputs.energy))
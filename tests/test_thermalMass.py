@@ -0,0 +1,50 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from thermalMass import RCBuilding, indoorTemperature, simulateRC
+
+
+def recurrence(u, a, low, high, previous):
+    # The thermostat hour by hour
+    indoor = np.empty(len(u))
+    for k, x in enumerate(u):
+        previous = min(max(a*previous + (1 - a)*x, low), high)
+        indoor[k] = previous
+    return indoor
+
+
+@pytest.mark.parametrize('tau', [0.3, 1, 24, 100, 400, 5000])
+def test_indoor_matches_the_recurrence(example, tau):
+    building = RCBuilding.fromFit(example.fit, 68, tau)
+    u = example.sinT + building.gainOffset
+    expected = recurrence(u, building.a, 68, 75, np.clip(u[0], 68, 75))
+    assert np.allclose(indoorTemperature(u, building.a, 68, 75), expected, atol=1e-9)
+
+
+def test_indoor_matches_the_recurrence_on_random_weather():
+    rng = np.random.default_rng(0)
+    for trial in range(100):
+        n = rng.integers(1, 300)
+        u = np.cumsum(rng.normal(0, 3, n)) + rng.normal(62, 10, n)
+        a = rng.uniform(0.01, 0.999)
+        initial = rng.uniform(40, 90)
+        expected = recurrence(u, a, 55, 70, np.clip(initial, 55, 70))
+        assert np.allclose(indoorTemperature(u, a, 55, 70, initial), expected, atol=1e-9)
+
+
+def test_loads_land_on_the_indoor_temperature(example):
+    building = RCBuilding.fromFit(example.fit, 68, 24)
+    thermal = simulateRC(example.sinT, building, 68, 75)
+    u = example.sinT + building.gainOffset
+    load = thermal.heatingLoad - thermal.coolingLoad
+    indoor = thermal.indoorTemp
+    a = building.a
+    assert np.allclose(indoor[1:], a*indoor[:-1] + (1 - a)*(u[1:] + building.R*load[1:]))
+
+
+def test_fit_needs_a_falling_heating_line(example):
+    for slope in (0.0, 0.5):
+        with pytest.raises(ValueError):
+            RCBuilding.fromFit(replace(example.fit, heatSlope=slope), 68, 24)
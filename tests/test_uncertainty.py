@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from uncertainty import Uncertainty, monteCarlo
+
+noSpread = Uncertainty(retroSpread=0, coolingSpread=0, copSpread=0, eerSpread=0, costSpread=0)
+
+
+@pytest.mark.parametrize('retrofit', [False, True])
+def test_zero_spread_is_the_model(example, retrofit):
+    uncertain = monteCarlo(example, noSpread, n=20, retrofit=retrofit, seed=0)
+    for mode in ('Comfort Mode', 'No Comfort Mode'):
+        expected = np.asarray(example.savings(mode, retrofit))
+        np.testing.assert_allclose(uncertain.monthlySavings[mode], np.broadcast_to(expected, (20, len(expected))),
+                                   rtol=1e-12, atol=1e-12*np.abs(expected).max())
+
+
+def test_percentiles_are_ordered_and_seeded(example):
+    first = monteCarlo(example, n=2000, seed=7)
+    again = monteCarlo(example, n=2000, seed=7)
+    other = monteCarlo(example, n=2000, seed=8)
+
+    for mode in ('Comfort Mode', 'No Comfort Mode'):
+        monthly, annual = first.monthly[mode], first.annual[mode]
+        assert (monthly['P10'] <= monthly['P50']).all() and (monthly['P50'] <= monthly['P90']).all()
+        assert annual['P10'] < annual['P50'] < annual['P90']
+        assert monthly.equals(again.monthly[mode]) and annual.equals(again.annual[mode])
+        assert not annual.equals(other.annual[mode])
+
+
+def test_linear_curves_are_sampled_as_lines(example):
+    # The default COP is a line, every sample heats with its own slope and intercept
+    spread = Uncertainty(retroSpread=0, coolingSpread=0, copSpread=0.2, eerSpread=0, costSpread=0)
+    uncertain = monteCarlo(example, spread, n=5, seed=3)
+    samples = uncertain.samples
+    assert np.std(samples['copSlope']) > 0 and np.std(samples['copIntercept']) > 0
+
+    sinT, month, cost = example.sinT, example.inputs.month, example.cost
+    for i in range(5):
+        pump = example.heatingModel / (samples['copSlope'][i]*sinT + samples['copIntercept'][i])
+        comfort = example.hourlyModelThree - example.heatingPump + pump
+        expected = np.bincount(month, weights=example.hourlyOriginal - comfort)[1:] * cost
+        assert np.allclose(uncertain.monthlySavings['Comfort Mode'][i], expected, rtol=1e-10)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from weatherEnsemble import runEnsemble
+
+
+@pytest.fixture
+def history(tempData):
+    return tempData.copy()
+
+
+def test_single_year_is_the_model_year(example, history):
+    ensemble = runEnsemble(example, history)
+    assert len(ensemble.annual) == 1
+    assert np.allclose(ensemble.weather.sinT(example.inputs.hoursInYear)[0], example.sinT)
+
+    year = ensemble.annual.iloc[0]
+    assert np.isclose(year['heatingKWh'], example.monthlyHeating.sum())
+    assert np.isclose(year['originalKWh'], np.nansum(example.heatingEnergy))
+    assert np.isclose(year['heatPumpKWh'], example.totalModelThree.sum())
+    assert np.isclose(year['heatPumpCost'], example.monthlyCost('Comfort Mode').sum())
+
+
+def test_years_are_independent_rows(example, history):
+    # The same weather under two years gives two equal rows, a year with a gap is filled
+    shifted = history.assign(DATE=history['DATE'] + pd.DateOffset(years=1))
+    gappy = shifted.drop(index=shifted.index[100:110]).assign(DATE=lambda h: h['DATE'] + pd.DateOffset(years=1))
+    ensemble = runEnsemble(example, pd.concat([history, shifted, gappy], ignore_index=True))
+
+    annual = ensemble.annual.to_numpy()
+    assert len(annual) == 3 and np.allclose(annual[0], annual[1])
+    assert ensemble.weather.filledDays.tolist()[2] > 0
+
+
+def test_workers_give_the_same_years(example, history):
+    years = pd.concat([history.assign(DATE=history['DATE'] + pd.DateOffset(years=k)) for k in range(3)], ignore_index=True)
+    alone = runEnsemble(example, years, workers=1, yearsPerTask=1)
+    spread = runEnsemble(example, years, workers=2, yearsPerTask=1)
+    assert np.allclose(alone.annual.to_numpy(), spread.annual.to_numpy())
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+# Lumped resistance-capacitance (1R1C) building with an ideal thermostat.
+#
+#   C dTin/dt = (Tout - Tin)/R + gains + Q
+#
+# Stepped hourly, the free-floating indoor temperature is a first-order recursive
+# filter of the equilibrium temperature u = Tout + R*gains:
+#
+#   Tin[k] = a*Tin[k-1] + (1 - a)*u[k],   a = exp(-1/tau),  tau = R*C hours
+#
+# which lfilter runs over the whole year at once. The thermostat holds Tin between
+# the heating and cooling setpoints: the filter response restarts from the setpoint
+# at the end of every stretch that reached it, so the year is one filter response plus
+# decaying offsets, settled for all stretches together in a few array passes. The
+# heating (Q > 0) or cooling (Q < 0) needed every hour then follows from the indoor
+# temperature in one vectorized step.
+#
+# R and the internal gains come from the building's heating regression, so with no
+# thermal mass (tau -> 0) the heating load is the comfort model's heatingModel again.
+
+
+@dataclass
+class RCBuilding:
+    R: float            # °F per kW of heat loss
+    tau: float          # Time constant R*C in hours
+    gainOffset: float   # R*gains, °F the building runs above outside without heating
+
+    @classmethod
+    def fromFit(cls, fit, heatingSetpoint, tau):
+        # Heating slope is -1/R, a flat or rising heating line has no heat loss to model
+        if fit.heatSlope >= 0:
+            raise ValueError(f"Heating slope {fit.heatSlope:.3f} is not negative, the thermal mass model needs "
+                             "usage that rises as it gets colder")
+        # Heating starts where the heating line drops to the base
+        # load (as in comfortKernels), where internal gains alone hold the heating setpoint
+        R = -1 / fit.heatSlope
+        balancePoint = (int(fit.baseIntercept) - fit.heatIntercept) / fit.heatSlope
+        return cls(R, tau, heatingSetpoint - balancePoint)
+
+    @property
+    def a(self):
+        return np.exp(-1 / self.tau) if self.tau > 0 else 0.0
+
+
+@dataclass
+class ThermalResult:
+    indoorTemp: np.ndarray     # °F at the end of every hour
+    heatingLoad: np.ndarray    # kWh of heat added each hour
+    coolingLoad: np.ndarray    # kWh of heat removed each hour
+
+
+def floatingFrom(z, logA, resets, values, initial):
+    # Free-floating Tin[k] = z[k] + a^(k - c)*(Tin[c] - z[c]) from the last reset c before k
+    hours = np.arange(len(z))
+    last = np.maximum.accumulate(np.where(resets, hours, -1))
+    last = np.concatenate([[-1], last[:-1]])
+    held = np.maximum(last, 0)
+    start = np.where(last >= 0, values[held], initial)
+    return z + np.exp((hours - last)*logA)*(start - np.where(last >= 0, z[held], 0.0))
+
+
+def indoorTemperature(u, a, low, high, initial=None):
+    # Tin[k] = clip(a*Tin[k-1] + (1 - a)*u[k], low, high) for the whole year in array passes
+    n = len(u)
+    if a == 0:
+        return np.clip(u, low, high)
+
+    from scipy.signal import lfilter
+    z = lfilter([1 - a], [1, -a], u)
+    logA = np.log(a)
+    initial = float(np.clip(u[0] if initial is None else initial, low, high))
+
+    # Between the setpoints the filter never leaves them, only stretches of u below the
+    # heating setpoint (or above the cooling one) can reach it, and once there Tin stays
+    # at the setpoint until the stretch ends
+    side = np.where(u < low, -1, np.where(u > high, 1, 0))
+    isStart = np.concatenate([[side[0] != 0], (side[1:] != side[:-1]) & (side[1:] != 0)])
+    starts = np.flatnonzero(isStart)
+    ends = np.flatnonzero(np.concatenate([(side[:-1] != side[1:]) & (side[:-1] != 0), [side[-1] != 0]]))
+    inStretch = side != 0
+    if not len(starts):
+        return floatingFrom(z, logA, inStretch, z, initial)
+    stretch = np.cumsum(isStart) - 1
+    setpoint = np.where(side[starts] < 0, low, high)
+
+    # A stretch reaching its setpoint resets the state to it at the stretch's end. Which ones
+    # do depends only on the stretches before, so guessing and re-evaluating all of them at
+    # once settles within (number of stretches + 1) passes, usually a handful
+    reached = np.ones(len(starts), dtype=bool)
+    while True:
+        resets = np.zeros(n, dtype=bool)
+        resets[ends[reached]] = True
+        values = np.zeros(n)
+        values[ends] = setpoint
+        floating = floatingFrom(z, logA, resets, values, initial)
+
+        past = inStretch & np.where(side < 0, floating < low, floating > high)
+        now = np.bincount(stretch[past], minlength=len(starts)) > 0
+        if np.array_equal(now, reached):
+            break
+        reached = now
+
+    # Held at the setpoint from the first hour past it to the end of its stretch
+    count = np.cumsum(past)
+    before = count[starts] - past[starts]
+    held = inStretch & (count - before[np.maximum(stretch, 0)] > 0)
+    return np.where(held, setpoint[np.maximum(stretch, 0)], floating)
+
+
+def simulateRC(outsideTemp, building, heatingSetpoint, coolingSetpoint):
+    outside = np.asarray(outsideTemp, dtype=float)
+
+    # Gaps in the weather are bridged linearly, a NaN would stay in the filter state
+    missing = np.isnan(outside)
+    if missing.any():
+        hours = np.arange(len(outside))
+        outside = np.interp(hours, hours[~missing], outside[~missing])
+
+    u = outside + building.gainOffset
+    a = building.a
+    indoor = indoorTemperature(u, a, heatingSetpoint, coolingSetpoint)
+
+    # Heat the thermostat added in each hour to land on indoor[k]
+    previous = np.concatenate([[indoor[0]], indoor[:-1]])
+    if a == 0:
+        load = (indoor - u) / building.R
+    else:
+        load = (indoor - a*previous - (1 - a)*u) / ((1 - a)*building.R)
+    load[np.abs(load) < 1e-9] = 0
+
+    return ThermalResult(indoor, np.clip(load, 0, None), np.clip(-load, 0, None))
+
+
+@dataclass
+class RCScenarios:
+    building: RCBuilding
+    thermal: ThermalResult
+    resistive: np.ndarray      # Hourly kWh, resistive heating as today + base load
+    heatPump: np.ndarray       # Hourly kWh, heat pump heating and cooling + base load
+    monthly: pd.DataFrame      # Monthly kWh of both
+
+
+def rcScenarios(result, tau, heatingSetpoint=68, coolingSetpoint=75):
+    # Thermal mass version of the building in a ModelResult, same heat pump curves
+    building = RCBuilding.fromFit(result.fit, heatingSetpoint, tau)
+    thermal = simulateRC(result.sinT, building, heatingSetpoint, coolingSetpoint)
+
+    # Same base load as the comfort model, so with tau -> 0 resistive is hourlyModelOne
+    resistive = thermal.heatingLoad + result.lightingModel
+    delivered = result.efficiency    # Gas buildings: only the furnace's output has to be replaced
+    heatPump = (thermal.heatingLoad*delivered / result.COP(result.sinT) + (thermal.coolingLoad*delivered / result.EER(result.sinT))*3.412
+                + result.lightingModel)
+
+    monthly = pd.DataFrame({
+        'resistive': result.inputs.monthlySum(resistive),
+        'heatPump': result.inputs.monthlySum(heatPump),
+    })
+    return RCScenarios(building, thermal, resistive, heatPump, monthly)
+
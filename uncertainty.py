@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+
+from changePoint import lineFit
+from modelEngine import months, noComfortTemperature
+
+# Monte Carlo uncertainty for the savings estimates. Retrofit %, the cooling model
+# multiplier, the COP/EER curves and the cost per kWh are sampled together. The curves
+# are the ones the model uses (linear, poly or piecewise). Each sample moves a curve by
+# a line with its own slope and intercept, drawn independently around the curve's line
+# fit, so a sampled linear curve is just another (slope, intercept) pair. Retrofit, cost
+# and the multiplier scale monthly sums that don't change between samples; the curves
+# are evaluated per sample, only at the (month, temperature) pairs that carry load.
+
+
+@dataclass
+class Uncertainty:
+    # Spread of each input around the value used in the deterministic model
+    retroSpread: float = 0.10          # ± absolute fraction, uniform
+    coolingMultiplier: float = 2.0     # Cooling model is this many times the heating model
+    coolingSpread: float = 0.5         # Standard deviation of the multiplier
+    copSpread: float = 0.10            # Relative standard deviation of the COP curve's slope and of its level
+    eerSpread: float = 0.10            # Same for the EER curve
+    costSpread: float = 0.10           # Relative standard deviation of cost per kWh
+
+
+@dataclass
+class UncertaintyResult:
+    samples: dict                      # Drawn parameter values, one array per parameter
+    monthlySavings: dict               # Scenario -> (samples x months) $ savings
+    monthLabels: list                  # Names of the months in the data, in order
+    percentiles: tuple = (10, 50, 90)
+    monthly: dict = field(default_factory=dict)   # Scenario -> DataFrame of monthly P10/P50/P90
+    annual: dict = field(default_factory=dict)    # Scenario -> Series of annual P10/P50/P90
+
+    def __post_init__(self):
+        labels = [f'P{p}' for p in self.percentiles]
+        for scenario, savings in self.monthlySavings.items():
+            self.monthly[scenario] = pd.DataFrame(np.percentile(savings, self.percentiles, axis=0).T,
+                                                  index=self.monthLabels, columns=labels)
+            self.annual[scenario] = pd.Series(np.percentile(savings.sum(axis=1), self.percentiles), index=labels)
+
+
+def monthMatrix(month):
+    matrix = np.zeros((len(month), 12))
+    matrix[np.arange(len(month)), month - 1] = 1
+    return matrix
+
+
+minCurve = 0.05    # A sampled curve stays above this fraction of the model's curve
+
+
+def curveLine(curve, temps, weights):
+    # Line fit of the curve over the year's temperatures, with its level at the load weighted
+    # mean temperature, where the slope and the level of a sample are drawn independently
+    slope, intercept = lineFit(temps, curve(temps))
+    center = np.average(temps, weights=weights) if weights.sum() > 0 else temps.mean()
+    return slope, intercept, center
+
+
+def sampleLine(line, spread, n, rng):
+    slope, intercept, center = line
+    slopes = slope * (1 + spread*rng.standard_normal(n))
+    levels = (slope*center + intercept) * (1 + spread*rng.standard_normal(n))
+    return slopes, levels - slopes*center
+
+
+def drawSamples(result, uncertainty, n, rng, copLine, eerLine):
+    def relative(value, spread):
+        return value * (1 + spread*rng.standard_normal(n))
+
+    copSlope, copIntercept = sampleLine(copLine, uncertainty.copSpread, n, rng)
+    eerSlope, eerIntercept = sampleLine(eerLine, uncertainty.eerSpread, n, rng)
+    return {
+        'retro': np.clip(result.retro + uncertainty.retroSpread*rng.uniform(-1, 1, n), 0, 1),
+        'coolingMultiplier': np.clip(uncertainty.coolingMultiplier + uncertainty.coolingSpread*rng.standard_normal(n), 0, None),
+        'copSlope': copSlope,
+        'copIntercept': copIntercept,
+        'eerSlope': eerSlope,
+        'eerIntercept': eerIntercept,
+        'cost': np.clip(relative(result.cost, uncertainty.costSpread), 0, None),
+    }
+
+
+def curveSums(weights, temps, month, curve, line, slopes, intercepts, blockSize=2**16):
+    # Monthly sums of weights / sampled curve, (samples x 12). A sample's curve is the model's
+    # curve plus the difference between its line and the curve's line fit. Hours without load
+    # drop out and hours of the same month and temperature are evaluated once
+    used = weights != 0
+    pairs, which = np.unique(np.stack([month[used], temps[used]]), axis=1, return_inverse=True)
+    load = np.bincount(which.ravel(), weights=weights[used], minlength=pairs.shape[1])
+    T = pairs[1]
+    base = curve(T)
+    toMonths = monthMatrix(pairs[0].astype(int))
+
+    dSlope = (slopes - line[0])[:, None]
+    dIntercept = (intercepts - line[1])[:, None]
+    floor = minCurve*base
+    sums = np.empty((len(slopes), 12))
+    block = max(1, blockSize // max(len(T), 1))
+    for start in range(0, len(slopes), block):
+        # In place on one cache sized block of samples
+        part = slice(start, start + block)
+        values = dSlope[part] * T
+        values += base
+        values += dIntercept[part]
+        np.maximum(values, floor, out=values)
+        np.divide(load, values, out=values)
+        sums[part] = values @ toMonths
+    return sums
+
+
+def monteCarlo(result, uncertainty=None, n=10_000, retrofit=False, seed=None):
+    uncertainty = uncertainty or Uncertainty()
+    rng = np.random.default_rng(seed)
+    inputs = result.inputs
+    month = inputs.month
+    efficiency = result.efficiency
+
+    # Loads each curve divides, and the temperatures it is read at
+    heatLoad = np.nan_to_num(result.heatingModel*efficiency)
+    coolingLoad = np.nan_to_num(result.coolingEnergy*efficiency / 2*3.412)    # Per unit of multiplier
+    noComfortTemp = noComfortTemperature(inputs)
+    noComfortLoad = np.nan_to_num(result.noComfortHeat*efficiency)
+
+    copLine = curveLine(result.COP, result.sinT, heatLoad)
+    eerLine = curveLine(result.EER, result.sinT, coolingLoad)
+    samples = drawSamples(result, uncertainty, n, rng, copLine, eerLine)
+
+    # Monthly kWh of the pieces the sampled factors scale, the curves per sample
+    toMonths = monthMatrix(month)
+    original = np.nan_to_num(result.hourlyOriginal) @ toMonths
+    lighting = np.nan_to_num(result.lightingModel) @ toMonths
+    noComfortLight = np.nan_to_num(result.noComfortTotal - result.noComfortPump) @ toMonths
+    heating = curveSums(heatLoad, result.sinT, month, result.COP, copLine, samples['copSlope'], samples['copIntercept'])
+    coolingUnit = curveSums(coolingLoad, result.sinT, month, result.EER, eerLine, samples['eerSlope'], samples['eerIntercept'])
+    noComfortPump = curveSums(noComfortLoad, noComfortTemp, month, result.COP, copLine, samples['copSlope'], samples['copIntercept'])
+
+    comfort = heating + lighting + coolingUnit * samples['coolingMultiplier'][:, None]
+    noComfort = noComfortPump + noComfortLight
+
+    # Same savings as ModelResult.savings, with the retrofit reduction applied to the savings
+    scale = (1 - samples['retro'])[:, None] if retrofit else 1
+    cost = samples['cost'][:, None]
+
+    present = np.flatnonzero(toMonths.sum(axis=0))
+    monthlySavings = {
+        'Comfort Mode': ((original - comfort) * cost * scale)[:, present],
+        'No Comfort Mode': ((original - noComfort) * cost * scale)[:, present],
+    }
+    return UncertaintyResult(samples, monthlySavings, [months[m] for m in present])
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from modelEngine import prepareTemperature, monthDayKey, calendarDays, sinusoidalTemp, comfortKernels
+
+# Weather-year ensemble. The building calibrated on the meter year (its load fit,
+# setpoints, heat pump curves and prices in a ModelResult) is run against every year
+# of a long NOAA daily history, e.g. 30 years of one station:
+#
+#   history = readTemperature('noaa 1994-2023.csv')
+#   ensemble = runEnsemble(result, history, workers=4)
+#   ensemble.annual         one row per weather year: kWh and $ with and without the heat pump
+#   ensemble.percentiles    P10/P50/P90 of every column
+#
+# Each year's daily highs and lows are laid on the meter's calendar in one (years x days)
+# table, so every year's hourly sinusoid is one (years x hours) array. Blocks of years run
+# the comfort model in worker processes. No Comfort Mode needs that year's metered
+# hours, so the ensemble is the comfort scenario against the modeled resistive building.
+
+percentiles = (10, 50, 90)
+
+
+@dataclass
+class WeatherYears:
+    years: np.ndarray           # Calendar year of each row
+    hourlyTempAvg: np.ndarray   # (years x hours) daily average °F on the meter's hours
+    deltaTday: np.ndarray       # (years x hours) daily high - low
+    filledDays: np.ndarray      # Days per year taken from the day before (or after)
+    skipped: list               # Years with too few days to use
+
+    def sinT(self, hoursInYear):
+        return sinusoidalTemp(self.hourlyTempAvg, self.deltaTday, hoursInYear)
+
+
+def fillDays(daily):
+    # Missing days take the last day before them in the same year, leading gaps the first day after
+    index = np.arange(daily.shape[1])
+    valid = ~np.isnan(daily)
+    before = np.maximum.accumulate(np.where(valid, index, 0), axis=1)
+    filled = np.take_along_axis(daily, before, axis=1)
+    after = np.minimum.accumulate(np.where(valid, index, daily.shape[1] - 1)[:, ::-1], axis=1)[:, ::-1]
+    return np.where(np.isnan(filled), np.take_along_axis(daily, after, axis=1), filled)
+
+
+def weatherYears(history, inputs, minCoverage=0.9):
+    # Every full enough year of the history on the meter year's calendar (leap days come from Feb 28)
+    if 'TAVG' not in history or 'tempDays' not in history:
+        history = prepareTemperature(history)
+
+    with stage('weather years', len(history)):
+        year = history['DATE'].dt.year.to_numpy()
+        years = np.unique(year)
+        row = np.searchsorted(years, year)
+        keys = monthDayKey(history['tempMonths'].to_numpy(), history['tempDays'].to_numpy())
+
+        table = np.full((len(years), monthDayKey(12, 31) + 1, 2), np.nan)
+        table[row, keys, 0] = history['TAVG'].to_numpy(dtype=float)
+        table[row, keys, 1] = (history['TMAX'] - history['TMIN']).to_numpy(dtype=float)
+
+        nDays = int(inputs.dayOfYear[-1]) + 1
+        dayMonth, dayOfMonth = calendarDays(f'{inputs.year}-01-01', nDays)
+        daily = table[:, monthDayKey(dayMonth, dayOfMonth)]     # (years x days x 2)
+
+        missing = np.isnan(daily).any(axis=2).sum(axis=1)
+        keep = missing <= (1 - minCoverage)*nDays
+        if not keep.any():
+            raise ValueError(f"No year in the temperature history has {minCoverage:.0%} of its days")
+
+        avg, delta = (fillDays(daily[keep, :, i]) for i in (0, 1))
+        return WeatherYears(years[keep], avg[:, inputs.dayOfYear], delta[:, inputs.dayOfYear],
+                            missing[keep], [int(y) for y in years[~keep]])
+
+
+def runYears(sinT, fit, heatingTemp, coolingTemp, COP, EER, efficiency, cost, tariff, fuelCost):
+    # Worker: annual kWh and $ of a block of weather years, rows of sinT are years
+    coolingEnergy, heatingEnergy, heatingModel = comfortKernels(sinT, fit, heatingTemp, coolingTemp)
+    lighting = heatingEnergy - heatingModel
+    heatPump = heatingModel*efficiency / COP(sinT) + (coolingEnergy*efficiency / EER(sinT))*3.412
+
+    annual = {
+        'heatingKWh': np.nansum(heatingModel, axis=1),
+        'coolingKWh': np.nansum(coolingEnergy, axis=1),
+        'originalKWh': np.nansum(heatingEnergy, axis=1),
+        'heatPumpKWh': np.nansum(heatPump + lighting, axis=1),
+    }
+    if fuelCost is not None:
+        # Base load stays on gas, the heat pump is electric
+        annual['originalCost'] = annual['originalKWh']*fuelCost
+        annual['heatPumpCost'] = np.nansum(lighting, axis=1)*fuelCost + np.nansum(heatPump, axis=1)*cost
+    elif tariff is not None:
+        annual['originalCost'] = tariff.annualCost(heatingEnergy)
+        annual['heatPumpCost'] = tariff.annualCost(heatPump + lighting)
+    else:
+        annual['originalCost'] = annual['originalKWh']*cost
+        annual['heatPumpCost'] = annual['heatPumpKWh']*cost
+    return annual
+
+
+@dataclass
+class EnsembleResult:
+    weather: WeatherYears
+    annual: pd.DataFrame                                  # One row per weather year
+    percentiles: pd.DataFrame = field(init=False)         # P10/P50/P90 of every column
+
+    def __post_init__(self):
+        self.annual['savings'] = self.annual['originalCost'] - self.annual['heatPumpCost']
+        self.percentiles = pd.DataFrame(np.percentile(self.annual.to_numpy(), percentiles, axis=0),
+                                        index=[f'P{p}' for p in percentiles], columns=self.annual.columns)
+
+    @property
+    def typicalYear(self):
+        # The year whose savings are closest to the median
+        savings = self.annual['savings']
+        return int((savings - savings.median()).abs().idxmin())
+
+    @property
+    def worstYear(self):
+        return int(self.annual['savings'].idxmin())
+
+
+def runEnsemble(result, history, workers=1, yearsPerTask=8, minCoverage=0.9):
+    # Calibrated building of a ModelResult against every year of a daily NOAA history.
+    # workers > 1 spreads blocks of years over spawned processes (safe next to Streamlit's threads)
+    weather = weatherYears(history, result.inputs, minCoverage)
+    sinT = weather.sinT(result.inputs.hoursInYear)
+    model = (result.fit, result.heatingTemp, result.coolingTemp, result.COP, result.EER, result.efficiency,
+             result.cost, result.tariff, result.fuelCost)
+
+    blocks = [sinT[i:i + yearsPerTask] for i in range(0, len(sinT), yearsPerTask)]
+    workers = min(workers or os.cpu_count(), len(blocks))
+    with stage('weather ensemble', sinT.size):
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                parts = list(pool.map(runYears, blocks, *([value]*len(blocks) for value in model)))
+        else:
+            parts = [runYears(block, *model) for block in blocks]
+
+    annual = pd.DataFrame({name: np.concatenate([part[name] for part in parts]) for name in parts[0]},
+                          index=pd.Index(weather.years, name='year'))
+    return EnsembleResult(weather, annual)